@@ -11,7 +11,8 @@ from .views import (
     StoreSettingsPartialView,
     ProductStatsView,
     PaymentTransactionsView,
-    PaymentStatsView
+    PaymentStatsView,
+    CacheMetricsView
 )
 
 urlpatterns = [
@@ -28,6 +29,9 @@ urlpatterns = [
     path("payments/", PaymentTransactionsView.as_view(), name="admin-payments"),
     path("payments/stats/", PaymentStatsView.as_view(), name="admin-payments-stats"),
     
+    # Cache endpoints
+    path("cache/metrics/", CacheMetricsView.as_view(), name="admin-cache-metrics"),
+    
     # Settings endpoints
     path("settings/", StoreSettingsView.as_view(), name="store-settings"),
     path("settings/<str:section>/", StoreSettingsPartialView.as_view(), name="store-settings-partial"),
@@ -11,6 +11,8 @@ from orders.models import Order, OrderItem
 from products.models import Product, ProductVariant
 from users.models import Account
 from payments.models import PaymentTransaction
+from backend.redis_client import redis_client
+from backend.pagination import KeysetPagination
 from .models import StoreSettings
 from .serializers import StoreSettingsSerializer
 
@@ -482,12 +484,23 @@ class PaymentTransactionsView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
     def get(self, request):
-        """Get all payment transactions with related order and user information"""
+        """
+        Get all payment transactions with related order and user information
+        
+        With ?limit= or ?cursor=, one keyset page ordered by (created_at, id)
+        is returned in {count, next, previous, results}.
+        """
+        transactions = PaymentTransaction.objects.select_related(
+            'order__user'
+        ).order_by('-created_at', '-id')
+        
+        # Invalid cursors are answered with a 404 by the paginator
+        paginator = None
+        if 'limit' in request.query_params or 'cursor' in request.query_params:
+            paginator = KeysetPagination()
+            transactions = paginator.paginate_queryset(transactions, request, view=self)
+        
         try:
-            transactions = PaymentTransaction.objects.select_related(
-                'order__user'
-            ).order_by('-created_at')
-            
             transaction_data = []
             for transaction in transactions:
                 data = {
@@ -513,6 +526,8 @@ class PaymentTransactionsView(APIView):
                 
                 transaction_data.append(data)
             
+            if paginator is not None:
+                return paginator.get_paginated_response(transaction_data)
             return Response(transaction_data)
             
         except Exception as e:
@@ -555,3 +570,32 @@ class PaymentStatsView(APIView):
                 {'error': 'Failed to get payment stats', 'detail': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class CacheMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """Get cache hit/miss/latency/size metrics per key family"""
+        families = redis_client.get_metrics()
+        
+        # Optional filter on family name, e.g. ?family=products:
+        family_filter = request.query_params.get('family')
+        if family_filter:
+            families = {name: data for name, data in families.items() if family_filter in name}
+        
+        return Response({
+            'families': families,
+            # L1 counters and breaker state are per worker process, this is the one serving the request
+            'local_cache': redis_client.get_local_cache_stats(),
+            'circuit_breaker': redis_client.get_circuit_breaker_stats(),
+        })
+    
+    def delete(self, request):
+        """Reset cache metrics"""
+        if not redis_client.reset_metrics():
+            return Response(
+                {'error': 'Failed to reset cache metrics'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,191 @@
+"""
+Cache instrumentation for RedisClient
+
+Counts hits, misses, errors, latency and payload sizes per key family, e.g.
+'products:list:*' or 'product:{id}:variants'. Counters are kept in-process and
+periodically added to Redis hashes so that all workers report together.
+"""
+
+from functools import lru_cache
+import re
+import threading
+import time
+from typing import Optional
+
+
+# Upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+_VERSION_RE = re.compile(r'^v\d+$')
+_HASH_RE = re.compile(r'^[0-9a-f]{8,}$')
+
+
+@lru_cache(maxsize=8192)
+def key_family(key: str) -> str:
+    """
+    Reduce a cache key to its family
+
+    Namespace versions are dropped, numeric ids become '{id}' and parameter
+    hashes become '*': 'product:v17:42:variants' -> 'product:{id}:variants'.
+    """
+    parts = []
+    for part in str(key).split(':'):
+        if _VERSION_RE.match(part):
+            continue
+        if part.isdigit():
+            parts.append('{id}')
+        elif _HASH_RE.match(part):
+            parts.append('*')
+        else:
+            parts.append(part)
+    return ':'.join(parts) or 'unknown'
+
+
+def _latency_field(latency_ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f'latency_le_{bound}'
+    return 'latency_le_inf'
+
+
+class CacheMetrics:
+    """Per key family cache counters, flushed to Redis every flush_interval seconds"""
+
+    def __init__(self, key_prefix: str, flush_interval: int = 10):
+        """
+        Initialize metrics
+
+        Args:
+            key_prefix: Prefix of the Redis hashes holding aggregated counters
+            flush_interval: Seconds between flushes of local counters to Redis
+        """
+        self.key_prefix = key_prefix
+        self.flush_interval = flush_interval
+        self._counters = {}  # family -> {field: value}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, key: str, outcome: str, latency: Optional[float] = None, size: Optional[int] = None) -> bool:
+        """
+        Record one cache operation
+
+        Args:
+            key: Cache key
+            outcome: 'hit', 'l1_hit', 'fallback_hit', 'miss', 'set', 'fallback_set',
+                'delete' or 'error'
+            latency: Seconds the Redis call took, if it reached Redis
+            size: Payload size in bytes
+
+        Returns:
+            True if local counters are due to be flushed
+        """
+        family = key_family(key)
+        with self._lock:
+            counters = self._counters.setdefault(family, {})
+            counters[outcome] = counters.get(outcome, 0) + 1
+            if latency is not None:
+                latency_ms = latency * 1000
+                field = _latency_field(latency_ms)
+                counters[field] = counters.get(field, 0) + 1
+                counters['latency_us_total'] = counters.get('latency_us_total', 0) + int(latency_ms * 1000)
+                counters['latency_count'] = counters.get('latency_count', 0) + 1
+            if size is not None:
+                field = 'bytes_written' if outcome == 'set' else 'bytes_read'
+                counters[field] = counters.get(field, 0) + size
+            return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self, connection) -> bool:
+        """
+        Add local counters to the aggregated Redis hashes
+
+        Counters are kept locally if Redis is unavailable.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            self._last_flush = time.monotonic()
+        if not counters:
+            return True
+        try:
+            pipe = connection.pipeline(transaction=False)
+            for family, fields in counters.items():
+                for field, value in fields.items():
+                    pipe.hincrby(self._hash_key(family), field, value)
+                pipe.sadd(self._families_key(), family)
+            pipe.execute()
+            return True
+        except Exception:
+            self._merge(counters)
+            return False
+
+    def snapshot(self, connection) -> dict:
+        """
+        Get aggregated counters for every family, including unflushed local ones
+
+        Returns:
+            Dictionary of family -> summary
+        """
+        self.flush(connection)
+        families = sorted(member.decode() if isinstance(member, bytes) else member
+                          for member in connection.smembers(self._families_key()))
+        pipe = connection.pipeline(transaction=False)
+        for family in families:
+            pipe.hgetall(self._hash_key(family))
+        raw = pipe.execute()
+
+        summary = {}
+        for family, fields in zip(families, raw):
+            counters = {
+                (field.decode() if isinstance(field, bytes) else field): int(value)
+                for field, value in fields.items()
+            }
+            summary[family] = self._summarize(counters)
+        return summary
+
+    def reset(self, connection):
+        """Drop all aggregated and local counters"""
+        with self._lock:
+            self._counters = {}
+        families = connection.smembers(self._families_key())
+        keys = [self._hash_key(member.decode() if isinstance(member, bytes) else member) for member in families]
+        connection.delete(self._families_key(), *keys)
+
+    def _merge(self, counters: dict):
+        with self._lock:
+            for family, fields in counters.items():
+                local = self._counters.setdefault(family, {})
+                for field, value in fields.items():
+                    local[field] = local.get(field, 0) + value
+
+    def _hash_key(self, family: str) -> str:
+        return f'{self.key_prefix}:cache:metrics:{family}'
+
+    def _families_key(self) -> str:
+        return f'{self.key_prefix}:cache:metrics'
+
+    @staticmethod
+    def _summarize(counters: dict) -> dict:
+        hits = counters.get('hit', 0) + counters.get('l1_hit', 0) + counters.get('fallback_hit', 0)
+        misses = counters.get('miss', 0)
+        lookups = hits + misses
+        latency_count = counters.get('latency_count', 0)
+        histogram = {
+            f'<={bound}ms': counters.get(f'latency_le_{bound}', 0) for bound in LATENCY_BUCKETS_MS
+        }
+        histogram['>1000ms'] = counters.get('latency_le_inf', 0)
+        return {
+            'hits': hits,
+            'l1_hits': counters.get('l1_hit', 0),
+            'fallback_hits': counters.get('fallback_hit', 0),
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'sets': counters.get('set', 0),
+            'deletes': counters.get('delete', 0),
+            'errors': counters.get('error', 0),
+            'avg_latency_ms': round(counters.get('latency_us_total', 0) / latency_count / 1000, 3) if latency_count else 0.0,
+            'latency_histogram': histogram,
+            'avg_read_bytes': counters.get('bytes_read', 0) // counters['hit'] if counters.get('hit') else 0,
+            'avg_write_bytes': counters.get('bytes_written', 0) // counters['set'] if counters.get('set') else 0,
+        }
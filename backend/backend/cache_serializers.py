@@ -0,0 +1,191 @@
+"""
+Serializers used by RedisClient to encode cached values
+
+Every stored payload starts with a small header naming the serializer and
+whether the body is zlib-compressed, so entries written with one serializer
+stay readable after switching to another.
+
+bytes values (e.g. rendered response bodies) are stored as they are, without
+a serializer, and so are read_through() envelopes holding bytes.
+"""
+
+from decimal import Decimal
+import json
+import logging
+import struct
+import zlib
+from typing import Any, Optional
+from rest_framework.utils.encoders import JSONEncoder
+
+
+logger = logging.getLogger(__name__)
+
+# Header: magic byte, serializer id, flags
+MAGIC = b'\xfe'
+HEADER_SIZE = 3
+FLAG_COMPRESSED = 1
+FLAG_RAW = 2     # body is a bytes value, no serializer
+FLAG_ENTRY = 4   # raw body is prefixed with the envelope's expiry and delta
+
+# Keys of the envelope written by RedisClient.set_entry()/read_through()
+ENTRY_VALUE = '_value'
+ENTRY_EXPIRES_AT = '_expires_at'
+ENTRY_DELTA = '_delta'
+
+_ENTRY_META = struct.Struct('>dd')
+
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(obj: Any) -> Any:
+    """Encode types the fast serializers don't know, the way DRF responses do"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _drf_encoder.default(obj)
+
+
+class BaseSerializer:
+    """Turns cached values into bytes and back"""
+    serializer_id = 0
+    name = 'base'
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JSONSerializer(BaseSerializer):
+    """Standard library json, always available"""
+    serializer_id = 1
+    name = 'json'
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, cls=JSONEncoder, separators=(',', ':')).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer(BaseSerializer):
+    """orjson, several times faster than json on large payloads"""
+    serializer_id = 2
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, value: Any) -> bytes:
+        return self._orjson.dumps(value, default=_default, option=self._options)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackSerializer(BaseSerializer):
+    """msgpack, compact binary encoding (requires the msgpack package)"""
+    serializer_id = 3
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, default=_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+SERIALIZER_CLASSES = {
+    cls.serializer_id: cls
+    for cls in (JSONSerializer, OrjsonSerializer, MsgpackSerializer)
+}
+
+
+class CacheCodec:
+    """Encodes values with a serializer plus optional zlib compression"""
+
+    def __init__(self, serializer: BaseSerializer, compress_min_bytes: int = 16 * 1024,
+                 compress_level: int = 1):
+        """
+        Initialize the codec
+
+        Args:
+            serializer: Serializer used for new entries
+            compress_min_bytes: Compress bodies at least this large (0 disables compression)
+            compress_level: zlib compression level
+        """
+        self.serializer = serializer
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        self._serializers = {serializer.serializer_id: serializer}
+
+    def encode(self, value: Any) -> bytes:
+        """Encode a value into a self-describing payload"""
+        serializer_id = 0
+        if isinstance(value, bytes):
+            body, flags = value, FLAG_RAW
+        elif isinstance(value, dict) and isinstance(value.get(ENTRY_VALUE), bytes):
+            meta = _ENTRY_META.pack(value[ENTRY_EXPIRES_AT], value[ENTRY_DELTA])
+            body, flags = meta + value[ENTRY_VALUE], FLAG_RAW | FLAG_ENTRY
+        else:
+            body, flags = self.serializer.dumps(value), 0
+            serializer_id = self.serializer.serializer_id
+        if self.compress_min_bytes and len(body) >= self.compress_min_bytes:
+            body = zlib.compress(body, self.compress_level)
+            flags |= FLAG_COMPRESSED
+        return MAGIC + bytes((serializer_id, flags)) + body
+
+    def is_encoded(self, payload: Any) -> bool:
+        """Check whether a raw Redis value was written by encode()"""
+        return isinstance(payload, bytes) and len(payload) >= HEADER_SIZE and payload[:1] == MAGIC
+
+    def decode(self, payload: bytes) -> Any:
+        """Decode a payload produced by encode(), whatever serializer wrote it"""
+        flags = payload[2]
+        body = payload[HEADER_SIZE:]
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        if flags & FLAG_ENTRY:
+            expires_at, delta = _ENTRY_META.unpack_from(body)
+            return {
+                ENTRY_VALUE: body[_ENTRY_META.size:],
+                ENTRY_EXPIRES_AT: expires_at,
+                ENTRY_DELTA: delta,
+            }
+        if flags & FLAG_RAW:
+            return body
+        return self._get_serializer(payload[1]).loads(body)
+
+    def _get_serializer(self, serializer_id: int) -> BaseSerializer:
+        serializer = self._serializers.get(serializer_id)
+        if serializer is None:
+            serializer = SERIALIZER_CLASSES[serializer_id]()
+            self._serializers[serializer_id] = serializer
+        return serializer
+
+
+def get_serializer(name: Optional[str]) -> BaseSerializer:
+    """
+    Get a serializer by name, falling back to json if its package is missing
+
+    Args:
+        name: 'orjson', 'msgpack' or 'json'
+
+    Returns:
+        Serializer instance
+    """
+    for cls in SERIALIZER_CLASSES.values():
+        if cls.name == name:
+            try:
+                return cls()
+            except ImportError:
+                logger.warning(f"Cache serializer '{name}' is not installed, falling back to json")
+                break
+    return JSONSerializer()
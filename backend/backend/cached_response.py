@@ -0,0 +1,105 @@
+"""
+Pre-rendered JSON responses for cached endpoints
+
+The JSON body of a cacheable response is rendered once, when its cache entry
+is built, and stored as bytes prefixed with a hash of the body and the time
+it was rendered. Cache hits send those bytes as they are, skipping both
+decoding the cached value and re-rendering it with DRF's JSONRenderer.
+
+The hash and render time are also sent as a strong ETag and Last-Modified,
+so conditional requests (If-None-Match / If-Modified-Since) of unchanged
+content get a 304 straight from the cached entry. On a cache miss the body
+is computed in full before it can be compared: an ETag is only known for
+content that has been rendered, and a namespace version or TTL alone can't
+tell that content which expires with time (e.g. top sellers) is unchanged.
+"""
+
+import hashlib
+import json
+import time
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+# Hex digits of the content hash, then of the render time, in front of the body
+HASH_SIZE = 32
+TIMESTAMP_SIZE = 8
+HEADER_SIZE = HASH_SIZE + TIMESTAMP_SIZE
+
+_renderer = JSONRenderer()
+
+
+def render_body(data) -> bytes:
+    """Render data exactly like a DRF JSON response, prefixed with its content hash and render time"""
+    return _with_header(_renderer.render(data))
+
+
+def render_list(items) -> bytes:
+    """
+    Join cached values into the body of one JSON array, like render_body()
+
+    Items produced by render_body() are copied without being re-rendered;
+    anything else is rendered.
+    """
+    return _with_header(b'[' + b','.join(json_of(item) for item in items) + b']')
+
+
+def json_of(cached) -> bytes:
+    """JSON of a cached value, without the header of render_body()"""
+    if isinstance(cached, bytes):
+        return cached[HEADER_SIZE:]
+    return _renderer.render(cached)
+
+
+def _with_header(body: bytes) -> bytes:
+    digest = hashlib.blake2b(body, digest_size=HASH_SIZE // 2).hexdigest()
+    return f'{digest}{int(time.time()):0{TIMESTAMP_SIZE}x}'.encode() + body
+
+
+def content_hash(cached: bytes) -> str:
+    """Content hash of a body produced by render_body()"""
+    return cached[:HASH_SIZE].decode()
+
+
+def rendered_at(cached: bytes) -> int:
+    """Unix time at which a body produced by render_body() was rendered"""
+    return int(cached[HASH_SIZE:HEADER_SIZE], 16)
+
+
+class CachedJSONResponse(HttpResponse):
+    """Response sending a body produced by render_body() without re-rendering it"""
+
+    def __init__(self, cached: bytes, status: int = 200):
+        super().__init__(cached[HEADER_SIZE:], content_type='application/json', status=status)
+        self.content_hash = content_hash(cached)
+        self['ETag'] = f'"{self.content_hash}"'
+        self['Last-Modified'] = http_date(rendered_at(cached))
+        # Let browsers and proxies store it, but revalidate before every use
+        self['Cache-Control'] = 'no-cache'
+
+
+def cached_response(request, cached):
+    """
+    Build the response for a cached value
+
+    Returns 304 Not Modified if the request's If-None-Match or
+    If-Modified-Since matches the cached body, which on a miss has just been
+    recomputed (see the module docstring). Values cached before bodies
+    were pre-rendered, and requests that negotiated another renderer (e.g.
+    the browsable API), get a regular DRF Response instead.
+    """
+    if not isinstance(cached, bytes):
+        return Response(cached)
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format != 'json':
+        return Response(json.loads(cached[HEADER_SIZE:]))
+    response = CachedJSONResponse(cached)
+    return get_conditional_response(
+        request,
+        etag=response['ETag'],
+        last_modified=rendered_at(cached),
+        response=response,
+    )
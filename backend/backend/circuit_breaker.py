@@ -0,0 +1,155 @@
+"""
+Circuit breaker for Redis calls
+
+After failure_threshold consecutive failed or slow calls the breaker opens:
+calls fail fast with CircuitOpenError instead of waiting for socket timeouts.
+A background thread then probes Redis every reset_timeout seconds and closes
+the breaker again once a probe succeeds.
+"""
+
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Redis while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Per-process breaker shared by every Redis call"""
+
+    def __init__(self, probe: Callable[[], bool], failure_threshold: int = 5,
+                 slow_call_seconds: float = 0.5, reset_timeout: float = 5.0,
+                 on_recover: Optional[Callable[[], None]] = None):
+        """
+        Initialize the breaker
+
+        Args:
+            probe: Callable returning True if Redis is healthy (e.g., PING)
+            failure_threshold: Consecutive failed or slow calls that open the
+                breaker (0 disables it)
+            slow_call_seconds: Calls taking longer count as failures
+            reset_timeout: Seconds between recovery probes
+            on_recover: Called from the probe thread after the breaker closes
+        """
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.on_recover = on_recover
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trips = 0
+        self._prober_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Check whether calls may go to Redis"""
+        if self._state == CLOSED:
+            return True
+        # The probe thread doesn't survive a fork
+        if self._prober_pid != os.getpid():
+            self._start_prober()
+        return False
+
+    def record_success(self, latency: float):
+        """Count a call that returned, tripping on too many slow ones"""
+        if latency > self.slow_call_seconds:
+            self.record_failure()
+        elif self._failures:
+            with self._lock:
+                self._failures = 0
+
+    def record_failure(self):
+        """Count a failed call, opening the breaker at the threshold"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == OPEN or self._failures < self.failure_threshold:
+                return
+            self._state = OPEN
+            self._opened_at = time.time()
+            self._trips += 1
+        logger.error(
+            f"Redis circuit breaker opened after {self._failures} failed or slow calls, "
+            f"serving from the local fallback cache"
+        )
+        self._start_prober()
+
+    @contextmanager
+    def guard(self, timed: bool = True):
+        """
+        Run a Redis call through the breaker
+
+        Args:
+            timed: Count the call as a failure when it is slow; pass False for
+                maintenance and bulk calls that are expected to take a while
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        if not self.allow():
+            raise CircuitOpenError('Redis circuit breaker is open')
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.perf_counter() - started if timed else 0.0)
+
+    def stats(self) -> dict:
+        """Get the breaker state for monitoring"""
+        return {
+            'state': self._state,
+            'consecutive_failures': self._failures,
+            'opened_at': self._opened_at,
+            'trips': self._trips,
+        }
+
+    def _start_prober(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._prober_pid == pid:
+                return
+            self._prober_pid = pid
+        threading.Thread(target=self._probe_until_healthy, name='redis-circuit-probe', daemon=True).start()
+
+    def _probe_until_healthy(self):
+        """Ping Redis in the background until it answers, then close the breaker"""
+        while True:
+            time.sleep(self.reset_timeout)
+            try:
+                healthy = self.probe()
+            except Exception:
+                healthy = False
+            if healthy:
+                break
+
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._prober_pid = None
+        logger.warning('Redis circuit breaker closed, Redis is reachable again')
+        if self.on_recover is not None:
+            try:
+                self.on_recover()
+            except Exception as e:
+                logger.warning(f"Redis circuit breaker recovery error: {e}")
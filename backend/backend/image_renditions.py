@@ -0,0 +1,203 @@
+"""
+Resized copies of uploaded images, made in the background
+
+Uploads are stored as they are. Once the save that changed an image commits,
+the object is queued in Redis and the process_images worker writes every
+rendition in IMAGE_RENDITIONS['SIZES'] as WebP and JPEG under
+
+    renditions/{digest}/{rendition}.{webp|jpg}
+
+where digest is a hash of the source bytes, then stores the digest on the
+object (the hash field paired with the image field in rendition_fields).
+Uploading the same image again does no work, and rendition URLs never change
+content, so they can be cached forever.
+
+Until an image is processed, its rendition URLs fall back to the original.
+"""
+
+from functools import lru_cache
+from io import BytesIO
+import hashlib
+import json
+import logging
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+import redis
+from backend.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+_rendition_settings = getattr(settings, 'IMAGE_RENDITIONS', {})
+SIZES = _rendition_settings.get('SIZES', {
+    'thumbnail': (200, 200),
+    'card': (400, 400),
+    'detail': (1000, 1000),
+})
+
+# Seconds the worker waits on an empty queue before next_job() returns None
+BLOCK_TIMEOUT = 5
+
+# Format -> (Pillow format, file extension, save options)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def _queue_key() -> str:
+    return f"{settings.CACHES['default']['KEY_PREFIX']}:images:queue"
+
+
+def _name(value) -> str:
+    return getattr(value, 'name', value) or ''
+
+
+def rendition_path(digest: str, rendition: str, format: str) -> str:
+    return f"renditions/{digest}/{rendition}.{FORMATS[format][1]}"
+
+
+def rendition_url(obj, field_name: str, rendition: str, format: str = 'jpeg'):
+    """URL of one rendition of an image, the original's until it's processed, None without an image"""
+    image = getattr(obj, field_name)
+    if not image or not hasattr(image, 'url'):
+        return None
+    digest = getattr(obj, obj.rendition_fields.get(field_name, ''), '')
+    if not digest:
+        return image.url
+    return default_storage.url(rendition_path(digest, rendition, format))
+
+
+class RenditionsMixin:
+    """
+    Model mixin queueing the renditions of images that changed on save
+
+    Call queue_changed_images() at the end of save().
+    """
+
+    # Image field -> field holding the digest of its processed source
+    rendition_fields = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_images = {
+            field: _name(instance.__dict__[field]) for field in cls.rendition_fields if field in instance.__dict__
+        }
+        return instance
+
+    def queue_changed_images(self, update_fields=None):
+        loaded = getattr(self, '_loaded_images', {})
+        for field, hash_field in self.rendition_fields.items():
+            if field not in self.__dict__ or (update_fields is not None and field not in update_fields):
+                continue
+            name = _name(self.__dict__[field])
+            if name == loaded.get(field, ''):
+                continue
+            loaded[field] = name
+            if name:
+                queue_renditions(self, field)
+            elif getattr(self, hash_field):
+                setattr(self, hash_field, '')
+                type(self).objects.filter(pk=self.pk).update(**{hash_field: ''})
+        self._loaded_images = loaded
+
+
+def queue_renditions(obj, field_name: str):
+    """Have the worker process an image once the current transaction commits"""
+    job = json.dumps({'model': obj._meta.label_lower, 'pk': obj.pk, 'field': field_name})
+
+    def push():
+        try:
+            with redis_client.breaker.guard():
+                redis_client.client.rpush(_queue_key(), job)
+        except Exception as e:
+            logger.warning(f"Redis IMAGES error: {e}")
+
+    transaction.on_commit(push)
+
+
+@lru_cache(maxsize=None)
+def _worker_client() -> redis.Redis:
+    """
+    Connection for the blocking queue reads
+
+    The shared client's socket timeout (SOCKET_TIMEOUT, about a second) is
+    shorter than a BLPOP on an empty queue, so the worker has its own.
+    """
+    cache_options = settings.CACHES['default'].get('OPTIONS', {})
+    return redis.Redis(
+        host=settings.REDIS_HOST,
+        port=int(settings.REDIS_PORT),
+        db=int(settings.REDIS_DB),
+        decode_responses=True,
+        socket_timeout=BLOCK_TIMEOUT + 5,
+        socket_connect_timeout=cache_options.get('SOCKET_CONNECT_TIMEOUT'),
+    )
+
+
+def next_job(timeout: int = BLOCK_TIMEOUT):
+    """
+    Next queued (model label, pk, field), None once the queue stayed empty for timeout seconds
+
+    Raises:
+        redis.RedisError: If Redis can't be reached
+    """
+    item = _worker_client().blpop([_queue_key()], timeout=min(timeout, BLOCK_TIMEOUT))
+    if item is None:
+        return None
+    job = json.loads(item[1])
+    return job['model'], job['pk'], job['field']
+
+
+def process(model_label: str, pk, field_name: str) -> bool:
+    """
+    Write the renditions of an object's image, unless its source was already processed
+
+    Returns:
+        True if renditions were written
+    """
+    model = apps.get_model(model_label)
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None:
+        return False
+    image = getattr(obj, field_name)
+    if not image:
+        return False
+
+    with image.open('rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    hash_field = model.rendition_fields[field_name]
+    if getattr(obj, hash_field) == digest:
+        return False
+
+    write_renditions(data, digest)
+    setattr(obj, hash_field, digest)
+    # Through save() so the model's signals drop the cached responses showing the image
+    obj.save(update_fields=[hash_field])
+    return True
+
+
+def write_renditions(data: bytes, digest: str):
+    """Resize an image to every size and format, skipping the files already stored"""
+    source = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    for rendition, size in SIZES.items():
+        resized = source.copy()
+        resized.thumbnail(tuple(size))
+        for format, (pil_format, extension, options) in FORMATS.items():
+            path = rendition_path(digest, rendition, format)
+            if default_storage.exists(path):
+                continue
+            image = resized
+            if pil_format == 'JPEG':
+                image = resized.convert('RGB')
+            elif resized.mode not in ('RGB', 'RGBA'):
+                image = resized.convert('RGBA' if 'A' in resized.mode or 'transparency' in resized.info else 'RGB')
+            output = BytesIO()
+            image.save(output, format=pil_format, **options)
+            default_storage.save(path, ContentFile(output.getvalue()))
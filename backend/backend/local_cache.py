@@ -0,0 +1,129 @@
+"""
+In-process cache used as a first tier (L1) in front of Redis
+Each worker process keeps its own bounded LRU of decoded values
+"""
+
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Optional
+
+
+class LocalCache:
+    """Thread-safe LRU cache bounded by entry count and payload bytes, with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, timeout: int = 60):
+        """
+        Initialize the local cache
+
+        Args:
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total payload size kept (as reported by set())
+            timeout: Maximum lifetime of an entry in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a value, refreshing its LRU position
+
+        Args:
+            key: Cache key
+            default: Value returned on miss or expiry
+
+        Returns:
+            Cached value or default
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, _, value = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, size: int = 0) -> bool:
+        """
+        Store a value, evicting least recently used entries when over limits
+
+        Args:
+            key: Cache key
+            value: Value to store (kept by reference, callers must not mutate it)
+            timeout: Lifetime in seconds, capped at the cache timeout
+            size: Payload size in bytes used for the byte limit
+
+        Returns:
+            True if stored, False if the entry is too large or already expired
+        """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        with self._lock:
+            self._remove(key)
+            if timeout <= 0 or size > self.max_bytes:
+                return False
+            self._data[key] = (time.monotonic() + timeout, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def delete(self, *keys: str) -> None:
+        """Drop one or more keys"""
+        with self._lock:
+            for key in keys:
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get usage counters
+
+        Returns:
+            Dictionary with hits, misses, hit rate, size and limits
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'timeout': self.timeout,
+            }
+
+    def _remove(self, key: str) -> bool:
+        """Remove a key, caller must hold the lock"""
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
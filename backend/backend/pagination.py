@@ -0,0 +1,201 @@
+"""
+Keyset (cursor) pagination for large lists
+
+Pages are read with a WHERE on the sort key of the last row seen instead of
+an OFFSET, e.g. for orders sorted by (-date, -id):
+
+    WHERE date < :date OR (date = :date AND id < :id)
+    ORDER BY date DESC, id DESC LIMIT :limit + 1
+
+so every page costs the same however deep it is. The position is carried in
+opaque next / previous cursor links; the id always ends the sort key so rows
+sharing a date are neither skipped nor repeated.
+
+Responses keep the LimitOffsetPagination shape (count, next, previous,
+results). count is cached for PAGINATION['COUNT_TIMEOUT'] seconds, so it may
+lag behind a little, and is left out with ?count=false. Lists whose order is
+not made of plain fields (e.g. search ranking) and requests still using
+?offset= are paginated by offset, up to PAGINATION['MAX_OFFSET'].
+"""
+
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .redis_client import redis_client
+
+_pagination_settings = getattr(settings, 'PAGINATION', {})
+MAX_LIMIT = _pagination_settings.get('MAX_LIMIT', 100)
+MAX_OFFSET = _pagination_settings.get('MAX_OFFSET', 1000)
+COUNT_TIMEOUT = _pagination_settings.get('COUNT_TIMEOUT', 60)
+
+
+def cached_count(queryset) -> int:
+    """Row count of a queryset, cached for COUNT_TIMEOUT seconds by its SQL"""
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    cache_key = f"pagination:count:{hashlib.md5(sql.encode()).hexdigest()}"
+    count = redis_client.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        redis_client.set(cache_key, count, timeout=COUNT_TIMEOUT)
+    return count
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Cursor pagination on the queryset's order, with the primary key appended
+
+    ?limit= sets the page size (up to MAX_LIMIT), ?cursor= comes from the
+    next / previous links of a previous page.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    max_limit = MAX_LIMIT
+    invalid_cursor_message = 'Invalid cursor'
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        ordering = self.get_ordering(queryset)
+        if ordering is None or (self.offset_query_param in request.query_params
+                                and self.cursor_query_param not in request.query_params):
+            return self._paginate_by_offset(queryset, request, view)
+
+        self.keyset = True
+        self.ordering = ordering
+        self.count = self.get_count(queryset)
+        values, reverse = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*(_flip(field) if reverse else field for field in ordering))
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, values, reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        # Moving backwards, a next page exists (we came from it); moving
+        # forwards, a previous one does once a cursor has been followed
+        has_next = reverse or has_more
+        has_previous = has_more if reverse else values is not None
+        self.next_cursor = self.encode_cursor(rows[-1], reverse=False) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], reverse=True) if rows and has_previous else None
+        return rows
+
+    def _paginate_by_offset(self, queryset, request, view):
+        self.keyset = False
+        if self.get_offset(request) > MAX_OFFSET:
+            raise NotFound(f'Offsets above {MAX_OFFSET} are not served, follow the next links instead.')
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, queryset):
+        """
+        Sort key of the queryset, ending with the primary key
+
+        Returns:
+            Field names ('-' prefixed when descending), or None if the order
+            isn't made of plain fields or the queryset is a union
+        """
+        # Combined (UNION) querysets can't be filtered on the sort key
+        if queryset.query.combinator:
+            return None
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering or [])
+        if not all(isinstance(field, str) and '__' not in field and '?' not in field for field in ordering):
+            return None
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append(f"-{pk_name}" if descending else pk_name)
+        return ordering
+
+    def get_count(self, queryset):
+        if self.keyset and self.request.query_params.get(self.count_query_param, '').lower() in ('0', 'false', 'no'):
+            return None
+        return cached_count(queryset)
+
+    def _after(self, ordering, values, reverse) -> Q:
+        """Rows strictly after a sort key in the direction of reading"""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        values = [_plain(getattr(row, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'k': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        """Sort key and direction of the requested page, (None, False) for the first one"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values, reverse = payload['k'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+def _flip(field: str) -> str:
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _plain(value):
+    """Sort key value as JSON"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
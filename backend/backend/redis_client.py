@@ -1,13 +1,68 @@
 """
 Redis client utility for E-Commerce application
 Provides easy access to Redis for caching, sessions, and real-time data
+
+Values are encoded once by a pluggable serializer (see CACHE_ENCODING) and
+written as raw bytes, compressed above a size threshold. Entries written in
+the older pickled-JSON format are still readable until they expire.
+
+Reads go through a per-process LRU (L1) before Redis. Writes, deletes and
+namespace invalidations are broadcast over Redis pub/sub so every worker
+drops its stale L1 copies.
+
+Cache operations are counted per key family (see CACHE_METRICS); use
+get_metrics() or the cache_stats management command to inspect them.
+
+Keys can also be recorded under tags (add_dependencies) and dropped together
+with invalidate_tags(), for entries that only some writes should invalidate.
+
+Every Redis call goes through a circuit breaker (see REDIS_CIRCUIT_BREAKER).
+While it is open, calls skip Redis and use a small per-process fallback cache;
+invalidations made meanwhile are replayed once Redis is reachable again.
 """
 
 from django.core.cache import cache
 from django.conf import settings
+from django_redis import get_redis_connection
+from backend.cache_metrics import CacheMetrics
+from backend.circuit_breaker import CircuitBreaker, CircuitOpenError
+from backend.cache_serializers import (
+    CacheCodec,
+    get_serializer,
+    ENTRY_VALUE as _ENTRY_VALUE,
+    ENTRY_EXPIRES_AT as _ENTRY_EXPIRES_AT,
+    ENTRY_DELTA as _ENTRY_DELTA,
+)
+from backend.local_cache import LocalCache
 import redis
 import json
-from typing import Any, Optional
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Seconds a logically expired read_through() value may still be served
+DEFAULT_STALE_TIMEOUT = 120
+
+# Invalidations kept for replay while Redis is unreachable
+MAX_REPLAY_KEYS = 10000
+
+# Delete a lock only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
 
 
 class RedisClient:
@@ -15,37 +70,293 @@ class RedisClient:
     
     def __init__(self):
         """Initialize Redis client"""
+        cache_options = settings.CACHES['default'].get('OPTIONS', {})
         self._redis = redis.Redis(
             host=settings.REDIS_HOST,
             port=int(settings.REDIS_PORT),
             db=int(settings.REDIS_DB),
-            decode_responses=True
+            decode_responses=True,
+            socket_timeout=cache_options.get('SOCKET_TIMEOUT'),
+            socket_connect_timeout=cache_options.get('SOCKET_CONNECT_TIMEOUT'),
+        )
+        
+        local_settings = getattr(settings, 'LOCAL_CACHE', {})
+        self._local = None
+        if local_settings.get('ENABLED', True):
+            self._local = LocalCache(
+                max_entries=local_settings.get('MAX_ENTRIES', 1000),
+                max_bytes=local_settings.get('MAX_BYTES', 32 * 1024 * 1024),
+                timeout=local_settings.get('TIMEOUT', 60),
+            )
+        self._channel = local_settings.get(
+            'INVALIDATION_CHANNEL',
+            f"{settings.CACHES['default']['KEY_PREFIX']}:cache:invalidate"
         )
+        self._instance_id = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        
+        encoding_settings = getattr(settings, 'CACHE_ENCODING', {})
+        self._codec = CacheCodec(
+            get_serializer(encoding_settings.get('SERIALIZER', 'orjson')),
+            compress_min_bytes=encoding_settings.get('COMPRESS_MIN_BYTES', 16 * 1024),
+            compress_level=encoding_settings.get('COMPRESS_LEVEL', 1),
+        )
+        
+        metrics_settings = getattr(settings, 'CACHE_METRICS', {})
+        self._metrics = None
+        if metrics_settings.get('ENABLED', True):
+            self._metrics = CacheMetrics(
+                settings.CACHES['default']['KEY_PREFIX'],
+                flush_interval=metrics_settings.get('FLUSH_INTERVAL', 10),
+            )
+        
+        breaker_settings = getattr(settings, 'REDIS_CIRCUIT_BREAKER', {})
+        self._breaker = CircuitBreaker(
+            self._probe,
+            failure_threshold=breaker_settings.get('FAILURE_THRESHOLD', 5) if breaker_settings.get('ENABLED', True) else 0,
+            slow_call_seconds=breaker_settings.get('SLOW_CALL_SECONDS', 0.5),
+            reset_timeout=breaker_settings.get('RESET_TIMEOUT', 5),
+            on_recover=self._replay_invalidations,
+        )
+        self._fallback = LocalCache(
+            max_entries=breaker_settings.get('FALLBACK_MAX_ENTRIES', 1000),
+            max_bytes=breaker_settings.get('FALLBACK_MAX_BYTES', 16 * 1024 * 1024),
+            timeout=breaker_settings.get('FALLBACK_TIMEOUT', 30),
+        )
+        self._replay = {'keys': {}, 'namespaces': {}, 'tags': {}}
+        self._replay_lock = threading.Lock()
     
     @property
     def client(self):
         """Get raw Redis client"""
         return self._redis
     
+    @property
+    def codec(self) -> CacheCodec:
+        """Get the codec used to encode cached values"""
+        return self._codec
+    
+    @staticmethod
+    def _connection():
+        """Binary connection from the django-redis pool (uses the CACHES socket timeouts)"""
+        return get_redis_connection('default')
+    
+    def _record(self, key: str, outcome: str, latency: Optional[float] = None, size: Optional[int] = None):
+        """Count a cache operation for the key's family"""
+        if self._metrics is None:
+            return
+        if self._metrics.record(key, outcome, latency, size) and self._breaker.allow():
+            self._metrics.flush(self._connection())
+    
+    @staticmethod
+    def _log_error(operation: str, error: Exception):
+        """Log a failed Redis call, staying quiet while the circuit breaker is open"""
+        if not isinstance(error, CircuitOpenError):
+            logger.warning(f"Redis {operation} error: {error}")
+    
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Get the circuit breaker guarding Redis calls"""
+        return self._breaker
+    
+    @property
+    def available(self) -> bool:
+        """Check whether Redis calls are allowed (the circuit breaker is closed)"""
+        return self._breaker.allow()
+    
+    def get_circuit_breaker_stats(self) -> dict:
+        """
+        Get the circuit breaker state for this worker process
+        
+        Returns:
+            Dictionary with state, consecutive failures, trips and fallback cache counters
+        """
+        stats = self._breaker.stats()
+        stats['fallback_cache'] = self._fallback.stats()
+        with self._replay_lock:
+            stats['pending_replay'] = {name: len(items) for name, items in self._replay.items()}
+        return stats
+    
+    def _probe(self) -> bool:
+        """Health check used by the circuit breaker while it is open"""
+        return bool(self._redis.ping())
+    
+    def _defer_replay(self, keys=(), namespaces=(), tags=()):
+        """Remember invalidations that could not reach Redis, and drop fallback copies"""
+        self._fallback.clear()
+        with self._replay_lock:
+            self._replay['namespaces'].update(dict.fromkeys(namespaces))
+            self._replay['tags'].update(dict.fromkeys(tags))
+            if len(self._replay['keys']) + len(keys) > MAX_REPLAY_KEYS:
+                logger.error(f"Redis replay queue full, dropping {len(keys)} key invalidations")
+                return
+            self._replay['keys'].update(dict.fromkeys(keys))
+    
+    def _replay_invalidations(self):
+        """Apply invalidations made while the circuit breaker was open"""
+        with self._replay_lock:
+            replay, self._replay = self._replay, {'keys': {}, 'namespaces': {}, 'tags': {}}
+        self._fallback.clear()
+        if self._local is not None:
+            self._local.clear()
+        if replay['namespaces']:
+            self.invalidate_namespace(*replay['namespaces'])
+        if replay['tags'] or replay['keys']:
+            self.invalidate_tags(*replay['tags'], keys=list(replay['keys']))
+        logger.warning(
+            f"Replayed {len(replay['namespaces'])} namespace, {len(replay['tags'])} tag "
+            f"and {len(replay['keys'])} key invalidations after Redis recovered"
+        )
+    
+    def get_metrics(self) -> dict:
+        """
+        Get cache counters aggregated over all workers, per key family
+        
+        Returns:
+            Dictionary of family -> hits, misses, errors, latency and sizes
+        """
+        if self._metrics is None:
+            return {}
+        try:
+            with self._breaker.guard():
+                return self._metrics.snapshot(self._connection())
+        except Exception as e:
+            self._log_error('METRICS', e)
+            return {}
+    
+    def reset_metrics(self) -> bool:
+        """
+        Drop all aggregated cache counters
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if self._metrics is None:
+            return True
+        try:
+            with self._breaker.guard():
+                self._metrics.reset(self._connection())
+            return True
+        except Exception as e:
+            self._log_error('METRICS RESET', e)
+            return False
+    
+    @property
+    def local_cache(self) -> Optional[LocalCache]:
+        """Get the in-process L1 cache, or None if disabled"""
+        return self._local
+    
+    def get_local_cache_stats(self) -> Optional[dict]:
+        """
+        Get L1 cache counters for this worker process
+        
+        Returns:
+            Dictionary with hits, misses, hit rate and size, or None if disabled
+        """
+        if self._local is None:
+            return None
+        return self._local.stats()
+    
+    def _ensure_listener(self):
+        """Start the invalidation listener once per process (also after a fork)"""
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._listener_lock:
+            if self._listener_pid == pid:
+                return
+            # Entries inherited from a parent process are not covered by our subscription
+            self._local.clear()
+            self._instance_id = uuid.uuid4().hex
+            self._listener_pid = pid
+            threading.Thread(
+                target=self._listen_for_invalidations,
+                name='redis-cache-invalidation',
+                daemon=True,
+            ).start()
+    
+    def _listen_for_invalidations(self):
+        """Apply invalidation messages from other workers, reconnecting on errors"""
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                # Messages published while we were not subscribed are lost
+                self._local.clear()
+                while True:
+                    # Poll rather than listen(), which would hit the socket timeout when idle
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._apply_invalidation(message.get('data'))
+            except Exception as e:
+                logger.warning(f"Redis PUBSUB error: {e}")
+                self._local.clear()
+                time.sleep(1)
+    
+    def _apply_invalidation(self, data: str):
+        """Drop L1 entries named in an invalidation message"""
+        try:
+            message = json.loads(data)
+        except (json.JSONDecodeError, TypeError):
+            return
+        if message.get('sender') == self._instance_id:
+            return
+        if message.get('flush'):
+            self._local.clear()
+            return
+        keys = list(message.get('keys', []))
+        keys += [self._namespace_key(namespace) for namespace in message.get('namespaces', [])]
+        self._local.delete(*keys)
+    
+    def _publish_invalidation(self, keys=(), namespaces=(), flush: bool = False):
+        """Tell other workers to drop L1 entries"""
+        if self._local is None:
+            return
+        self._ensure_listener()
+        try:
+            with self._breaker.guard():
+                self._redis.publish(self._channel, json.dumps({
+                    'sender': self._instance_id,
+                    'keys': list(keys),
+                    'namespaces': list(namespaces),
+                    'flush': flush,
+                }))
+        except Exception as e:
+            self._log_error('PUBLISH', e)
+    
     def set(self, key: str, value: Any, timeout: int = 300) -> bool:
         """
         Set a value in Redis with optional timeout
         
         Args:
             key: Redis key
-            value: Value to store (will be JSON serialized)
-            timeout: Expiration time in seconds (default: 5 minutes)
+            value: Value to store (encoded with the configured serializer)
+            timeout: Expiration time in seconds, None for no expiry (default: 5 minutes)
         
         Returns:
             True if successful, False otherwise
         """
+        started = time.perf_counter()
         try:
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            return cache.set(key, value, timeout)
+            payload = self._codec.encode(value)
+            expiry = None if timeout is None else max(int(timeout), 1)
+            with self._breaker.guard():
+                result = bool(self._connection().set(cache.make_key(key), payload, ex=expiry))
+        except CircuitOpenError:
+            self._fallback.set(key, value, timeout)
+            self._record(key, 'fallback_set')
+            return False
         except Exception as e:
-            print(f"Redis SET error: {e}")
+            self._log_error('SET', e)
+            self._record(key, 'error')
             return False
+        self._record(key, 'set', time.perf_counter() - started, len(payload))
+        
+        if self._local is not None and result is not False:
+            self._local.set(key, value, timeout, size=len(payload))
+            self._publish_invalidation(keys=[key])
+        return result
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -58,17 +369,64 @@ class RedisClient:
         Returns:
             Value from Redis or default
         """
+        if self._local is not None:
+            self._ensure_listener()
+            value = self._local.get(key, _MISSING)
+            if value is not _MISSING:
+                self._record(key, 'l1_hit')
+                return value
+        
+        started = time.perf_counter()
         try:
-            value = cache.get(key, default)
-            if value and isinstance(value, str):
-                try:
-                    return json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    return value
-            return value
+            with self._breaker.guard():
+                payload = self._connection().get(cache.make_key(key))
+                encoded = payload is not None and self._codec.is_encoded(payload)
+                if payload is not None and not encoded:
+                    value = self._get_legacy(key)
+        except CircuitOpenError:
+            return self._get_fallback(key, default)
         except Exception as e:
-            print(f"Redis GET error: {e}")
+            self._log_error('GET', e)
+            self._record(key, 'error')
+            return default
+        latency = time.perf_counter() - started
+        
+        # Decoded outside the breaker: a bad payload is a miss, not a Redis failure
+        if encoded:
+            try:
+                value = self._codec.decode(payload)
+            except Exception as e:
+                self._log_error('GET decode', e)
+                value = _MISSING
+        
+        if payload is None or value is _MISSING:
+            self._record(key, 'miss', latency)
+            return default
+        self._record(key, 'hit', latency, len(payload))
+        
+        if self._local is not None:
+            self._local.set(key, value, size=len(payload))
+        return value
+    
+    def _get_fallback(self, key: str, default: Any = None) -> Any:
+        """Read a value from the fallback cache used while the circuit breaker is open"""
+        value = self._fallback.get(key, _MISSING)
+        if value is _MISSING:
+            self._record(key, 'miss')
             return default
+        self._record(key, 'fallback_hit')
+        return value
+    
+    @staticmethod
+    def _get_legacy(key: str) -> Any:
+        """Read an entry stored by django-redis as a pickled (JSON) string"""
+        value = cache.get(key, _MISSING)
+        if value and isinstance(value, str):
+            try:
+                return json.loads(value)
+            except (json.JSONDecodeError, TypeError):
+                pass
+        return value
     
     def delete(self, key: str) -> bool:
         """
@@ -80,12 +438,158 @@ class RedisClient:
         Returns:
             True if successful, False otherwise
         """
+        if self._local is not None:
+            self._local.delete(key)
+        try:
+            with self._breaker.guard():
+                cache.delete(key)
+        except Exception as e:
+            self._log_error('DELETE', e)
+            self._record(key, 'error')
+            self._defer_replay(keys=[key])
+            return False
+        self._record(key, 'delete')
+        self._publish_invalidation(keys=[key])
+        return True
+    
+    def get_many(self, keys: list) -> dict:
+        """
+        Get several values in one round-trip (MGET)
+        
+        Args:
+            keys: Redis keys
+        
+        Returns:
+            Dictionary of key -> value for the keys that exist
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            if self._local is not None:
+                self._ensure_listener()
+                value = self._local.get(key, _MISSING)
+                if value is not _MISSING:
+                    self._record(key, 'l1_hit')
+                    found[key] = value
+                    continue
+            missing.append(key)
+        
+        if not missing:
+            return found
+        
+        try:
+            with self._breaker.guard():
+                payloads = self._connection().mget([cache.make_key(key) for key in missing])
+        except CircuitOpenError:
+            for key in missing:
+                value = self._get_fallback(key, _MISSING)
+                if value is not _MISSING:
+                    found[key] = value
+            return found
+        except Exception as e:
+            self._log_error('MGET', e)
+            for key in missing:
+                self._record(key, 'error')
+            return found
+        
+        # One round-trip for all keys, so latency is not attributed per key
+        for key, payload in zip(missing, payloads):
+            if payload is None:
+                self._record(key, 'miss')
+                continue
+            try:
+                if self._codec.is_encoded(payload):
+                    value = self._codec.decode(payload)
+                else:
+                    with self._breaker.guard():
+                        value = self._get_legacy(key)
+                    if value is _MISSING:
+                        self._record(key, 'miss')
+                        continue
+            except Exception as e:
+                self._log_error(f'MGET decode ({key})', e)
+                self._record(key, 'miss')
+                continue
+            self._record(key, 'hit', size=len(payload))
+            found[key] = value
+            if self._local is not None:
+                self._local.set(key, value, size=len(payload))
+        return found
+    
+    def set_many(self, mapping: dict, timeout: int = 300, timeouts: Optional[dict] = None) -> bool:
+        """
+        Set several values in one pipelined round-trip
+        
+        Args:
+            mapping: Dictionary of key -> value
+            timeout: Default expiration time in seconds, None for no expiry
+            timeouts: Optional per-key expiration times overriding timeout
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if not mapping:
+            return True
+        timeouts = timeouts or {}
         try:
-            cache.delete(key)
+            pipe = self._connection().pipeline(transaction=False)
+            sizes = {}
+            for key, value in mapping.items():
+                payload = self._codec.encode(value)
+                sizes[key] = len(payload)
+                key_timeout = timeouts.get(key, timeout)
+                expiry = None if key_timeout is None else max(int(key_timeout), 1)
+                pipe.set(cache.make_key(key), payload, ex=expiry)
+            # Bulk writes (warmup) may be slow without Redis being unhealthy
+            with self._breaker.guard(timed=False):
+                pipe.execute()
+        except CircuitOpenError:
+            for key, value in mapping.items():
+                self._fallback.set(key, value, timeouts.get(key, timeout))
+                self._record(key, 'fallback_set')
+            return False
+        except Exception as e:
+            self._log_error('SET_MANY', e)
+            for key in mapping:
+                self._record(key, 'error')
+            return False
+        for key in mapping:
+            self._record(key, 'set', size=sizes[key])
+        
+        if self._local is not None:
+            for key, value in mapping.items():
+                self._local.set(key, value, timeouts.get(key, timeout), size=sizes[key])
+            self._publish_invalidation(keys=list(mapping))
+        return True
+    
+    def delete_many(self, keys: list) -> bool:
+        """
+        Delete several keys with a single DEL
+        
+        Args:
+            keys: Redis keys to delete
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
             return True
+        if self._local is not None:
+            self._local.delete(*keys)
+        try:
+            with self._breaker.guard():
+                self._connection().delete(*[cache.make_key(key) for key in keys])
         except Exception as e:
-            print(f"Redis DELETE error: {e}")
+            self._log_error('DELETE_MANY', e)
+            for key in keys:
+                self._record(key, 'error')
+            self._defer_replay(keys=keys)
             return False
+        for key in keys:
+            self._record(key, 'delete')
+        self._publish_invalidation(keys=keys)
+        return True
     
     def exists(self, key: str) -> bool:
         """
@@ -98,9 +602,12 @@ class RedisClient:
             True if key exists, False otherwise
         """
         try:
-            return cache.has_key(key)
+            with self._breaker.guard():
+                return cache.has_key(key)
+        except CircuitOpenError:
+            return self._fallback.get(key, _MISSING) is not _MISSING
         except Exception as e:
-            print(f"Redis EXISTS error: {e}")
+            self._log_error('EXISTS', e)
             return False
     
     def incr(self, key: str, amount: int = 1) -> Optional[int]:
@@ -115,9 +622,10 @@ class RedisClient:
             New value after increment, or None on error
         """
         try:
-            return self._redis.incr(key, amount)
+            with self._breaker.guard():
+                return self._redis.incr(key, amount)
         except Exception as e:
-            print(f"Redis INCR error: {e}")
+            self._log_error('INCR', e)
             return None
     
     def expire(self, key: str, seconds: int) -> bool:
@@ -132,14 +640,19 @@ class RedisClient:
             True if successful, False otherwise
         """
         try:
-            return self._redis.expire(key, seconds)
+            with self._breaker.guard():
+                return self._redis.expire(key, seconds)
         except Exception as e:
-            print(f"Redis EXPIRE error: {e}")
+            self._log_error('EXPIRE', e)
             return False
     
     def clear_pattern(self, pattern: str) -> int:
         """
         Delete all keys matching a pattern
+
+        Uses incremental SCAN rather than KEYS so Redis is never blocked, but it
+        still walks the whole keyspace. Request-path invalidation should use
+        invalidate_namespace() instead; this is meant for maintenance commands.
         
         Args:
             pattern: Pattern to match (e.g., 'user:*')
@@ -147,14 +660,315 @@ class RedisClient:
         Returns:
             Number of keys deleted
         """
+        if self._local is not None:
+            self._local.clear()
+        self._fallback.clear()
         try:
-            keys = self._redis.keys(f"{settings.CACHES['default']['KEY_PREFIX']}:{pattern}")
-            if keys:
-                return self._redis.delete(*keys)
+            with self._breaker.guard(timed=False):
+                deleted = cache.delete_pattern(pattern, itersize=1000) or 0
+        except Exception as e:
+            self._log_error('CLEAR_PATTERN', e)
             return 0
+        self._publish_invalidation(flush=True)
+        return deleted
+    
+    def _namespace_key(self, namespace: str) -> str:
+        """Raw Redis key holding the version counter of a namespace"""
+        return f"{settings.CACHES['default']['KEY_PREFIX']}:ns:{namespace}"
+    
+    def get_namespace_version(self, namespace: str) -> int:
+        """
+        Get the current version of a cache namespace
+        
+        Missing counters (first use or evicted) are seeded from the clock in
+        milliseconds, so a reset counter never reuses a version that may still
+        have live entries.
+        
+        Args:
+            namespace: Namespace name (e.g., 'products:list')
+        
+        Returns:
+            Current namespace version, or 0 on error
+        """
+        ns_key = self._namespace_key(namespace)
+        if self._local is not None:
+            self._ensure_listener()
+            version = self._local.get(ns_key)
+            if version is not None:
+                return version
+        
+        try:
+            with self._breaker.guard():
+                version = self._redis.get(ns_key)
+                if version is None:
+                    self._redis.set(ns_key, int(time.time() * 1000), nx=True)
+                    version = self._redis.get(ns_key)
+            version = int(version)
         except Exception as e:
-            print(f"Redis CLEAR_PATTERN error: {e}")
+            self._log_error('NAMESPACE VERSION', e)
             return 0
+        
+        if self._local is not None:
+            self._local.set(ns_key, version)
+        return version
+    
+    def versioned_key(self, namespace: str, key: Any = None) -> str:
+        """
+        Build a cache key inside the current version of a namespace
+        
+        Args:
+            namespace: Namespace name (e.g., 'products:list')
+            key: Optional key suffix within the namespace
+        
+        Returns:
+            Key such as 'products:list:v12:ab34cd56'
+        """
+        version = self.get_namespace_version(namespace)
+        if key is None or key == '':
+            return f"{namespace}:v{version}"
+        return f"{namespace}:v{version}:{key}"
+    
+    def invalidate_namespace(self, *namespaces: str) -> bool:
+        """
+        Invalidate every entry of one or more namespaces
+        
+        Bumps each namespace version with a single pipelined INCR. Entries
+        written under older versions are never read again and age out by TTL.
+        
+        Args:
+            namespaces: Namespace names to invalidate
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if not namespaces:
+            return True
+        namespaces = list(dict.fromkeys(namespaces))
+        ns_keys = [self._namespace_key(namespace) for namespace in namespaces]
+        if self._local is not None:
+            self._local.delete(*ns_keys)
+        try:
+            seed = int(time.time() * 1000)
+            pipe = self._redis.pipeline(transaction=False)
+            for ns_key in ns_keys:
+                pipe.set(ns_key, seed, nx=True)
+                pipe.incr(ns_key)
+            with self._breaker.guard():
+                results = pipe.execute()
+        except Exception as e:
+            self._log_error('INVALIDATE NAMESPACE', e)
+            self._defer_replay(namespaces=namespaces)
+            return False
+        
+        if self._local is not None:
+            # Every other result is the INCR reply, i.e. the new version
+            for ns_key, version in zip(ns_keys, results[1::2]):
+                self._local.set(ns_key, int(version))
+        self._publish_invalidation(namespaces=namespaces)
+        return True
+    
+    def _tag_key(self, tag: str) -> str:
+        """Raw Redis key of the set holding the cache keys recorded under a tag"""
+        return f"{settings.CACHES['default']['KEY_PREFIX']}:deps:{tag}"
+    
+    def add_dependencies(self, key: str, tags: list, timeout: int) -> bool:
+        """
+        Record that a cached key depends on one or more tags
+        
+        invalidate_tags() on any of the tags then deletes the key. Record
+        dependencies before writing the key, so an invalidation that runs in
+        between is not missed.
+        
+        Args:
+            key: Cache key
+            tags: Tag names (e.g., 'products:list:v12:product:42')
+            timeout: Seconds to keep the tag sets, at least the key's TTL
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if not tags:
+            return True
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for tag in dict.fromkeys(tags):
+                tag_key = self._tag_key(tag)
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, max(int(timeout), 1))
+            with self._breaker.guard():
+                pipe.execute()
+            return True
+        except Exception as e:
+            self._log_error('ADD DEPENDENCIES', e)
+            return False
+    
+    def invalidate_tags(self, *tags: str, keys: Optional[list] = None) -> bool:
+        """
+        Delete every key recorded under one or more tags
+        
+        Args:
+            tags: Tag names passed to add_dependencies()
+            keys: Other keys to delete with the same DEL
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        keys = set(keys or ())
+        if not tags:
+            return self.delete_many(sorted(keys))
+        tag_keys = [self._tag_key(tag) for tag in dict.fromkeys(tags)]
+        try:
+            # Read and drop the sets atomically so concurrently added keys are not lost
+            pipe = self._redis.pipeline(transaction=True)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            pipe.delete(*tag_keys)
+            with self._breaker.guard():
+                results = pipe.execute()
+        except Exception as e:
+            self._log_error('INVALIDATE TAGS', e)
+            self._defer_replay(keys=sorted(keys), tags=tags)
+            return False
+        
+        for members in results[:-1]:
+            keys.update(members)
+        return self.delete_many(sorted(keys))
+    
+    @staticmethod
+    def make_entry(value: Any, timeout: int = 300, delta: float = 0.0) -> dict:
+        """
+        Wrap a value in the envelope used by read_through()
+        
+        Store it for timeout + DEFAULT_STALE_TIMEOUT seconds, e.g. with set_many().
+        
+        Args:
+            value: Value to store
+            timeout: Seconds until the value is considered stale
+            delta: Seconds it took to compute the value
+        
+        Returns:
+            Envelope dictionary
+        """
+        return {
+            _ENTRY_VALUE: value,
+            _ENTRY_EXPIRES_AT: time.time() + timeout,
+            _ENTRY_DELTA: delta,
+        }
+    
+    def set_entry(self, key: str, value: Any, timeout: int = 300,
+                  stale_timeout: int = DEFAULT_STALE_TIMEOUT, delta: float = 0.0) -> bool:
+        """
+        Store a value for read_through() with a logical expiry
+        
+        The key is kept in Redis for timeout + stale_timeout seconds so that,
+        once logically expired, it can still be served while one worker
+        recomputes it.
+        
+        Args:
+            key: Redis key
+            value: Value to store (serializable, or bytes such as a rendered body)
+            timeout: Seconds until the value is considered stale
+            stale_timeout: Extra seconds a stale value may be served
+            delta: Seconds it took to compute the value (drives early refresh)
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        return self.set(key, self.make_entry(value, timeout, delta), timeout + stale_timeout)
+    
+    def read_through(self, key: str, compute: Callable[[], Any], timeout: int = 300,
+                     stale_key: Optional[str] = None, stale_timeout: int = DEFAULT_STALE_TIMEOUT,
+                     lock_timeout: int = 10, wait_timeout: float = 2.0, beta: float = 1.0) -> Any:
+        """
+        Get a value, computing and caching it on a miss without stampedes
+        
+        Only the worker holding a short Redis lock recomputes the key. Other
+        workers serve the stale value (from key or stale_key) if there is one,
+        otherwise they wait up to wait_timeout for the fresh value. Values are
+        refreshed early with a probability that grows as their logical expiry
+        approaches, scaled by how long they took to compute (XFetch).
+        
+        Args:
+            key: Redis key
+            compute: Callable returning the value on a miss
+            timeout: Seconds until the value is considered stale
+            stale_key: Optional key holding an older copy, e.g. the previous
+                version of a namespaced key
+            stale_timeout: Extra seconds a stale value may be served
+            lock_timeout: Seconds after which a recompute lock is abandoned
+            wait_timeout: Seconds to wait for another worker's result
+            beta: Early refresh aggressiveness, 0 disables it
+        
+        Returns:
+            Cached or freshly computed value
+        """
+        entry = self.get(key)
+        if entry is not None and not self._is_entry(entry):
+            # Written by plain set(), no expiry metadata
+            return entry
+        
+        if entry is not None:
+            now = time.time()
+            early = entry[_ENTRY_DELTA] * beta * -math.log(1.0 - random.random())
+            if now + early < entry[_ENTRY_EXPIRES_AT]:
+                return entry[_ENTRY_VALUE]
+            stale = entry
+        elif stale_key:
+            stale = self.get(stale_key)
+        else:
+            stale = None
+        
+        lock_key = f"{settings.CACHES['default']['KEY_PREFIX']}:lock:{key}"
+        token = self._acquire_lock(lock_key, lock_timeout)
+        if token is None:
+            if stale is not None:
+                return stale[_ENTRY_VALUE] if self._is_entry(stale) else stale
+            
+            deadline = time.monotonic() + wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = self.get(key)
+                if entry is not None:
+                    return entry[_ENTRY_VALUE] if self._is_entry(entry) else entry
+            # The lock holder is too slow, compute without it
+        
+        try:
+            started = time.monotonic()
+            value = compute()
+            self.set_entry(key, value, timeout, stale_timeout, delta=time.monotonic() - started)
+            return value
+        finally:
+            if token is not None:
+                self._release_lock(lock_key, token)
+    
+    @staticmethod
+    def _is_entry(value: Any) -> bool:
+        """Check whether a cached value is a set_entry() envelope"""
+        return isinstance(value, dict) and _ENTRY_VALUE in value and _ENTRY_EXPIRES_AT in value
+    
+    def _acquire_lock(self, lock_key: str, timeout: int) -> Optional[str]:
+        """
+        Try to take a short-lived lock
+        
+        Returns:
+            Lock token if acquired (or if Redis is unavailable), None if held elsewhere
+        """
+        token = uuid.uuid4().hex
+        try:
+            with self._breaker.guard():
+                acquired = self._redis.set(lock_key, token, nx=True, ex=timeout)
+            return token if acquired else None
+        except Exception as e:
+            self._log_error('LOCK', e)
+            return token
+    
+    def _release_lock(self, lock_key: str, token: str):
+        """Release a lock taken by _acquire_lock()"""
+        try:
+            with self._breaker.guard():
+                self._redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            self._log_error('UNLOCK', e)
     
     def get_ttl(self, key: str) -> Optional[int]:
         """
@@ -167,10 +981,10 @@ class RedisClient:
             TTL in seconds, -1 if no expiration, -2 if key doesn't exist, None on error
         """
         try:
-            full_key = f"{settings.CACHES['default']['KEY_PREFIX']}:{key}"
-            return self._redis.ttl(full_key)
+            with self._breaker.guard():
+                return self._redis.ttl(cache.make_key(key))
         except Exception as e:
-            print(f"Redis TTL error: {e}")
+            self._log_error('TTL', e)
             return None
     
     def ping(self) -> bool:
@@ -183,7 +997,7 @@ class RedisClient:
         try:
             return self._redis.ping()
         except Exception as e:
-            print(f"Redis PING error: {e}")
+            logger.warning(f"Redis PING error: {e}")
             return False
 
 
@@ -0,0 +1,74 @@
+"""
+Session engine that keeps working while Redis is down
+
+Sessions are cached in Redis and stored in the database (like Django's
+cached_db engine). While the Redis circuit breaker is open they are read from
+and written to the database only, so users stay logged in and requests don't
+wait on Redis timeouts. Sessions saved or deleted meanwhile have their Redis
+copy deleted once Redis recovers, so outdated data is never served from it.
+
+Expired rows are removed by the clearsessions management command.
+"""
+
+import logging
+from django.contrib.sessions.backends import cache as cache_backend
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from backend.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerCache:
+    """Wraps the session cache so that it is skipped while the circuit breaker is open"""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def get(self, key, default=None):
+        if not redis_client.available:
+            return default
+        try:
+            with redis_client.breaker.guard():
+                return self._cache.get(key, default)
+        except Exception as e:
+            logger.warning(f"Redis SESSION GET error: {e}")
+            return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if redis_client.available:
+            try:
+                with redis_client.breaker.guard():
+                    self._cache.set(key, value, timeout)
+                return
+            except Exception as e:
+                logger.warning(f"Redis SESSION SET error: {e}")
+        # The database has the new data, make sure the old copy is not read back later
+        redis_client.delete(key)
+
+    def delete(self, key):
+        # Replayed after recovery if Redis is unreachable
+        redis_client.delete(key)
+
+    def __contains__(self, key):
+        if not redis_client.available:
+            return False
+        try:
+            with redis_client.breaker.guard():
+                return key in self._cache
+        except Exception as e:
+            logger.warning(f"Redis SESSION EXISTS error: {e}")
+            return False
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+
+class SessionStore(CachedDBStore):
+    # Same cache keys as the cache-only engine used before, so existing sessions stay valid
+    cache_key_prefix = cache_backend.KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = BreakerCache(self._cache)
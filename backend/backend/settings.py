@@ -77,6 +77,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'backend.cache_invalidation.InvalidationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.common.CommonMiddleware',
@@ -226,6 +227,16 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Resized copies of uploaded images (max width, height), written as WebP and
+# JPEG by the process_images worker, see backend.image_renditions
+IMAGE_RENDITIONS = {
+    'SIZES': {
+        'thumbnail': (200, 200),
+        'card': (400, 400),
+        'detail': (1000, 1000),
+    },
+}
+
 # Redis Cache Configuration
 CACHES = {
     'default': {
@@ -237,16 +248,123 @@ CACHES = {
                 'max_connections': 50,
                 'retry_on_timeout': True,
             },
-            'SOCKET_CONNECT_TIMEOUT': 5,
-            'SOCKET_TIMEOUT': 5,
+            # Cache calls normally take milliseconds; keep timeouts short so the
+            # circuit breaker (REDIS_CIRCUIT_BREAKER) trips quickly when Redis hangs
+            'SOCKET_CONNECT_TIMEOUT': float(os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT', '1')),
+            'SOCKET_TIMEOUT': float(os.environ.get('REDIS_SOCKET_TIMEOUT', '1')),
         },
         'KEY_PREFIX': 'ecommerce',
         'TIMEOUT': 300,  # 5 minutes default
     }
 }
 
-# Session Configuration - Use Redis for sessions
-SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+# In-process (L1) cache in front of Redis, one per worker process.
+# Invalidations are broadcast to all workers over INVALIDATION_CHANNEL.
+LOCAL_CACHE = {
+    'ENABLED': os.environ.get('LOCAL_CACHE_ENABLED', 'True') == 'True',
+    'MAX_ENTRIES': int(os.environ.get('LOCAL_CACHE_MAX_ENTRIES', '1000')),
+    'MAX_BYTES': int(os.environ.get('LOCAL_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+    'TIMEOUT': int(os.environ.get('LOCAL_CACHE_TIMEOUT', '60')),  # seconds
+    'INVALIDATION_CHANNEL': 'ecommerce:cache:invalidate',
+}
+
+# Encoding of values written by RedisClient: 'orjson', 'msgpack' or 'json'.
+# Bodies of at least COMPRESS_MIN_BYTES are zlib-compressed (0 disables).
+CACHE_ENCODING = {
+    'SERIALIZER': os.environ.get('CACHE_SERIALIZER', 'orjson'),
+    'COMPRESS_MIN_BYTES': int(os.environ.get('CACHE_COMPRESS_MIN_BYTES', str(16 * 1024))),
+    'COMPRESS_LEVEL': 1,
+}
+
+# Per key family cache counters, flushed from each worker to Redis every FLUSH_INTERVAL seconds
+CACHE_METRICS = {
+    'ENABLED': os.environ.get('CACHE_METRICS_ENABLED', 'True') == 'True',
+    'FLUSH_INTERVAL': 10,  # seconds
+}
+
+# Product cache invalidation. Stock-only variant changes that keep is_in_stock
+# normally drop just the cached listings containing the product; with
+# SKIP_STOCK_ONLY_LIST_INVALIDATION they leave listings alone (stock counts
+# shown there may then lag until the entries expire).
+PRODUCT_CACHE = {
+    'SKIP_STOCK_ONLY_LIST_INVALIDATION': os.environ.get('PRODUCT_CACHE_SKIP_STOCK_ONLY', 'False') == 'True',
+    # Most products /api/products/batch/?ids= resolves per request
+    'BATCH_MAX_IDS': 50,
+}
+
+# /api/product-variants/bulk_update/: most rows per request, and rows written
+# per pair of UPDATE statements
+VARIANT_BULK_UPDATE = {
+    'MAX_ROWS': 5000,
+    'CHUNK_SIZE': 500,
+}
+
+# Product search: SQLite FTS5 index file, built by the rebuild_search_index
+# command and kept up to date by the product signals. Searches return at most
+# MAX_RESULTS products.
+PRODUCT_SEARCH = {
+    'INDEX_PATH': os.environ.get('PRODUCT_SEARCH_INDEX_PATH', os.path.join(BASE_DIR, 'search_index.sqlite3')),
+    'MAX_RESULTS': 1000,
+}
+
+# "Frequently bought together" recommendations, built from orders by the
+# build_recommendations command (--full daily, incremental every few minutes).
+# Incremental runs count the orders of the last LOOKBACK seconds not counted
+# yet; orders with more than MAX_ORDER_PRODUCTS products are ignored.
+PRODUCT_RECOMMENDATIONS = {
+    'NEIGHBOURS': 20,
+    'MIN_CO_ORDERS': 1,
+    'MAX_ORDER_PRODUCTS': 50,
+    'LOOKBACK': 7 * 24 * 3600,  # seconds
+}
+
+# Search box suggestions, indexed in memory by every worker. Changes to names
+# reach the other workers through CHANGE_RETENTION seconds of change log in
+# Redis; weights (units sold, rating) are refreshed every REBUILD_INTERVAL.
+# MIN_SIMILARITY is the trigram similarity a misspelled word needs to match.
+PRODUCT_AUTOCOMPLETE = {
+    'LIMIT': 8,
+    'MAX_LIMIT': 20,
+    'REBUILD_INTERVAL': 900,  # seconds
+    'CHANGE_RETENTION': 3600,  # seconds
+    'MIN_SIMILARITY': 0.4,
+}
+
+# Filter facets, indexed in memory by every worker as product id bitmaps.
+# Price filters check exactly only the products of one PRICE_BANDS band.
+# Filtered lists use id IN / NOT IN lists of up to MAX_FILTER_IDS products,
+# and variant joins when both would be longer.
+PRODUCT_FACETS = {
+    'PRICE_BANDS': [0, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000],
+    'MAX_FILTER_IDS': 5000,
+    'REBUILD_INTERVAL': 900,  # seconds
+    'CHANGE_RETENTION': 3600,  # seconds
+}
+
+# Keyset pagination of large lists (backend.pagination). Counts are cached
+# for COUNT_TIMEOUT seconds; ?offset= is still served up to MAX_OFFSET.
+PAGINATION = {
+    'MAX_LIMIT': 100,
+    'MAX_OFFSET': 1000,
+    'COUNT_TIMEOUT': 60,  # seconds
+}
+
+# Redis circuit breaker: after FAILURE_THRESHOLD consecutive failed calls, or calls
+# slower than SLOW_CALL_SECONDS, cache calls skip Redis and use a per-process
+# fallback cache until a background ping (every RESET_TIMEOUT seconds) succeeds.
+REDIS_CIRCUIT_BREAKER = {
+    'ENABLED': os.environ.get('REDIS_CIRCUIT_BREAKER_ENABLED', 'True') == 'True',
+    'FAILURE_THRESHOLD': int(os.environ.get('REDIS_CIRCUIT_BREAKER_THRESHOLD', '5')),
+    'SLOW_CALL_SECONDS': float(os.environ.get('REDIS_CIRCUIT_BREAKER_SLOW_CALL', '0.5')),
+    'RESET_TIMEOUT': 5,  # seconds
+    'FALLBACK_MAX_ENTRIES': 1000,
+    'FALLBACK_MAX_BYTES': 16 * 1024 * 1024,
+    'FALLBACK_TIMEOUT': 30,  # seconds
+}
+
+# Session Configuration - Sessions are cached in Redis and stored in the database,
+# which serves them alone while the Redis circuit breaker is open
+SESSION_ENGINE = 'backend.sessions'
 SESSION_CACHE_ALIAS = 'default'
 
 # Default primary key field type
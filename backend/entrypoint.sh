@@ -15,6 +15,10 @@ python manage.py makemigrations
 echo "Applying database migrate..."
 python manage.py migrate
 
+# Build the product search index
+echo "Building search index..."
+python manage.py rebuild_search_index
+
 # Collect static files (important for production)
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
@@ -38,6 +38,13 @@ class Order(models.Model):
     is_paid = models.BooleanField(default=False)
     checkout_url = models.URLField(max_length=500, null=True, blank=True, help_text="Stripe checkout session URL for pending payments")
     
+    class Meta:
+        # Keyset pagination sort keys, see backend.pagination
+        indexes = [
+            models.Index(fields=['date', 'id'], name='order_date_id_idx'),
+            models.Index(fields=['user', 'date', 'id'], name='order_user_date_id_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.id} - {self.user.username}"
     
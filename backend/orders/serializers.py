@@ -5,6 +5,7 @@ from products.models import ProductVariant
 from users.models import Address
 from cart.models import CartItem
 from .utils import OrderManager
+from products.mixins import FieldShapingMixin, ImageHandlingMixin
 import uuid
 import logging
 from datetime import datetime
@@ -12,7 +13,7 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(serializers.ModelSerializer, ImageHandlingMixin):
     product_variant_name = serializers.CharField(source='product_variant.product.name', read_only=True)
     product_variant_color = serializers.CharField(source='product_variant.color.name', read_only=True)
     product_variant_storage = serializers.CharField(source='product_variant.storage', read_only=True)
@@ -26,15 +27,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
     
     def get_product_variant_image(self, obj):
         """Return absolute URL for product image"""
-        if obj.product_variant.product.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.product_variant.product.image.url)
-            return obj.product_variant.product.image.url
-        return None
+        return self.get_image_url(obj.product_variant.product, rendition='thumbnail')
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(FieldShapingMixin, serializers.ModelSerializer):
     """Serializer for listing orders (customer view)"""
     items = OrderItemSerializer(many=True, read_only=True)
     customer = serializers.CharField(source='customer_name', read_only=True)
@@ -49,6 +45,8 @@ class OrderSerializer(serializers.ModelSerializer):
     shipping_cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     total_with_shipping = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
+    expandable_fields = {'items': True}
+    
     class Meta:
         model = Order
         fields = ['id', 'customer', 'email', 'products', 'total', 'subtotal', 'shipping_cost', 'total_with_shipping', 'status', 'date', 'shipping', 'items', 'is_paid', 'payment_status', 'has_pending_payment', 'can_continue_payment']
@@ -1,8 +1,10 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.db import transaction
+from backend import cache_invalidation
 from .models import Order, OrderItem
 from products.models import ProductVariant, InsufficientStockError
+from products import sales
 
 
 @receiver(post_save, sender=OrderItem)
@@ -47,10 +49,13 @@ def track_order_status_change(sender, instance, **kwargs):
         try:
             old_order = Order.objects.get(pk=instance.pk)
             instance._previous_status = old_order.status
+            instance._previous_is_paid = old_order.is_paid
         except Order.DoesNotExist:
             instance._previous_status = None
+            instance._previous_is_paid = False
     else:
         instance._previous_status = None
+        instance._previous_is_paid = False
 
 
 @receiver(post_save, sender=Order)
@@ -64,31 +69,41 @@ def handle_order_status_change(sender, instance, created, **kwargs):
         
         # Case 1: Order cancelled - restore stock
         if current_status == 'cancelled' and previous_status != 'cancelled':
-            for item in instance.items.all():
-                try:
-                    with transaction.atomic():
-                        product_variant = ProductVariant.objects.select_for_update().get(id=item.product_variant.id)
-                        product_variant.increase_stock(item.quantity)
-                        print(f"🔄 Order {instance.id} cancelled: Restored {item.quantity} units of {product_variant}")
-                except ProductVariant.DoesNotExist:
-                    continue
+            # One cache invalidation for all items, not one per variant
+            with cache_invalidation.deferred():
+                for item in instance.items.all():
+                    try:
+                        with transaction.atomic():
+                            product_variant = ProductVariant.objects.select_for_update().get(id=item.product_variant.id)
+                            product_variant.increase_stock(item.quantity)
+                            print(f"🔄 Order {instance.id} cancelled: Restored {item.quantity} units of {product_variant}")
+                    except ProductVariant.DoesNotExist:
+                        continue
         
         # Case 2: Order un-cancelled (cancelled → any other status) - reduce stock again
         elif previous_status == 'cancelled' and current_status != 'cancelled':
-            for item in instance.items.all():
-                try:
-                    with transaction.atomic():
-                        product_variant = ProductVariant.objects.select_for_update().get(id=item.product_variant.id)
-                        product_variant.reduce_stock(item.quantity)
-                        print(f"🔄 Order {instance.id} un-cancelled: Reserved {item.quantity} units of {product_variant}")
-                except (ProductVariant.DoesNotExist, Exception) as e:
-                    print(f"⚠️ Could not reserve stock for {item.product_variant}: {e}")
-                    continue
+            with cache_invalidation.deferred():
+                for item in instance.items.all():
+                    try:
+                        with transaction.atomic():
+                            product_variant = ProductVariant.objects.select_for_update().get(id=item.product_variant.id)
+                            product_variant.reduce_stock(item.quantity)
+                            print(f"🔄 Order {instance.id} un-cancelled: Reserved {item.quantity} units of {product_variant}")
+                    except (ProductVariant.DoesNotExist, Exception) as e:
+                        print(f"⚠️ Could not reserve stock for {item.product_variant}: {e}")
+                        continue
         
         # Case 3: Other status changes (pending → processing → shipped → completed)
         # These should NOT change stock as it was already reduced when order was created
         # This is CORRECT behavior - completed orders should keep stock reduced
 
+        # Sales leaderboard: count the units once paid, take them back on cancellation or refund
+        was_sale = sales.counts_as_sale(previous_status, getattr(instance, '_previous_is_paid', False))
+        is_sale = sales.counts_as_sale(current_status, instance.is_paid)
+        if was_sale != is_sale:
+            sign = 1 if is_sale else -1
+            transaction.on_commit(lambda: sales.record_order(instance, sign))
+
 
 def validate_stock_before_order(order_items):
     """
@@ -140,12 +155,13 @@ def create_order_with_stock_validation(user, order_items_data, **order_kwargs):
     order = Order.objects.create(user=user, **order_kwargs)
     
     # Create order items (stock will be reduced automatically by signals)
-    for item_data in order_items_data:
-        OrderItem.objects.create(
-            order=order,
-            product_variant=item_data['product_variant'],
-            quantity=item_data['quantity'],
-            price=item_data['price']
-        )
+    with cache_invalidation.deferred():
+        for item_data in order_items_data:
+            OrderItem.objects.create(
+                order=order,
+                product_variant=item_data['product_variant'],
+                quantity=item_data['quantity'],
+                price=item_data['price']
+            )
     
     return order
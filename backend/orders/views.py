@@ -15,6 +15,7 @@ from .serializers import (
     OrderStatusUpdateSerializer
 )
 from .utils import OrderManager
+from backend.pagination import KeysetPagination, cached_count
 from products.models import InsufficientStockError
 from cart.models import CartItem
 
@@ -25,6 +26,7 @@ class OrderListCreateView(generics.ListCreateAPIView):
     POST: Create a new order
     """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -87,6 +89,7 @@ class AdminOrderListView(generics.ListAPIView):
     """
     serializer_class = AdminOrderSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         # Use select_related to avoid N+1 queries for user data
@@ -206,13 +209,14 @@ def user_order_history(request):
     
     paginated_orders = orders[start:end]
     serializer = OrderSerializer(paginated_orders, many=True)
+    total = cached_count(orders)
     
     return Response({
         'orders': serializer.data,
-        'total': orders.count(),
+        'total': total,
         'page': page,
         'page_size': page_size,
-        'has_next': end < orders.count()
+        'has_next': end < total
     })
 
 @api_view(['PATCH'])
@@ -21,6 +21,8 @@ class PaymentTransaction(models.Model):
     class Meta:
         # Ensure unique combination for better tracking
         unique_together = [['order', 'stripe_checkout_id']]
+        # Keyset pagination sort key, see backend.pagination
+        indexes = [models.Index(fields=['created_at', 'id'], name='payment_created_id_idx')]
     
     def __str__(self):
         return f"{self.order.id} - {self.status}"
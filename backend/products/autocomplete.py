@@ -0,0 +1,254 @@
+"""
+Search box autocomplete
+
+Each worker process holds an in-memory index of product and category names:
+
+- a prefix trie over the words of every name, whose nodes (keyed by their
+  prefix) remember the best-weighted entries below them, so completing a
+  keystroke is a dictionary lookup;
+- a trigram index of the same words, used when a word has no completion, so
+  misspellings like "iphnoe" still suggest "iPhone".
+
+Products are weighted by units sold and rating, categories by the units sold
+of their products.
+
+The product and category signals keep the copies of every worker in sync
+(see products.synced_index). Sales don't count as changes; weights are
+refreshed by the periodic full rebuild.
+"""
+
+from bisect import bisect_left, insort
+from collections import Counter
+import heapq
+import math
+import re
+import unicodedata
+from typing import Dict, List
+from django.conf import settings
+from django.db.models import Sum
+from .cache import AUTOCOMPLETE
+from .models import Category, Product
+from .synced_index import CATEGORY, PRODUCT, SyncedIndex
+
+
+# Best entries remembered per trie node, the most a lookup can return
+NODE_SIZE = 20
+
+# Longer prefixes match few words and are completed without remembering them
+MAX_NODE_PREFIX = 4
+
+# Words suggested for a misspelled one
+FUZZY_WORDS = 5
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_autocomplete_settings = getattr(settings, 'PRODUCT_AUTOCOMPLETE', {})
+AUTOCOMPLETE_LIMIT = _autocomplete_settings.get('LIMIT', 8)
+AUTOCOMPLETE_MAX_LIMIT = min(_autocomplete_settings.get('MAX_LIMIT', NODE_SIZE), NODE_SIZE)
+MIN_SIMILARITY = _autocomplete_settings.get('MIN_SIMILARITY', 0.4)
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercase words of text, without accents"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD_RE.findall(text)
+
+
+def trigrams(word: str) -> set:
+    """Trigrams of a word padded like PostgreSQL's pg_trgm ('  w', ' wo', ..., 'rd ')"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestionIndex:
+    """Prefix trie and trigram index over the names of one kind of entry"""
+
+    def __init__(self):
+        self.entries: Dict[int, dict] = {}
+        self.weights: Dict[int, float] = {}
+        self.postings: Dict[str, set] = {}
+        self.vocabulary: List[str] = []
+        self.trigrams: Dict[str, set] = {}
+        self.nodes: Dict[str, list] = {}
+        self._words: Dict[int, set] = {}
+
+    def add(self, entry_id: int, entry: dict, weight: float):
+        """Add an entry, or replace it"""
+        self.remove(entry_id)
+        words = set(normalize(entry['name']))
+        self.entries[entry_id] = entry
+        self.weights[entry_id] = weight
+        self._words[entry_id] = words
+        for word in words:
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = set()
+                insort(self.vocabulary, word)
+                for gram in trigrams(word):
+                    self.trigrams.setdefault(gram, set()).add(word)
+            postings.add(entry_id)
+            # Trie nodes already computed take the entry if it ranks high enough
+            for length in range(1, min(len(word), MAX_NODE_PREFIX) + 1):
+                node = self.nodes.get(word[:length])
+                if node is not None and entry_id not in node:
+                    node.append(entry_id)
+                    node.sort(key=self.weights.__getitem__, reverse=True)
+                    del node[NODE_SIZE:]
+
+    def remove(self, entry_id: int):
+        """Drop an entry if present"""
+        words = self._words.pop(entry_id, None)
+        if words is None:
+            return
+        del self.entries[entry_id]
+        del self.weights[entry_id]
+        for word in words:
+            postings = self.postings[word]
+            postings.discard(entry_id)
+            if not postings:
+                del self.postings[word]
+                del self.vocabulary[bisect_left(self.vocabulary, word)]
+                for gram in trigrams(word):
+                    self.trigrams[gram].discard(word)
+            # Nodes that listed it are recomputed on their next lookup
+            for length in range(1, min(len(word), MAX_NODE_PREFIX) + 1):
+                node = self.nodes.get(word[:length])
+                if node is not None and entry_id in node:
+                    del self.nodes[word[:length]]
+
+    def words_with_prefix(self, prefix: str) -> List[str]:
+        """Indexed words starting with prefix"""
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        return self.vocabulary[start:end]
+
+    def similar_words(self, word: str) -> List[str]:
+        """Indexed words most similar to a misspelled word (trigram Dice coefficient)"""
+        if len(word) < 3:
+            return []
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigrams.get(gram, ()))
+        scored = [
+            (2 * count / (len(grams) + len(candidate) + 1), candidate)
+            for candidate, count in shared.items()
+        ]
+        return [
+            candidate for score, candidate in heapq.nlargest(FUZZY_WORDS, scored) if score >= MIN_SIMILARITY
+        ]
+
+    def complete(self, prefix: str) -> List[int]:
+        """Best-weighted entries having a word starting with prefix (a trie node)"""
+        node = self.nodes.get(prefix)
+        if node is None:
+            node = self._best(self._matching(self.words_with_prefix(prefix)), NODE_SIZE)
+            if node and len(prefix) <= MAX_NODE_PREFIX:
+                self.nodes[prefix] = node
+        return node
+
+    def lookup(self, query: str, limit: int) -> List[dict]:
+        """
+        Suggest entries for what has been typed so far
+
+        Every word of the query must match a word of the name; the last one
+        may be incomplete. Words without matches are replaced by the indexed
+        words they most resemble.
+        """
+        tokens = normalize(query)
+        if not tokens:
+            return []
+
+        if len(tokens) == 1:
+            ids = self.complete(tokens[0]) or self._best(self._matching(self.similar_words(tokens[0])), limit)
+        else:
+            candidates = None
+            for token in tokens:
+                words = self.words_with_prefix(token) or self.similar_words(token)
+                matching = self._matching(words)
+                candidates = matching if candidates is None else candidates & matching
+                if not candidates:
+                    return []
+            ids = self._best(candidates, limit)
+
+        return [self.entries[entry_id] for entry_id in ids[:limit]]
+
+    def _matching(self, words) -> set:
+        """Ids of the entries containing any of words"""
+        ids = set()
+        for word in words:
+            ids.update(self.postings[word])
+        return ids
+
+    def _best(self, ids, limit: int) -> List[int]:
+        return heapq.nlargest(limit, ids, key=self.weights.__getitem__)
+
+
+class Autocomplete(SyncedIndex):
+    """Per-process product and category suggestions, kept in sync across workers"""
+
+    def build(self):
+        products, categories = SuggestionIndex(), SuggestionIndex()
+        for entry_id, entry, weight in _product_entries(Product.objects.all()):
+            products.add(entry_id, entry, weight)
+        for entry_id, entry, weight in _category_entries(Category.objects.all()):
+            categories.add(entry_id, entry, weight)
+        return products, categories
+
+    def apply(self, state, changed):
+        products, categories = state
+        _patch(products, Product, changed[PRODUCT], _product_entries)
+        _patch(categories, Category, changed[CATEGORY], _category_entries)
+
+    def suggest(self, query: str, limit: int = AUTOCOMPLETE_LIMIT) -> dict:
+        """
+        Get product and category suggestions for a partially typed query
+
+        Returns:
+            Dictionary with up to limit 'products' and 'categories'
+        """
+        with self.reading() as (products, categories):
+            return {
+                'products': products.lookup(query, limit),
+                'categories': categories.lookup(query, limit),
+            }
+
+
+def _product_entries(queryset):
+    """(id, suggestion, weight) of products, weighted by units sold and rating"""
+    rows = queryset.annotate(units_sold=Sum('variants__sold')).values_list('id', 'name', 'rating', 'units_sold')
+    for product_id, name, rating, units_sold in rows.iterator(chunk_size=2000):
+        entry = {'id': product_id, 'name': name}
+        yield product_id, entry, math.log1p(units_sold or 0) + (rating or 0)
+
+
+def _category_entries(queryset):
+    """(id, suggestion, weight) of active categories, weighted by the units sold of their products"""
+    rows = (
+        queryset.filter(is_active=True)
+        .annotate(units_sold=Sum('products__variants__sold'))
+        .values_list('id', 'name', 'slug', 'units_sold')
+    )
+    for category_id, name, slug, units_sold in rows:
+        entry = {'id': category_id, 'name': name, 'slug': slug}
+        yield category_id, entry, math.log1p(units_sold or 0)
+
+
+def _patch(index: SuggestionIndex, model, ids: set, entries):
+    """Replace entries from the database, dropping the ones that are gone"""
+    if not ids:
+        return
+    found = set()
+    for entry_id, entry, weight in entries(model.objects.filter(id__in=ids)):
+        index.add(entry_id, entry, weight)
+        found.add(entry_id)
+    for entry_id in ids - found:
+        index.remove(entry_id)
+
+
+autocomplete = Autocomplete(
+    AUTOCOMPLETE,
+    rebuild_interval=_autocomplete_settings.get('REBUILD_INTERVAL', 900),
+    change_retention=_autocomplete_settings.get('CHANGE_RETENTION', 3600),
+)
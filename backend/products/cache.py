@@ -0,0 +1,228 @@
+"""
+Cache keys and invalidation helpers for the products app
+
+Catalog entries are stored under versioned namespaces, e.g.
+'products:list:v1718000000000:ab34cd56'. Invalidating a namespace is a single
+INCR of its version counter; entries written under older versions are simply
+never read again and expire by TTL, so no key scans happen on the write path.
+
+Cached listings also record which products they contain (a reverse index kept
+in Redis sets per namespace version), so edits that cannot change what a
+listing includes or its order drop only the entries showing that product.
+
+Invalidations go through backend.cache_invalidation, so the ones made during
+a transaction or request are sent to Redis once, deduplicated, at its end.
+"""
+
+import hashlib
+from django.conf import settings
+from backend import cache_invalidation
+from backend.cached_response import render_body
+from backend.redis_client import redis_client, DEFAULT_STALE_TIMEOUT
+
+
+# Cache namespaces
+PRODUCT = 'product'
+PRODUCT_LIST = 'products:list'
+PRODUCT_FILTERS = 'products:filters'
+TOP_SELLERS = 'products:top_sellers'
+NEW_ARRIVALS = 'products:new_arrivals'
+PERSONALIZED = 'products:personalized'
+CATEGORIES = 'categories'
+CATEGORY = 'category'
+PRODUCT_COLORS = 'product_colors'
+
+# Versions only, bumped when the in-memory indexes must re-read entries
+# (see products.synced_index)
+AUTOCOMPLETE = 'products:autocomplete'
+FACETS = 'products:facets'
+
+# Namespaces holding data derived from many products at once
+PRODUCT_COLLECTION_NAMESPACES = [
+    PRODUCT_LIST,
+    PRODUCT_FILTERS,
+    TOP_SELLERS,
+    NEW_ARRIVALS,
+    PERSONALIZED,
+]
+
+# Per-product key suffixes stored under the PRODUCT namespace
+PRODUCT_KEY_SUFFIXES = [None, 'variants', 'variants:list', 'recommendations']
+
+# Namespaces whose entries record the products they contain. Filter options
+# are not tracked: they only depend on variant prices, colors and storage,
+# and changes to those always invalidate whole namespaces.
+TRACKED_NAMESPACES = [
+    PRODUCT_LIST,
+    TOP_SELLERS,
+    NEW_ARRIVALS,
+    PERSONALIZED,
+    PRODUCT,  # other products' recommendations
+]
+
+# Most products one /api/products/batch/ request resolves
+BATCH_MAX_IDS = getattr(settings, 'PRODUCT_CACHE', {}).get('BATCH_MAX_IDS', 50)
+
+# Invalidation scopes, see invalidate_product_cache()
+SCOPE_ALL = 'all'
+SCOPE_CONTENT = 'content'
+SCOPE_STOCK = 'stock'
+
+
+def params_key(**kwargs) -> str:
+    """Short stable hash of request parameters, '' when there are none"""
+    params = "&".join([f"{k}={v}" for k, v in sorted(kwargs.items()) if v is not None])
+    if params:
+        return hashlib.md5(params.encode()).hexdigest()[:8]
+    return ''
+
+
+def generate_cache_key(prefix: str, **kwargs) -> str:
+    """Generate a consistent versioned cache key from a namespace and parameters"""
+    return redis_client.versioned_key(prefix, params_key(**kwargs))
+
+
+def read_through(namespace: str, compute, timeout: int, key: str = '', track: bool = False, **kwargs):
+    """
+    Read a namespaced response body through the cache with stampede protection
+
+    compute returns the response data; what is cached and returned is its
+    rendered body (see render_body()), ready for cached_response().
+
+    While the value is being recomputed after an invalidation, other workers
+    are served the copy from the previous namespace version, if still cached.
+    With track=True the products in a computed value are recorded, see
+    track_products().
+    """
+    version = redis_client.get_namespace_version(namespace)
+    suffix = f':{key}' if key else ''
+    cache_key = f'{namespace}:v{version}{suffix}'
+
+    def compute_body():
+        data = compute()
+        if track:
+            stale_timeout = kwargs.get('stale_timeout', DEFAULT_STALE_TIMEOUT)
+            track_products(namespace, cache_key, data, timeout + stale_timeout, version)
+        return render_body(data)
+
+    return redis_client.read_through(
+        cache_key,
+        compute_body,
+        timeout=timeout,
+        stale_key=f'{namespace}:v{version - 1}{suffix}',
+        **kwargs
+    )
+
+
+def product_ids_in(data) -> list:
+    """Ids of the products in a serialized (optionally paginated) product list"""
+    if isinstance(data, dict):
+        data = data.get('results', [])
+    return [item['id'] for item in data if isinstance(item, dict) and 'id' in item]
+
+
+def product_tag(namespace: str, product_id, version: int) -> str:
+    """Tag of the entries in one namespace version that contain a product"""
+    return f'{namespace}:v{version}:product:{product_id}'
+
+
+def track_products(namespace: str, cache_key: str, data, timeout: int, version=None):
+    """
+    Record which products a cached listing contains
+
+    Call before writing the entry. Tag sets live per namespace version, so
+    the ones left behind by a namespace bump expire on their own.
+    """
+    if version is None:
+        version = redis_client.get_namespace_version(namespace)
+    redis_client.add_dependencies(
+        cache_key,
+        [product_tag(namespace, product_id, version) for product_id in product_ids_in(data)],
+        timeout,
+    )
+
+
+def product_cache_key(product_id, suffix=None, version=None, shape='') -> str:
+    """Cache key for a single product, or one of its sub-resources, optionally shaped (see shape_key())"""
+    if version is None:
+        version = redis_client.get_namespace_version(PRODUCT)
+    key = f'{product_id}:{suffix}' if suffix else f'{product_id}'
+    if shape:
+        key = f'{key}:shape:{shape}'
+    return f'{PRODUCT}:v{version}:{key}'
+
+
+def shape_key(request) -> str:
+    """Short hash of a request's ?fields= / ?expand= (see FieldShapingMixin), '' when it has neither"""
+    return params_key(fields=request.query_params.get('fields'), expand=request.query_params.get('expand'))
+
+
+def shapes_tag(product_id, version: int) -> str:
+    """Tag of the shaped entries of a product, which can't be listed like PRODUCT_KEY_SUFFIXES"""
+    return f'{PRODUCT}:v{version}:shapes:{product_id}'
+
+
+def set_product_entry(cache_key: str, product_id, body: bytes, timeout: int, shape: str = ''):
+    """Cache a rendered per-product body, registering shaped ones for invalidation"""
+    if shape:
+        version = redis_client.get_namespace_version(PRODUCT)
+        redis_client.add_dependencies(cache_key, [shapes_tag(product_id, version)], timeout)
+    redis_client.set(cache_key, body, timeout=timeout)
+
+
+def set_product_entries(bodies: dict, timeout: int, shape: str = '', version=None):
+    """Cache rendered bodies of several products (product id -> body) in one pipelined write"""
+    if version is None:
+        version = redis_client.get_namespace_version(PRODUCT)
+    entries = {}
+    for product_id, body in bodies.items():
+        cache_key = product_cache_key(product_id, version=version, shape=shape)
+        if shape:
+            redis_client.add_dependencies(cache_key, [shapes_tag(product_id, version)], timeout)
+        entries[cache_key] = body
+    redis_client.set_many(entries, timeout=timeout)
+
+
+def invalidate_product_cache(product_id=None, scope=SCOPE_ALL):
+    """
+    Invalidate product-related caches
+
+    Args:
+        product_id: Product whose own entries are dropped
+        scope: SCOPE_ALL if the change can add or remove the product from
+            listings or reorder them (creation, deletion, name, category,
+            rating, price, color, storage or is_in_stock changes); every
+            listing namespace is bumped. SCOPE_CONTENT if only what is shown
+            for the product changed; just the listings containing it are
+            dropped. SCOPE_STOCK for stock or sold changes that keep
+            is_in_stock; like SCOPE_CONTENT, unless
+            PRODUCT_CACHE['SKIP_STOCK_ONLY_LIST_INVALIDATION'] leaves
+            listings alone.
+    """
+    if product_id is None or scope == SCOPE_ALL:
+        cache_invalidation.invalidate_namespaces(*PRODUCT_COLLECTION_NAMESPACES)
+        namespaces = [PRODUCT]
+    elif scope == SCOPE_STOCK and getattr(settings, 'PRODUCT_CACHE', {}).get('SKIP_STOCK_ONLY_LIST_INVALIDATION'):
+        namespaces = []
+    else:
+        namespaces = TRACKED_NAMESPACES
+
+    if product_id:
+        version = redis_client.get_namespace_version(PRODUCT)
+        cache_invalidation.delete(*[
+            product_cache_key(product_id, suffix, version) for suffix in PRODUCT_KEY_SUFFIXES
+        ])
+        cache_invalidation.invalidate_tags(shapes_tag(product_id, version), *[
+            product_tag(namespace, product_id, redis_client.get_namespace_version(namespace))
+            for namespace in namespaces
+        ])
+
+
+def invalidate_category_cache():
+    """Invalidate category-related caches"""
+    cache_invalidation.invalidate_namespaces(CATEGORIES, CATEGORY, PRODUCT_LIST, PRODUCT_FILTERS)
+
+
+def invalidate_color_cache():
+    """Invalidate product color caches"""
+    cache_invalidation.invalidate_namespaces(PRODUCT_COLORS)
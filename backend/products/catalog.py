@@ -0,0 +1,349 @@
+"""
+Bulk catalog import and export, used by the import_catalog and export_catalog commands
+
+A catalog file has one row per variant, repeating its product's fields
+(CATALOG_COLUMNS), as CSV or JSON lines. Products are matched by name,
+variants by product, color and storage. Rows without a color only create or
+update their product.
+
+Imports read the file as a stream and write each batch of rows with a few
+bulk_create() / bulk_update() queries. These skip save() and the model
+signals, so variant summaries, category counts, the search and in-memory
+indexes and the caches are all brought up to date once, by finish().
+"""
+
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+import csv
+import json
+import sys
+from typing import Dict, Iterable, Iterator, List, Tuple
+from django.db import transaction
+from django.utils import timezone
+from backend import cache_invalidation
+from .autocomplete import autocomplete
+from .cache import (
+    PRODUCT as PRODUCT_NAMESPACE,
+    invalidate_category_cache,
+    invalidate_color_cache,
+    invalidate_product_cache,
+)
+from .facets import facet_index
+from .models import (
+    STORAGE_CHOICES,
+    Category,
+    Product,
+    ProductColor,
+    ProductVariant,
+    update_product_counts,
+    update_variant_summaries,
+)
+from .search import search_index
+from .synced_index import COLOR, PRODUCT
+
+
+CATALOG_COLUMNS = [
+    'name', 'category_slug', 'badge', 'description', 'full_description', 'features',
+    'color', 'color_hex', 'storage', 'price', 'stock',
+]
+PRODUCT_COLUMNS = ['category_slug', 'badge', 'description', 'full_description', 'features']
+
+FORMATS = ('csv', 'jsonl')
+
+# Products whose summaries and search entries are refreshed at a time by finish()
+FINISH_BATCH = 1000
+
+_STORAGES = {value for value, label in STORAGE_CHOICES}
+
+
+def detect_format(path: str) -> str:
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, format: str) -> Iterator[Tuple[int, dict]]:
+    """(line number, row) of a catalog file, one at a time"""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, {'_error': f'invalid JSON ({e})'}
+
+
+class CatalogWriter:
+    """Writes catalog rows as CSV or JSON lines"""
+
+    def __init__(self, stream, format: str):
+        self.stream = stream
+        self.format = format
+        if format == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=CATALOG_COLUMNS)
+            self.csv.writeheader()
+
+    def write(self, row: dict):
+        if self.format == 'csv':
+            self.csv.writerow({**row, 'features': json.dumps(row['features'])})
+        else:
+            self.stream.write(json.dumps(row, default=str) + '\n')
+
+
+def export_rows(batch_size: int = 500) -> Iterator[dict]:
+    """Catalog rows of every product, read batch_size products at a time"""
+    last_id = 0
+    while True:
+        products = list(
+            Product.objects
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .select_related('category')
+            .prefetch_related('variants__color')[:batch_size]
+        )
+        if not products:
+            return
+        for product in products:
+            base = {
+                'name': product.name,
+                'category_slug': product.category.slug,
+                'badge': product.badge or '',
+                'description': product.description,
+                'full_description': product.full_description,
+                'features': product.features,
+            }
+            variants = product.variants.all()
+            if not variants:
+                yield {**base, 'color': '', 'color_hex': '', 'storage': '', 'price': '', 'stock': ''}
+            for variant in variants:
+                yield {
+                    **base,
+                    'color': variant.color.name,
+                    'color_hex': variant.color.hex_code or '',
+                    'storage': variant.storage or '',
+                    'price': str(variant.price),
+                    'stock': variant.stock,
+                }
+        last_id = products[-1].id
+
+
+class CatalogImporter:
+    """Upserts catalog rows in batches, then refreshes everything derived from them once"""
+
+    def __init__(self):
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.colors = {name: color_id for color_id, name in ProductColor.objects.values_list('id', 'name')}
+        self.product_ids = set()
+        self.category_ids = set()
+        self.new_color_ids = set()
+        self.stats = Counter()
+        self.errors = []
+
+    def import_batch(self, rows: List[Tuple[int, dict]]):
+        """Create or update the products and variants of a batch of (line number, row)"""
+        products = {}
+        variants = {}
+        for line_number, row in rows:
+            try:
+                name, fields, variant = self._parse(row)
+            except ValueError as e:
+                self._skip(line_number, str(e))
+                continue
+            products.setdefault(name, {'line': line_number, 'fields': {}})['fields'].update(fields)
+            if variant:
+                variants[(name, variant['color'], variant['storage'])] = (line_number, variant)
+
+        with transaction.atomic():
+            product_ids = self._upsert_products(products)
+            color_ids = self._create_colors({variant['color']: variant['color_hex'] for line, variant in variants.values()})
+            self._upsert_variants(variants, product_ids, color_ids)
+
+    def _parse(self, row: dict):
+        """Product name, product fields given and variant (or None) of a row"""
+        if '_error' in row:
+            raise ValueError(row['_error'])
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise ValueError('missing name')
+
+        fields = {}
+        for column in PRODUCT_COLUMNS:
+            if column not in row or row[column] is None:
+                continue
+            value = row[column]
+            if column == 'category_slug':
+                if not value:
+                    continue
+                if value not in self.categories:
+                    raise ValueError(f"unknown category '{value}'")
+                fields['category_id'] = self.categories[value]
+            elif column == 'features':
+                if isinstance(value, str):
+                    try:
+                        value = json.loads(value) if value.strip() else []
+                    except ValueError:
+                        raise ValueError('features must be a JSON list')
+                if not isinstance(value, list):
+                    raise ValueError('features must be a JSON list')
+                fields['features'] = value
+            else:
+                fields[column] = value or ('' if column != 'badge' else None)
+
+        color = (row.get('color') or '').strip()
+        if not color:
+            return name, fields, None
+        storage = row.get('storage') or None
+        if storage is not None and storage not in _STORAGES:
+            raise ValueError(f"unknown storage '{storage}'")
+        try:
+            price = Decimal(str(row.get('price')))
+            stock = int(row.get('stock') or 0)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError('price and stock must be numbers')
+        if price < 0 or stock < 0:
+            raise ValueError('price and stock must not be negative')
+        variant = {'color': color, 'color_hex': row.get('color_hex') or None, 'storage': storage, 'price': price, 'stock': stock}
+        return name, fields, variant
+
+    def _skip(self, line_number: int, reason: str):
+        self.stats['skipped'] += 1
+        self.errors.append(f"line {line_number}: {reason}")
+
+    def _upsert_products(self, products: Dict[str, dict]) -> Dict[str, int]:
+        """Create the new products and update the changed ones; returns their ids by name"""
+        existing = {}
+        for product in Product.objects.filter(name__in=list(products)).order_by('-id'):
+            # The oldest product wins when names are duplicated
+            existing[product.name] = product
+
+        now = timezone.now()
+        created, changed, changed_fields = [], [], set()
+        for name, entry in products.items():
+            fields = entry['fields']
+            product = existing.get(name)
+            if product is None:
+                if 'category_id' not in fields:
+                    self._skip(entry['line'], f"new product '{name}' has no category")
+                    continue
+                created.append(Product(name=name, **fields))
+                self.category_ids.add(fields['category_id'])
+                continue
+            updates = {field: value for field, value in fields.items() if getattr(product, field) != value}
+            if updates:
+                if 'category_id' in updates:
+                    self.category_ids.update([product.category_id, updates['category_id']])
+                for field, value in updates.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                changed.append(product)
+                changed_fields.update(updates)
+
+        if created:
+            Product.objects.bulk_create(created, batch_size=500)
+            self.stats['products created'] += len(created)
+        if changed:
+            Product.objects.bulk_update(changed, [*changed_fields, 'updated_at'], batch_size=500)
+            self.stats['products updated'] += len(changed)
+
+        # bulk_create() doesn't return ids on every database
+        product_ids = {name: product.id for name, product in existing.items()}
+        new_names = [product.name for product in created]
+        product_ids.update(Product.objects.filter(name__in=new_names).values_list('name', 'id'))
+        self.product_ids.update(product.id for product in changed)
+        self.product_ids.update(product_ids[name] for name in new_names)
+        return product_ids
+
+    def _create_colors(self, colors: Dict[str, str]) -> Dict[str, int]:
+        """Ids of colors by name, creating the missing ones"""
+        missing = [name for name in colors if name not in self.colors]
+        if missing:
+            ProductColor.objects.bulk_create([ProductColor(name=name, hex_code=colors[name]) for name in missing])
+            for color_id, name in ProductColor.objects.filter(name__in=missing).values_list('id', 'name'):
+                self.colors.setdefault(name, color_id)
+                self.new_color_ids.add(color_id)
+            self.stats['colors created'] += len(missing)
+        return self.colors
+
+    def _upsert_variants(self, variants: Dict[tuple, tuple], product_ids: Dict[str, int], color_ids: Dict[str, int]):
+        wanted = {}
+        for (name, color, storage), (line_number, variant) in variants.items():
+            if name not in product_ids:
+                self._skip(line_number, f"product '{name}' was not imported")
+                continue
+            wanted[(product_ids[name], color_ids[color], storage)] = variant
+
+        existing = {
+            (product_id, color_id, storage): (variant_id, price, stock)
+            for variant_id, product_id, color_id, storage, price, stock in (
+                ProductVariant.objects
+                .filter(product_id__in={key[0] for key in wanted})
+                .values_list('id', 'product_id', 'color_id', 'storage', 'price', 'stock')
+            )
+        }
+
+        now = timezone.now()
+        created, changed = [], []
+        for (product_id, color_id, storage), variant in wanted.items():
+            price, stock = variant['price'], variant['stock']
+            current = existing.get((product_id, color_id, storage))
+            if current is None:
+                created.append(ProductVariant(
+                    product_id=product_id, color_id=color_id, storage=storage,
+                    price=price, stock=stock, sold=0, is_in_stock=stock > 0,
+                ))
+            elif (current[1], current[2]) != (price, stock):
+                changed.append(ProductVariant(
+                    id=current[0], price=price, stock=stock, is_in_stock=stock > 0, updated_at=now,
+                ))
+            else:
+                continue
+            self.product_ids.add(product_id)
+
+        if created:
+            ProductVariant.objects.bulk_create(created, batch_size=500)
+            self.stats['variants created'] += len(created)
+        if changed:
+            ProductVariant.objects.bulk_update(changed, ['price', 'stock', 'is_in_stock', 'updated_at'], batch_size=500)
+            self.stats['variants updated'] += len(changed)
+
+    def finish(self):
+        """Refresh what the skipped signals would have: summaries, counts, indexes and caches"""
+        product_ids = sorted(self.product_ids)
+        with cache_invalidation.deferred():
+            for start in range(0, len(product_ids), FINISH_BATCH):
+                update_variant_summaries(product_ids[start:start + FINISH_BATCH])
+            update_product_counts(self.category_ids)
+            if product_ids or self.category_ids:
+                # Every cached product may be stale, drop the PRODUCT namespace as a whole
+                cache_invalidation.invalidate_namespaces(PRODUCT_NAMESPACE)
+                invalidate_product_cache()
+                invalidate_category_cache()
+            if self.new_color_ids:
+                invalidate_color_cache()
+
+        for start in range(0, len(product_ids), FINISH_BATCH):
+            search_index.update(product_ids[start:start + FINISH_BATCH])
+        autocomplete.record_changes(PRODUCT, product_ids)
+        facet_index.record_changes(PRODUCT, product_ids)
+        facet_index.record_changes(COLOR, self.new_color_ids)
+
+
+def open_input(path: str):
+    return sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+
+
+def open_output(path: str):
+    return sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+
+
+def batches(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
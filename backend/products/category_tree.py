@@ -0,0 +1,90 @@
+"""
+Cached category tree
+
+The whole tree is kept as one compact list of [id, parent_id, name, slug]
+rows, stored in Redis under the categories namespace (so every category
+change replaces it) and parsed once per process and version. Subtrees,
+parents and breadcrumbs are then answered from memory without queries.
+"""
+
+from collections import defaultdict
+from typing import List, Optional
+from backend.redis_client import redis_client
+from .cache import CATEGORIES
+from .models import Category
+
+
+TREE_TIMEOUT = 3600
+
+# Positions in a tree row
+_ID, _PARENT, _NAME, _SLUG = range(4)
+
+# (cache key, tree) last parsed by this process
+_parsed = None
+
+
+class CategoryTree:
+    """Categories indexed by id, slug and parent"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.nodes = {row[_ID]: row for row in rows}
+        self.slugs = {row[_SLUG]: row[_ID] for row in rows}
+        self.children = defaultdict(list)
+        for row in rows:
+            if row[_PARENT] is not None:
+                self.children[row[_PARENT]].append(row[_ID])
+
+    @classmethod
+    def from_database(cls) -> 'CategoryTree':
+        return cls([list(row) for row in Category.objects.values_list('id', 'parent_id', 'name', 'slug')])
+
+    def find(self, slug: str) -> Optional[int]:
+        """Id of the category with a slug, None if there is none"""
+        return self.slugs.get(slug)
+
+    def parent_id(self, category_id: int) -> Optional[int]:
+        node = self.nodes.get(category_id)
+        return node[_PARENT] if node else None
+
+    def descendant_ids(self, category_id: int) -> List[int]:
+        """Ids of a category and its subcategories at any depth"""
+        if category_id not in self.nodes:
+            return []
+        ids = []
+        pending = [category_id]
+        while pending:
+            current = pending.pop()
+            ids.append(current)
+            pending.extend(self.children.get(current, ()))
+        return ids
+
+    def ancestor_ids(self, category_id: int) -> List[int]:
+        """Ids from the root down to a category, itself included"""
+        ids = []
+        current = category_id
+        while current is not None and current in self.nodes and len(ids) <= len(self.nodes):
+            ids.append(current)
+            current = self.nodes[current][_PARENT]
+        return ids[::-1]
+
+    def breadcrumbs(self, category_id: int) -> List[dict]:
+        """Path from the root down to a category, for navigation"""
+        return [
+            {'id': self.nodes[each][_ID], 'name': self.nodes[each][_NAME], 'slug': self.nodes[each][_SLUG]}
+            for each in self.ancestor_ids(category_id)
+        ]
+
+
+def category_tree() -> CategoryTree:
+    """The current category tree, from this process, Redis or the database"""
+    global _parsed
+    cache_key = redis_client.versioned_key(CATEGORIES, 'tree')
+    parsed = _parsed
+    if parsed is not None and parsed[0] == cache_key:
+        return parsed[1]
+
+    rows = redis_client.read_through(cache_key, lambda: CategoryTree.from_database().rows, timeout=TREE_TIMEOUT)
+    tree = CategoryTree(rows)
+    _parsed = (cache_key, tree)
+    return tree
@@ -0,0 +1,312 @@
+"""
+Facet index for product filters
+
+Each worker keeps, in memory, a bitmap of product ids (a Python int with bit
+n set for product n) per category, color, storage option, price band and
+stock state. The list filters (category__slug, color, storage, min_price,
+max_price, in_stock) become ANDs of bitmaps instead of joins to variants
+with DISTINCT, and the filter options of a category, with the number of
+products behind each, come from the same bitmaps.
+
+Like the variant joins, filters apply per product: a product matches
+color=1&storage=256GB if it has a variant in color 1 and a variant with
+256GB, not necessarily the same one. Price filters compare the lowest and
+highest variant price of each product; the band bitmaps narrow them down to
+the products of one band, which are checked exactly.
+
+The product, variant, category and color signals keep the copies of every
+worker in sync (see products.synced_index).
+"""
+
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+import logging
+import math
+import operator
+import re
+from typing import Optional
+from django.conf import settings
+from .cache import FACETS
+from .category_tree import CategoryTree
+from .models import STORAGE_CHOICES, Product, ProductColor, ProductVariant
+from .synced_index import CATEGORY, COLOR, PRODUCT, SyncedIndex
+
+
+logger = logging.getLogger(__name__)
+
+# Bitmap keys besides ('category', id), ('color', id), ('storage', value),
+# ('min_band', band) and ('max_band', band)
+ALL = 'all'
+HAS_VARIANTS = 'variants'
+IN_STOCK = 'in_stock'
+
+_STORAGE_ORDER = {value: position for position, (value, label) in enumerate(STORAGE_CHOICES)}
+
+_facet_settings = getattr(settings, 'PRODUCT_FACETS', {})
+PRICE_BANDS = sorted(_facet_settings.get('PRICE_BANDS', [0, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000]))
+MAX_FILTER_IDS = _facet_settings.get('MAX_FILTER_IDS', 5000)
+
+
+def to_bitmap(ids) -> int:
+    """Bitmap with the bits of ids set"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for entry_id in ids:
+        data[entry_id >> 3] |= 1 << (entry_id & 7)
+    return int.from_bytes(data, 'little')
+
+
+def to_ids(bitmap: int) -> list:
+    """Ids whose bits are set, ascending"""
+    return [match.start() for match in re.finditer('1', bin(bitmap)[:1:-1])]
+
+
+def price_band(price: float) -> int:
+    """Index of the PRICE_BANDS band a price falls in"""
+    return max(bisect_right(PRICE_BANDS, price) - 1, 0)
+
+
+class FacetState:
+    """Bitmaps, per-product price ranges and the names they are shown with"""
+
+    def __init__(self):
+        self.bitmaps = {}
+        self.min_prices = array('d')
+        self.max_prices = array('d')
+        self.categories = CategoryTree([])
+        self.colors = {}
+
+    def get(self, key) -> int:
+        return self.bitmaps.get(key, 0)
+
+    def add_products(self, products, variants):
+        """
+        Set the bits of products
+
+        Args:
+            products: (id, category_id) pairs
+            variants: (product_id, price, color_id, storage, is_in_stock) rows
+        """
+        members = defaultdict(list)
+        for product_id, category_id in products:
+            members[ALL].append(product_id)
+            members[('category', category_id)].append(product_id)
+
+        prices = {}
+        for product_id, price, color_id, storage, is_in_stock in variants:
+            members[('color', color_id)].append(product_id)
+            if storage:
+                members[('storage', storage)].append(product_id)
+            if is_in_stock:
+                members[IN_STOCK].append(product_id)
+            price = float(price)
+            low, high = prices.get(product_id, (price, price))
+            prices[product_id] = (min(low, price), max(high, price))
+
+        if prices:
+            size = max(prices) + 1
+            for values in (self.min_prices, self.max_prices):
+                if len(values) < size:
+                    values.extend([math.nan] * (size - len(values)))
+        for product_id, (low, high) in prices.items():
+            members[HAS_VARIANTS].append(product_id)
+            members[('min_band', price_band(low))].append(product_id)
+            members[('max_band', price_band(high))].append(product_id)
+            self.min_prices[product_id] = low
+            self.max_prices[product_id] = high
+
+        for key, ids in members.items():
+            self.bitmaps[key] = self.get(key) | to_bitmap(ids)
+
+    def remove_products(self, product_ids):
+        """Clear the bits of products"""
+        mask = ~to_bitmap(product_ids)
+        for key in self.bitmaps:
+            self.bitmaps[key] &= mask
+
+    def load_categories(self):
+        self.categories = CategoryTree.from_database()
+
+    def load_colors(self):
+        self.colors = {color['id']: color for color in ProductColor.objects.values('id', 'name', 'hex_code')}
+
+    def category(self, slug: str) -> int:
+        """Products of a category and its subcategories at any depth"""
+        category_id = self.categories.find(slug)
+        if category_id is None:
+            return 0
+        category_ids = self.categories.descendant_ids(category_id)
+        return reduce(operator.or_, (self.get(('category', each)) for each in category_ids), 0)
+
+    def price_at_least(self, price: float) -> int:
+        """Products with a variant at price or above"""
+        band = price_band(price)
+        higher = reduce(operator.or_, (self.get(('max_band', each)) for each in range(band + 1, len(PRICE_BANDS))), 0)
+        edge = [product_id for product_id in to_ids(self.get(('max_band', band))) if self.max_prices[product_id] >= price]
+        return higher | to_bitmap(edge)
+
+    def price_at_most(self, price: float) -> int:
+        """Products with a variant at price or below"""
+        band = price_band(price)
+        lower = reduce(operator.or_, (self.get(('min_band', each)) for each in range(band)), 0)
+        edge = [product_id for product_id in to_ids(self.get(('min_band', band))) if self.min_prices[product_id] <= price]
+        return lower | to_bitmap(edge)
+
+
+class FacetIndex(SyncedIndex):
+    """Per-process facet bitmaps, kept in sync across workers"""
+
+    kinds = (PRODUCT, CATEGORY, COLOR)
+
+    def build(self):
+        state = FacetState()
+        state.add_products(
+            Product.objects.values_list('id', 'category_id').iterator(chunk_size=5000),
+            ProductVariant.objects.values_list(
+                'product_id', 'price', 'color_id', 'storage', 'is_in_stock'
+            ).iterator(chunk_size=5000),
+        )
+        state.load_categories()
+        state.load_colors()
+        return state
+
+    def apply(self, state, changed):
+        if changed[CATEGORY]:
+            state.load_categories()
+        if changed[COLOR]:
+            state.load_colors()
+        product_ids = changed[PRODUCT]
+        if product_ids:
+            state.remove_products(product_ids)
+            state.add_products(
+                Product.objects.filter(id__in=product_ids).values_list('id', 'category_id'),
+                ProductVariant.objects.filter(product_id__in=product_ids).values_list(
+                    'product_id', 'price', 'color_id', 'storage', 'is_in_stock'
+                ),
+            )
+
+    def match(self, state: FacetState, category_slug=None, min_price=None, max_price=None,
+              color_id=None, storage=None, in_stock=None) -> int:
+        """
+        Bitmap of the products passing the list filters
+
+        Arguments are raw query parameters; unparsable ones are ignored like
+        ProductViewSet ignores them.
+        """
+        result = state.get(ALL)
+        if category_slug:
+            result &= state.category(category_slug)
+        for value, select in ((min_price, state.price_at_least), (max_price, state.price_at_most)):
+            if value:
+                try:
+                    result &= select(float(value))
+                except ValueError:
+                    pass
+        if color_id:
+            try:
+                result &= state.get(('color', int(color_id)))
+            except ValueError:
+                pass
+        if storage:
+            result &= state.get(('storage', storage))
+        if in_stock and in_stock.lower() == 'true':
+            result &= state.get(IN_STOCK)
+        return result
+
+    def filter_queryset(self, queryset, **filters):
+        """
+        Apply the list filters to a product queryset by primary key
+
+        The queryset gets id__in with the matching products, or id NOT IN the
+        other ones, whichever list is shorter.
+
+        Returns:
+            The filtered queryset, or None if the index can't answer or both
+            lists are longer than MAX_FILTER_IDS (filter with joins then)
+        """
+        try:
+            with self.reading() as state:
+                result = self.match(state, **filters)
+                matching = result.bit_count()
+                if matching <= MAX_FILTER_IDS:
+                    return queryset.filter(id__in=to_ids(result)) if matching else queryset.none()
+                others = state.get(ALL) & ~result
+                if others.bit_count() <= MAX_FILTER_IDS:
+                    return queryset.exclude(id__in=to_ids(others))
+        except Exception as e:
+            logger.warning(f"Facet index error: {e}")
+        return None
+
+    def filter_options(self, category_slug: str = '') -> Optional[dict]:
+        """
+        Price range, colors and storage options of the products with variants
+        in a category, with the number of products per option
+
+        Returns:
+            Filter options like ProductViewSet.filters, or None if the index
+            can't answer
+        """
+        try:
+            with self.reading() as state:
+                products = state.get(HAS_VARIANTS)
+                if category_slug:
+                    products &= state.category(category_slug)
+                return _filter_options(state, products)
+        except Exception as e:
+            logger.warning(f"Facet index error: {e}")
+        return None
+
+
+def _filter_options(state: FacetState, products: int) -> dict:
+    bands = range(len(PRICE_BANDS))
+    min_price = max_price = None
+    for band in bands:
+        ids = to_ids(state.get(('min_band', band)) & products)
+        if ids:
+            min_price = min(state.min_prices[product_id] for product_id in ids)
+            break
+    for band in reversed(bands):
+        ids = to_ids(state.get(('max_band', band)) & products)
+        if ids:
+            max_price = max(state.max_prices[product_id] for product_id in ids)
+            break
+
+    color_counts = {}
+    for color_id in state.colors:
+        count = (state.get(('color', color_id)) & products).bit_count()
+        if count:
+            color_counts[color_id] = count
+    storage_counts = {}
+    for key, bitmap in state.bitmaps.items():
+        if isinstance(key, tuple) and key[0] == 'storage':
+            count = (bitmap & products).bit_count()
+            if count:
+                storage_counts[key[1]] = count
+    storage_options = sorted(storage_counts, key=lambda value: (_STORAGE_ORDER.get(value, len(_STORAGE_ORDER)), value))
+
+    return {
+        'price_range': {
+            'min_price': Decimal(f'{min_price:.2f}') if min_price is not None else None,
+            'max_price': Decimal(f'{max_price:.2f}') if max_price is not None else None,
+        },
+        'colors': sorted((state.colors[color_id] for color_id in color_counts), key=lambda color: color['name']),
+        'storage_options': storage_options,
+        'counts': {
+            'colors': color_counts,
+            'storage_options': storage_counts,
+            'in_stock': (state.get(IN_STOCK) & products).bit_count(),
+            'products': products.bit_count(),
+        },
+    }
+
+
+facet_index = FacetIndex(
+    FACETS,
+    rebuild_interval=_facet_settings.get('REBUILD_INTERVAL', 900),
+    change_retention=_facet_settings.get('CHANGE_RETENTION', 3600),
+)
@@ -0,0 +1,97 @@
+"""
+Management command to compare cache encodings on real product payloads
+Usage: python manage.py benchmark_cache_encoding [--limit 10] [--iterations 200]
+
+Serializes products with ProductSerializer (as ProductViewSet.list does) and
+reports stored bytes plus encode/decode time for the legacy format
+(json.dumps + django-redis pickle) and each available cache serializer,
+with and without compression. The last row stores the pre-rendered response
+body, which cache hits send without decoding. Nothing is written to Redis.
+"""
+
+import json
+import pickle
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.utils.encoders import JSONEncoder
+from backend.cache_serializers import SERIALIZER_CLASSES, CacheCodec, JSONSerializer
+from backend.cached_response import render_body
+from products.models import Product
+from products.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cache serializers on real ProductSerializer output'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Number of products in the payload (default: 10, one list page)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Encode/decode rounds per encoding (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        iterations = options['iterations']
+
+        products = Product.objects.prefetch_related('variants__color').order_by('-created_at')[:limit]
+        data = ProductSerializer(products, many=True).data
+        if not data:
+            self.stdout.write(self.style.WARNING('No products found, seed the catalog first'))
+            return
+
+        self.stdout.write(f'Payload: {len(data)} products, {iterations} iterations\n')
+        self.stdout.write(f"{'encoding':<24}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+
+        # What RedisClient did before: json.dumps, then django-redis pickles the string
+        self._report(
+            'json+pickle (legacy)',
+            lambda value: pickle.dumps(json.dumps(value, cls=JSONEncoder), pickle.HIGHEST_PROTOCOL),
+            lambda payload: json.loads(pickle.loads(payload)),
+            data,
+            iterations,
+        )
+
+        for serializer_class in SERIALIZER_CLASSES.values():
+            try:
+                serializer = serializer_class()
+            except ImportError:
+                self.stdout.write(f'{serializer_class.name:<24}not installed')
+                continue
+            for compress in (False, True):
+                codec = CacheCodec(serializer, compress_min_bytes=1 if compress else 0)
+                name = f"{serializer.name}{'+zlib' if compress else ''}"
+                self._report(name, codec.encode, codec.decode, data, iterations)
+        
+        # Encoding includes rendering the body; a hit only strips the header
+        codec = CacheCodec(JSONSerializer())
+        self._report(
+            'rendered body',
+            lambda value: codec.encode(render_body(value)),
+            codec.decode,
+            data,
+            iterations,
+        )
+
+    def _report(self, name, encode, decode, data, iterations):
+        """Time encode/decode of data and print one result row"""
+        payload = encode(data)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            encode(data)
+        encode_ms = (time.perf_counter() - started) * 1000 / iterations
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            decode(payload)
+        decode_ms = (time.perf_counter() - started) * 1000 / iterations
+
+        self.stdout.write(f'{name:<24}{len(payload):>10}{encode_ms:>12.3f}{decode_ms:>12.3f}')
@@ -0,0 +1,195 @@
+"""
+Management command to compare the search index with the previous queryset search
+Usage: python manage.py benchmark_search [--sizes 10000,100000,1000000] [--repeat 5] [--catalog]
+
+For every size, a synthetic catalog is generated from the seed product texts
+into a temporary SQLite database, then each query is run:
+
+- the previous search (name LIKE 'q%' UNION name LIKE '%q%', ordered by rank
+  and name), fetching the first page plus the COUNT the paginator runs;
+- the FTS5 index search, plus the primary key lookup of the first page.
+
+Both sides run on SQLite, so the numbers compare the query shapes rather than
+database servers. --catalog also times both against the products in the
+configured database. Nothing is written to the database or the live index.
+"""
+
+import os
+import random
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.search import ProductSearchIndex, legacy_search, search_index
+from .seed_products import PRODUCTS_DATA
+
+
+QUERIES = ['iphone', 'pro max', 'titanium', 'camera 48mp', 'galaxy', 'usb', 'xdr display', 'zzzz']
+PAGE_SIZE = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+
+LEGACY_PAGE_SQL = """
+    SELECT * FROM (
+        SELECT id, name, 1 AS search_rank FROM products WHERE name LIKE :prefix ESCAPE '\\'
+        UNION
+        SELECT id, name, 2 AS search_rank FROM products
+        WHERE name LIKE :contains ESCAPE '\\' AND NOT name LIKE :prefix ESCAPE '\\'
+    ) ORDER BY search_rank, name LIMIT :limit
+"""
+LEGACY_COUNT_SQL = """
+    SELECT count(*) FROM (
+        SELECT id FROM products WHERE name LIKE :prefix ESCAPE '\\'
+        UNION
+        SELECT id FROM products
+        WHERE name LIKE :contains ESCAPE '\\' AND NOT name LIKE :prefix ESCAPE '\\'
+    )
+"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the product search index against the previous queryset search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000,1000000',
+            help='Comma separated synthetic catalog sizes (default: 10000,100000,1000000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per query, the median is reported (default: 5)',
+        )
+        parser.add_argument(
+            '--catalog',
+            action='store_true',
+            help='Also benchmark the products in the configured database',
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                self._benchmark_synthetic(size, directory, repeat)
+
+        if options['catalog']:
+            self._benchmark_catalog(repeat)
+
+    def _benchmark_synthetic(self, size, directory, repeat):
+        """Generate size products, index them and time every query both ways"""
+        database = sqlite3.connect(os.path.join(directory, 'products.sqlite3'))
+        database.execute(
+            'CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, description TEXT, '
+            'full_description TEXT, features TEXT)'
+        )
+        index = ProductSearchIndex(os.path.join(directory, 'search.sqlite3'))
+
+        started = time.perf_counter()
+        for batch in _synthetic_products(size):
+            database.executemany(
+                'INSERT INTO products VALUES (:id, :name, :description, :full_description, :features)',
+                [dict(document, features='\n'.join(document['features'])) for document in batch],
+            )
+        database.commit()
+        generated = time.perf_counter() - started
+
+        started = time.perf_counter()
+        database.row_factory = sqlite3.Row
+        index.rebuild(dict(row) for row in database.execute('SELECT * FROM products ORDER BY id'))
+        database.row_factory = None
+        indexed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"\n{size} products (generated in {generated:.1f}s, indexed in {indexed:.1f}s, "
+            f"index {index.stats()['file_bytes'] / 1024 / 1024:.1f} MB)"
+        )
+        self.stdout.write(f"{'query':<16}{'queryset ms':>14}{'index ms':>12}{'speedup':>10}{'hits':>8}")
+
+        for query in QUERIES:
+            escaped = re.sub(r'([\\%_])', r'\\\1', query)
+            params = {'prefix': f'{escaped}%', 'contains': f'%{escaped}%', 'limit': PAGE_SIZE}
+
+            def run_legacy():
+                database.execute(LEGACY_PAGE_SQL, params).fetchall()
+                return database.execute(LEGACY_COUNT_SQL, params).fetchone()[0]
+
+            def run_index():
+                ids = index.search(query) or []
+                page = ids[:PAGE_SIZE]
+                database.execute(
+                    f"SELECT id, name FROM products WHERE id IN ({', '.join('?' * len(page))})", page
+                ).fetchall()
+                return len(ids)
+
+            self._report(query, run_legacy, run_index, repeat)
+        database.close()
+
+    def _benchmark_catalog(self, repeat):
+        """Time both searches on the products in the configured database"""
+        count = Product.objects.count()
+        if not search_index.is_built():
+            self.stdout.write(self.style.WARNING('\nSearch index not built, run rebuild_search_index first'))
+            return
+
+        self.stdout.write(f"\nCatalog database ({count} products)")
+        self.stdout.write(f"{'query':<16}{'queryset ms':>14}{'index ms':>12}{'speedup':>10}{'hits':>8}")
+        for query in QUERIES:
+            def run_legacy():
+                queryset = legacy_search(Product.objects.all(), query)
+                list(queryset[:PAGE_SIZE])
+                return queryset.count()
+
+            def run_index():
+                ids = search_index.search(query) or []
+                list(Product.objects.filter(id__in=ids[:PAGE_SIZE]))
+                return len(ids)
+
+            self._report(query, run_legacy, run_index, repeat)
+
+    def _report(self, query, run_legacy, run_index, repeat):
+        """Time both callables and print one result row"""
+        legacy_ms = _median_ms(run_legacy, repeat)
+        index_ms = _median_ms(run_index, repeat)
+        hits = run_index()
+        speedup = legacy_ms / index_ms if index_ms else float('inf')
+        self.stdout.write(f'{query:<16}{legacy_ms:>14.2f}{index_ms:>12.2f}{speedup:>9.1f}x{hits:>8}')
+
+
+def _median_ms(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def _synthetic_products(size, batch_size=5000):
+    """Yield batches of products whose texts are shuffled from the seed products"""
+    rng = random.Random(size)
+    words = ' '.join(
+        f"{product['description']} {product['full_description']}" for product in PRODUCTS_DATA
+    ).split()
+    features = [feature for product in PRODUCTS_DATA for feature in product['features']]
+
+    batch = []
+    for product_id in range(1, size + 1):
+        template = rng.choice(PRODUCTS_DATA)
+        batch.append({
+            'id': product_id,
+            'name': f"{template['name']} {rng.choice(words).strip('.,')} {rng.randint(1, 9999)}",
+            'description': ' '.join(rng.choices(words, k=12)),
+            'full_description': ' '.join(rng.choices(words, k=60)),
+            'features': rng.sample(features, 4),
+        })
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,46 @@
+"""
+Management command to build the "frequently bought together" recommendations
+Usage: python manage.py build_recommendations [--full]
+
+Without --full only the orders of the last PRODUCT_RECOMMENDATIONS['LOOKBACK']
+seconds not counted yet are added, which is cheap enough to run every few
+minutes. --full recounts every order and should run daily or so to correct
+the drift of incremental runs. The cached recommendations of the products
+whose neighbours changed are dropped.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from backend.redis_client import redis_client
+from products.cache import PRODUCT, product_cache_key
+from products.recommender import recommender
+
+
+class Command(BaseCommand):
+    help = 'Count products bought together in orders and store the neighbours of each product'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recount every order instead of only the new ones',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        if options['full']:
+            orders, product_ids = recommender.rebuild()
+        else:
+            orders, product_ids = recommender.refresh()
+
+        if product_ids:
+            version = redis_client.get_namespace_version(PRODUCT)
+            redis_client.delete_many([
+                product_cache_key(product_id, 'recommendations', version=version) for product_id in product_ids
+            ])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Counted {orders} orders in {elapsed:.2f}s, {len(product_ids)} products updated")
+        )
@@ -0,0 +1,64 @@
+"""
+Management command to show cache metrics per key family
+Usage: python manage.py cache_stats [--family products:] [--sort hits] [--json] [--reset]
+"""
+
+import json
+from django.core.management.base import BaseCommand
+from backend.redis_client import redis_client
+
+
+class Command(BaseCommand):
+    help = 'Show cache hits, misses, errors, latency and payload sizes per key family'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--family',
+            help='Only show families containing this text',
+        )
+        parser.add_argument(
+            '--sort',
+            choices=['hits', 'misses', 'hit_rate', 'errors', 'avg_latency_ms', 'avg_read_bytes'],
+            default='hits',
+            help='Sort column, descending (default: hits)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print raw JSON including latency histograms',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset all counters after printing them',
+        )
+
+    def handle(self, *args, **options):
+        families = redis_client.get_metrics()
+        if options['family']:
+            families = {name: data for name, data in families.items() if options['family'] in name}
+
+        if options['json']:
+            self.stdout.write(json.dumps(families, indent=2))
+        elif not families:
+            self.stdout.write(self.style.WARNING('No cache metrics recorded yet'))
+        else:
+            self.stdout.write(
+                f"{'family':<40}{'hits':>10}{'l1 hits':>10}{'misses':>10}{'hit rate':>10}"
+                f"{'sets':>8}{'errors':>8}{'avg ms':>9}{'avg bytes':>11}"
+            )
+            rows = sorted(families.items(), key=lambda item: item[1][options['sort']], reverse=True)
+            for name, data in rows:
+                line = (
+                    f"{name:<40}{data['hits']:>10}{data['l1_hits']:>10}{data['misses']:>10}"
+                    f"{data['hit_rate']:>10.1%}{data['sets']:>8}{data['errors']:>8}"
+                    f"{data['avg_latency_ms']:>9.2f}{data['avg_read_bytes']:>11}"
+                )
+                # Families that are written but never read are candidates for removal
+                if data['sets'] and not data['hits']:
+                    line = self.style.WARNING(line)
+                self.stdout.write(line)
+
+        if options['reset']:
+            redis_client.reset_metrics()
+            self.stdout.write(self.style.SUCCESS('Cache metrics reset'))
@@ -1,10 +1,22 @@
 """
 Management command to clear product-related cache
-Usage: python manage.py clear_product_cache [--all] [--products] [--categories]
+Usage: python manage.py clear_product_cache [--all] [--products] [--categories] [--colors] [--product-id ID] [--purge]
+
+Clearing bumps the version of the affected cache namespaces, so it is a handful
+of INCRs regardless of how many entries are cached. Stale entries expire by
+TTL; pass --purge to also delete them right away with an incremental SCAN.
 """
 
 from django.core.management.base import BaseCommand
 from backend.redis_client import redis_client
+from products.cache import (
+    PRODUCT,
+    PRODUCT_COLLECTION_NAMESPACES,
+    CATEGORIES,
+    CATEGORY,
+    PRODUCT_COLORS,
+    invalidate_product_cache,
+)
 
 
 class Command(BaseCommand):
@@ -36,71 +48,51 @@ class Command(BaseCommand):
             type=int,
             help='Clear cache for specific product ID',
         )
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Also delete stale entries of the cleared namespaces (SCAN, slow on large caches)',
+        )
 
     def handle(self, *args, **options):
-        cleared_count = 0
-        
+        namespaces = []
+
         if options['all']:
             # Clear all product-related caches
-            patterns = [
-                'products:*',
-                'product:*',
-                'categories:*',
-                'category:*',
-                'product_colors:*',
-            ]
-            for pattern in patterns:
-                count = redis_client.clear_pattern(pattern)
-                cleared_count += count
-                self.stdout.write(f"Cleared {count} keys matching '{pattern}'")
-        
+            namespaces = [PRODUCT, *PRODUCT_COLLECTION_NAMESPACES, CATEGORIES, CATEGORY, PRODUCT_COLORS]
+
         elif options['product_id']:
             # Clear cache for specific product
             product_id = options['product_id']
-            patterns = [
-                f'product:{product_id}',
-                f'product:{product_id}:variants',
-                f'product:{product_id}:recommendations',
-                'products:list:*',
-                'products:filters:*',
-                'products:top_sellers',
-                'products:new_arrivals',
-                'products:personalized:*',
-            ]
-            for pattern in patterns:
-                count = redis_client.clear_pattern(pattern)
-                cleared_count += count
+            invalidate_product_cache(product_id)
             self.stdout.write(
                 self.style.SUCCESS(f"Cleared cache for product {product_id} and related caches")
             )
-        
+            return
+
         else:
             # Clear based on flags
             if options['products'] or not any([options['categories'], options['colors']]):
-                patterns = [
-                    'products:*',
-                    'product:*',
-                ]
-                for pattern in patterns:
-                    count = redis_client.clear_pattern(pattern)
-                    cleared_count += count
-                    self.stdout.write(f"Cleared {count} keys matching '{pattern}'")
-            
+                namespaces += [PRODUCT, *PRODUCT_COLLECTION_NAMESPACES]
+
             if options['categories']:
-                patterns = [
-                    'categories:*',
-                    'category:*',
-                ]
-                for pattern in patterns:
-                    count = redis_client.clear_pattern(pattern)
-                    cleared_count += count
-                    self.stdout.write(f"Cleared {count} keys matching '{pattern}'")
-            
+                namespaces += [CATEGORIES, CATEGORY]
+
             if options['colors']:
-                count = redis_client.clear_pattern('product_colors:*')
-                cleared_count += count
-                self.stdout.write(f"Cleared {count} keys matching 'product_colors:*'")
-        
+                namespaces.append(PRODUCT_COLORS)
+
+        redis_client.invalidate_namespace(*namespaces)
+        for namespace in namespaces:
+            self.stdout.write(f"Invalidated namespace '{namespace}'")
+
+        if options['purge']:
+            purged_count = 0
+            for namespace in namespaces:
+                count = redis_client.clear_pattern(f'{namespace}:v*')
+                purged_count += count
+                self.stdout.write(f"Purged {count} stale keys from '{namespace}'")
+            self.stdout.write(f'Purged {purged_count} cache keys')
+
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully cleared {cleared_count} cache keys')
+            self.style.SUCCESS(f'Successfully cleared {len(namespaces)} cache namespaces')
         )
@@ -0,0 +1,60 @@
+"""
+Management command to export products and variants to a catalog file
+Usage: python manage.py export_catalog PATH [--format csv|jsonl] [--batch-size 500]
+
+Writes one row per variant (see products.catalog.CATALOG_COLUMNS) to PATH,
+or to standard output with -, reading batch_size products at a time. The
+output can be fed back to import_catalog.
+"""
+
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from products.catalog import FORMATS, CatalogWriter, detect_format, export_rows, open_output
+
+
+class Command(BaseCommand):
+    help = 'Export products and variants as a CSV or JSON lines catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file, - for standard output')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='File format (default: from the file extension, CSV unless .jsonl)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Products read per query (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or detect_format(path)
+        try:
+            stream = open_output(path)
+        except OSError as e:
+            raise CommandError(f"Can't write {path}: {e}")
+        # Progress goes to stderr when the catalog is written to stdout
+        progress = sys.stderr if path == '-' else self.stdout
+
+        writer = CatalogWriter(stream, format)
+        started = time.perf_counter()
+        rows = 0
+        try:
+            for row in export_rows(options['batch_size']):
+                writer.write(row)
+                rows += 1
+                if rows % 10000 == 0:
+                    elapsed = time.perf_counter() - started
+                    progress.write(f"  {rows} rows, {rows / elapsed:.0f} rows/s\n")
+        finally:
+            if path != '-':
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        progress.write(
+            self.style.SUCCESS(f"Exported {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)") + '\n'
+        )
@@ -0,0 +1,524 @@
+"""
+Management command to generate a large synthetic dataset for performance testing
+Usage: python manage.py generate_load_dataset [--users 10000] [--products 2000] [--orders 100000]
+       [--years 3] [--reviews 50000] [--wishlist-items 3] [--seed 42] [--batch-size 2000]
+
+Creates users with accounts, carts, wishlists and addresses, products with
+2 to 20 variants each, orders spread over the last --years with their items
+and payment transactions, reviews and wishlist items. Popularity is skewed
+(Zipf-like), so a few products and customers account for most sales, as in
+production. Rows are written with bulk_create() in --batch-size batches,
+without model signals; variant summaries, sold counts, ratings and category
+counts are computed afterwards.
+
+The same --seed on an empty database gives the same data, on SQLite or
+MySQL. Run build_recommendations --full and rebuild_sales_leaderboard
+afterwards to count the generated orders.
+"""
+
+from bisect import bisect
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+from backend import cache_invalidation
+from cart.models import Cart
+from orders.models import Order, OrderItem
+from payments.models import PaymentTransaction
+from products.autocomplete import autocomplete
+from products.cache import PRODUCT as PRODUCT_NAMESPACE, invalidate_category_cache, invalidate_product_cache
+from products.facets import facet_index
+from products.management.commands.seed_colors import APPLE_COLORS
+from products.models import (
+    STORAGE_CHOICES,
+    Category,
+    Product,
+    ProductColor,
+    ProductVariant,
+    update_product_counts,
+    update_variant_summaries,
+)
+from products.search import search_index
+from products.synced_index import PRODUCT
+from reviews.models import Review
+from users.models import COUNTRY_CHOICES, Account, Address
+from wishlist.models import Wishlist, WishlistItem
+
+
+USERNAME_PREFIX = 'loaduser'
+PRODUCT_PREFIX = 'Load product'
+ORDER_PREFIX = 'LD'
+PASSWORD = 'loadtest'
+
+# Popularity skew: weight of the item ranked r is 1 / r ** exponent
+PRODUCT_SKEW = 1.1
+CUSTOMER_SKEW = 0.8
+
+FIRST_NAMES = ['An', 'Binh', 'Chi', 'Dung', 'Emma', 'Liam', 'Olivia', 'Noah', 'Mai', 'Sora', 'Yuki', 'Lan', 'Minh', 'Ava']
+LAST_NAMES = ['Nguyen', 'Tran', 'Le', 'Smith', 'Johnson', 'Brown', 'Tanaka', 'Sato', 'Pham', 'Wilson', 'Garcia', 'Lee']
+CITIES = ['Hanoi', 'Ho Chi Minh City', 'New York', 'Toronto', 'London', 'Sydney', 'Singapore', 'Tokyo', 'Da Nang']
+ADJECTIVES = ['Pro', 'Max', 'Air', 'Mini', 'Ultra', 'Plus', 'Lite', 'SE', 'Neo', 'Edge']
+FEATURES = [
+    'All-day battery life', 'Fast charging', 'Liquid Retina display', 'USB-C connector', 'Pro camera system',
+    'Face ID', 'Water resistant', 'Spatial audio', 'Wi-Fi 6E', 'Recycled aluminum design',
+]
+REVIEW_TITLES = ['Terrible', 'Disappointing', 'Okay', 'Great value', 'Love it']
+
+# Rating -> cumulative weight (reviews lean positive)
+RATING_WEIGHTS = list(accumulate([5, 7, 13, 30, 45]))
+STORAGES = [value for value, label in STORAGE_CHOICES]
+
+# Payment transaction status of an order in each status
+PAYMENT_STATUSES = {
+    'pending': 'pending',
+    'processing': 'success',
+    'shipped': 'success',
+    'completed': 'success',
+    'cancelled': 'canceled',
+    'refunded': 'refunded',
+}
+
+STORAGE_PREMIUM = {'128GB': 0, '256GB': 100, '512GB': 300, '1TB': 500, '2TB': 900}
+
+
+@contextmanager
+def historical_dates(*fields):
+    """Let bulk_create() store the given dates of auto_now / auto_now_add fields"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def zipf_weights(count: int, exponent: float) -> list:
+    """Cumulative weights of count items ranked by popularity"""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = 'Generate users, products, orders, payments, reviews and wishlists in bulk for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to create (default: 10000)')
+        parser.add_argument('--products', type=int, default=2000, help='Products to create (default: 2000)')
+        parser.add_argument('--orders', type=int, default=100000, help='Orders to create (default: 100000)')
+        parser.add_argument('--years', type=int, default=3, help='Years of order history (default: 3)')
+        parser.add_argument('--reviews', type=int, default=50000, help='Reviews to create (default: 50000)')
+        parser.add_argument(
+            '--wishlist-items',
+            type=int,
+            default=3,
+            help='Average wishlist items per user (default: 3)',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT (default: 2000)')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['products'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users, --products and --batch-size must be at least 1')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.now = timezone.now().replace(microsecond=0)
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'])
+        category_ids = self.ensure_categories()
+        color_ids = self.ensure_colors()
+        product_ids = self.create_products(options['products'], category_ids)
+        variants = self.create_variants(product_ids, color_ids)
+        self.create_orders(options['orders'], options['years'], user_ids, product_ids, variants)
+        self.create_reviews(options['reviews'], user_ids, product_ids)
+        self.create_wishlist_items(options['wishlist_items'], user_ids, product_ids)
+        self.finish(product_ids, category_ids)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Generated the dataset in {elapsed:.1f}s"))
+
+    # Writing
+
+    def insert(self, model, rows, label: str, dates=()):
+        """bulk_create() rows of a model in batches, reporting rows/s; rows can be a generator"""
+        started = time.perf_counter()
+        count = 0
+        batch = []
+        with historical_dates(*[model._meta.get_field(name) for name in dates]):
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    count += self._write(model, batch)
+                    batch = []
+                    if self.verbosity > 1 and count % (self.batch_size * 25) == 0:
+                        self.stdout.write(f"    {count} {label}")
+            if batch:
+                count += self._write(model, batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {count} {label} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} rows/s)")
+        return count
+
+    def _write(self, model, batch) -> int:
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+        return len(batch)
+
+    def pick(self, population, cum_weights):
+        return population[bisect(cum_weights, self.rng.random() * cum_weights[-1])]
+
+    def past(self, years: int):
+        """A moment of the last years, more of them recent (the business grows)"""
+        return self.now - timedelta(seconds=int(years * 365 * 86400 * (1 - self.rng.random() ** 0.6)))
+
+    # Users
+
+    def create_users(self, count: int) -> list:
+        self.stdout.write('Creating users...')
+        first = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        password = make_password(PASSWORD)
+        rng = self.rng
+        users = (
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+                password=password,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                date_joined=self.past(5),
+            )
+            for number in range(first, first + count)
+        )
+        self.insert(User, users, 'users')
+
+        names = [f'{USERNAME_PREFIX}{number}' for number in range(first, first + count)]
+        user_rows = []
+        for start in range(0, len(names), self.batch_size):
+            user_rows += User.objects.filter(
+                username__in=names[start:start + self.batch_size]
+            ).order_by('id').values_list('id', 'first_name', 'last_name')
+        user_rows.sort()
+        user_ids = [user_id for user_id, first_name, last_name in user_rows]
+
+        self.insert(Account, (
+            Account(user_id=user_id, first_name=first_name, last_name=last_name, phone=self.phone())
+            for user_id, first_name, last_name in user_rows
+        ), 'accounts')
+        self.insert(Cart, (Cart(user_id=user_id) for user_id in user_ids), 'carts')
+        self.insert(Wishlist, (Wishlist(user_id=user_id) for user_id in user_ids), 'wishlists')
+        self.insert(Address, self.addresses(user_rows), 'addresses', dates=['created_at'])
+        return user_ids
+
+    def addresses(self, user_rows):
+        rng = self.rng
+        countries = [value for value, label in COUNTRY_CHOICES]
+        for user_id, first_name, last_name in user_rows:
+            for position in range(rng.choice([1, 1, 1, 2, 3])):
+                yield Address(
+                    user_id=user_id,
+                    first_name=first_name,
+                    last_name=last_name,
+                    phone=self.phone(),
+                    address_line1=f'{rng.randint(1, 999)} {rng.choice(LAST_NAMES)} Street',
+                    city=rng.choice(CITIES),
+                    state=rng.choice(CITIES),
+                    zip_code=f'{rng.randint(10000, 99999)}',
+                    country=rng.choice(countries),
+                    is_default=position == 0,
+                    created_at=self.past(3),
+                )
+
+    def phone(self) -> str:
+        return f'+1{self.rng.randint(2000000000, 9999999999)}'
+
+    # Catalog
+
+    def ensure_categories(self) -> list:
+        """Ids of the categories products go to, the leaves of the tree; creates a tree if there is none"""
+        categories = Category.objects
+        if not categories.exists():
+            self.stdout.write('Creating categories...')
+            for root_number in range(1, 6):
+                root = Category(name=f'Load category {root_number}', slug=f'load-category-{root_number}')
+                root.save()
+                for child_number in range(1, 5):
+                    Category(
+                        name=f'Load category {root_number}.{child_number}',
+                        slug=f'load-category-{root_number}-{child_number}',
+                        parent=root,
+                        sort_order=child_number,
+                    ).save()
+        parent_ids = set(categories.exclude(parent_id=None).values_list('parent_id', flat=True))
+        return sorted(set(categories.values_list('id', flat=True)) - parent_ids)
+
+    def ensure_colors(self) -> list:
+        colors = ProductColor.objects
+        existing = set(colors.values_list('name', flat=True))
+        missing = [ProductColor(name=name, hex_code=hex_code) for name, hex_code in APPLE_COLORS if name not in existing]
+        if missing:
+            colors.bulk_create(missing)
+        return sorted(colors.values_list('id', flat=True))
+
+    def create_products(self, count: int, category_ids: list) -> list:
+        self.stdout.write('Creating products...')
+        first = Product.objects.filter(name__startswith=PRODUCT_PREFIX).count()
+        rng = self.rng
+
+        def products():
+            for number in range(first, first + count):
+                created_at = self.past(4)
+                yield Product(
+                    name=f'{PRODUCT_PREFIX} {number} {rng.choice(ADJECTIVES)}',
+                    category_id=rng.choice(category_ids),
+                    badge=rng.choice([None, None, None, 'New', 'Best Seller', 'Popular']),
+                    description=f'Synthetic product {number} for load testing',
+                    full_description=' '.join(rng.sample(FEATURES, 5)),
+                    features=rng.sample(FEATURES, rng.randint(3, 6)),
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+
+        self.insert(Product, products(), 'products', dates=['created_at', 'updated_at'])
+        return list(
+            Product.objects
+            .filter(name__startswith=f'{PRODUCT_PREFIX} ')
+            .order_by('id')
+            .values_list('id', flat=True)[first:first + count]
+        )
+
+    def create_variants(self, product_ids: list, color_ids: list) -> dict:
+        """Create 2 to 20 variants per product; returns product id -> [(variant id, price)]"""
+        self.stdout.write('Creating variants...')
+        rng = self.rng
+
+        def variants():
+            for product_id in product_ids:
+                base = Decimal(rng.randrange(199, 2499, 10))
+                storages = sorted(rng.sample(STORAGES, rng.choice([1, 2, 3, 3, 4])), key=STORAGES.index)
+                created_at = self.past(4)
+                for color_id in rng.sample(color_ids, min(len(color_ids), rng.choice([2, 3, 3, 4, 5]))):
+                    for storage in storages:
+                        stock = 0 if rng.random() < 0.08 else rng.randint(1, 500)
+                        yield ProductVariant(
+                            product_id=product_id,
+                            color_id=color_id,
+                            storage=storage,
+                            price=base + STORAGE_PREMIUM[storage],
+                            stock=stock,
+                            sold=0,
+                            is_in_stock=stock > 0,
+                            created_at=created_at,
+                            updated_at=created_at,
+                        )
+
+        self.insert(ProductVariant, variants(), 'variants', dates=['created_at', 'updated_at'])
+        by_product = defaultdict(list)
+        for start in range(0, len(product_ids), self.batch_size):
+            rows = (
+                ProductVariant.objects
+                .filter(product_id__in=product_ids[start:start + self.batch_size])
+                .order_by('id')
+                .values_list('product_id', 'id', 'price')
+            )
+            for product_id, variant_id, price in rows:
+                by_product[product_id].append((variant_id, price))
+        return by_product
+
+    # Orders
+
+    def create_orders(self, count: int, years: int, user_ids: list, product_ids: list, variants: dict):
+        """Orders with their items and payments; variant sold counts follow the paid ones"""
+        self.stdout.write('Creating orders...')
+        rng = self.rng
+        first = Order.objects.filter(id__startswith=ORDER_PREFIX).count()
+        popular_products = rng.sample(product_ids, len(product_ids))
+        product_weights = zipf_weights(len(popular_products), PRODUCT_SKEW)
+        customers = rng.sample(user_ids, len(user_ids))
+        customer_weights = zipf_weights(len(customers), CUSTOMER_SKEW)
+        addresses = defaultdict(list)
+        for address_id, user_id in Address.objects.filter(user_id__in=user_ids).values_list('id', 'user_id'):
+            addresses[user_id].append(address_id)
+        shipping_methods = list(Order.SHIPPING_COSTS)
+
+        sold = Counter()
+        items = []
+        payments = []
+
+        def orders():
+            for number in range(first, first + count):
+                order_id = f'{ORDER_PREFIX}{number:010d}'
+                user_id = self.pick(customers, customer_weights)
+                date = self.past(years)
+                status = self.order_status(date)
+                is_paid = status in ('processing', 'shipped', 'completed')
+                shipping_method = rng.choice(shipping_methods)
+
+                total = Decimal(str(Order.SHIPPING_COSTS[shipping_method]))
+                chosen = set()
+                for position in range(min(len(product_ids), 1 + int(rng.expovariate(1.2)))):
+                    product_id = self.pick(popular_products, product_weights)
+                    if product_id in chosen or not variants.get(product_id):
+                        continue
+                    chosen.add(product_id)
+                    variant_id, price = rng.choice(variants[product_id])
+                    quantity = 1 if rng.random() < 0.85 else rng.randint(2, 3)
+                    items.append(OrderItem(order_id=order_id, product_variant_id=variant_id, quantity=quantity, price=price))
+                    total += price * quantity
+                    if is_paid:
+                        sold[variant_id] += quantity
+
+                payments.append(PaymentTransaction(
+                    order_id=order_id,
+                    stripe_checkout_id=f'cs_load_{order_id}',
+                    stripe_payment_intent=f'pi_load_{order_id}' if status != 'pending' else None,
+                    amount=total,
+                    status=PAYMENT_STATUSES[status],
+                    created_at=date,
+                ))
+                yield Order(
+                    id=order_id,
+                    user_id=user_id,
+                    shipping_address_id=rng.choice(addresses[user_id]) if addresses[user_id] else None,
+                    shipping_method=shipping_method,
+                    total=total,
+                    status=status,
+                    date=date,
+                    is_paid=is_paid,
+                )
+
+        # Items and payments reference their orders, so they are written after each batch of orders
+        started = time.perf_counter()
+        written = 0
+        with historical_dates(Order._meta.get_field('date'), PaymentTransaction._meta.get_field('created_at')):
+            batch = []
+            for order in orders():
+                batch.append(order)
+                if len(batch) >= self.batch_size:
+                    written += self._write_orders(batch, items, payments)
+                    batch = []
+                    if self.verbosity > 1 and written % (self.batch_size * 25) == 0:
+                        self.stdout.write(f"    {written} orders")
+            if batch:
+                written += self._write_orders(batch, items, payments)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {written} orders with items and payments in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} orders/s)")
+
+        # Counted from the generated orders instead of stock movements
+        sold_variants = [ProductVariant(id=variant_id, sold=quantity) for variant_id, quantity in sold.items()]
+        for start in range(0, len(sold_variants), self.batch_size):
+            with transaction.atomic():
+                ProductVariant.objects.bulk_update(
+                    sold_variants[start:start + self.batch_size], ['sold'], batch_size=self.batch_size
+                )
+
+    def _write_orders(self, orders, items, payments) -> int:
+        with transaction.atomic():
+            Order.objects.bulk_create(orders, batch_size=self.batch_size)
+            OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+            PaymentTransaction.objects.bulk_create(payments, batch_size=self.batch_size)
+        items.clear()
+        payments.clear()
+        return len(orders)
+
+    def order_status(self, date) -> str:
+        """Old orders are done, recent ones still moving"""
+        roll = self.rng.random()
+        if roll < 0.05:
+            return 'cancelled'
+        if roll < 0.07:
+            return 'refunded'
+        age = self.now - date
+        if age < timedelta(days=2):
+            return self.rng.choice(['pending', 'processing'])
+        if age < timedelta(days=10):
+            return self.rng.choice(['processing', 'shipped', 'completed'])
+        return 'completed'
+
+    # Reviews and wishlists
+
+    def create_reviews(self, count: int, user_ids: list, product_ids: list):
+        self.stdout.write('Creating reviews...')
+        rng = self.rng
+        popular_products = rng.sample(product_ids, len(product_ids))
+        weights = zipf_weights(len(popular_products), PRODUCT_SKEW)
+        count = min(count, len(user_ids) * len(product_ids))
+
+        def reviews():
+            seen = set()
+            attempts = 0
+            while len(seen) < count and attempts < count * 10:
+                attempts += 1
+                pair = (rng.choice(user_ids), self.pick(popular_products, weights))
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                rating = bisect(RATING_WEIGHTS, rng.random() * RATING_WEIGHTS[-1]) + 1
+                created_at = self.past(3)
+                yield Review(
+                    user_id=pair[0],
+                    product_id=pair[1],
+                    rating=rating,
+                    title=REVIEW_TITLES[rating - 1],
+                    comment=f'Synthetic {rating} star review for load testing.',
+                    is_verified_purchase=rng.random() < 0.7,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+
+        self.insert(Review, reviews(), 'reviews', dates=['created_at', 'updated_at'])
+
+    def create_wishlist_items(self, average: int, user_ids: list, product_ids: list):
+        self.stdout.write('Creating wishlist items...')
+        rng = self.rng
+        popular_products = rng.sample(product_ids, len(product_ids))
+        weights = zipf_weights(len(popular_products), PRODUCT_SKEW)
+        wishlists = dict(Wishlist.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+
+        def items():
+            for user_id in user_ids:
+                chosen = {self.pick(popular_products, weights) for each in range(rng.randint(0, 2 * average))}
+                for product_id in sorted(chosen):
+                    yield WishlistItem(wishlist_id=wishlists[user_id], product_id=product_id, added_at=self.past(2))
+
+        self.insert(WishlistItem, items(), 'wishlist items', dates=['added_at'])
+
+    # Derived data
+
+    def finish(self, product_ids: list, category_ids: list):
+        """Fill what the skipped signals would have: summaries, ratings, counts and caches"""
+        self.stdout.write('Updating product summaries, ratings and category counts...')
+        for start in range(0, len(product_ids), self.batch_size):
+            batch = product_ids[start:start + self.batch_size]
+            update_variant_summaries(batch)
+            ratings = (
+                Review.objects
+                .filter(product_id__in=batch)
+                .values('product_id')
+                .annotate(average=Avg('rating'), count=Count('id'))
+            )
+            Product.objects.bulk_update([
+                Product(id=row['product_id'], rating=round(row['average'], 1), reviews=row['count']) for row in ratings
+            ], ['rating', 'reviews'], batch_size=self.batch_size)
+
+        with cache_invalidation.deferred():
+            update_product_counts(category_ids)
+            cache_invalidation.invalidate_namespaces(PRODUCT_NAMESPACE)
+            invalidate_product_cache()
+            invalidate_category_cache()
+
+        self.stdout.write('Indexing products...')
+        for start in range(0, len(product_ids), self.batch_size):
+            search_index.update(product_ids[start:start + self.batch_size])
+        autocomplete.record_changes(PRODUCT, product_ids)
+        facet_index.record_changes(PRODUCT, product_ids)
+
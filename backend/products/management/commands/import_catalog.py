@@ -0,0 +1,66 @@
+"""
+Management command to import products and variants from a catalog file
+Usage: python manage.py import_catalog PATH [--format csv|jsonl] [--batch-size 1000]
+
+PATH is a CSV or JSON lines file with one row per variant (see
+products.catalog.CATALOG_COLUMNS), or - for standard input. Rows are
+upserted in batches without model signals; variant summaries, category
+counts, search indexes and caches are refreshed once at the end.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from products.catalog import FORMATS, CatalogImporter, batches, detect_format, open_input, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create or update products and variants from a CSV or JSON lines catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file, - for standard input')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='File format (default: from the file extension, CSV unless .jsonl)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or detect_format(path)
+        try:
+            stream = open_input(path)
+        except OSError as e:
+            raise CommandError(f"Can't read {path}: {e}")
+
+        importer = CatalogImporter()
+        started = time.perf_counter()
+        rows = 0
+        try:
+            for batch in batches(read_rows(stream, format), options['batch_size']):
+                importer.import_batch(batch)
+                rows += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"  {rows} rows, {rows / elapsed:.0f} rows/s")
+        finally:
+            if path != '-':
+                stream.close()
+
+        self.stdout.write('Refreshing summaries, counts, indexes and caches...')
+        importer.finish()
+
+        for error in importer.errors[:50] if options['verbosity'] < 2 else importer.errors:
+            self.stdout.write(self.style.WARNING(f"  Skipped {error}"))
+        if options['verbosity'] < 2 and len(importer.errors) > 50:
+            self.stdout.write(self.style.WARNING(f"  ... {len(importer.errors) - 50} more, see --verbosity 2"))
+
+        elapsed = time.perf_counter() - started
+        counts = ', '.join(f"{count} {name}" for name, count in sorted(importer.stats.items())) or 'no changes'
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s): {counts}")
+        )
@@ -0,0 +1,80 @@
+"""
+Management command running the image renditions worker
+Usage: python manage.py process_images [--once] [--all]
+
+Saves that change a product, category or avatar image queue it in Redis;
+this writes its renditions (see backend.image_renditions). It runs until
+stopped, or with --once until the queue is empty. --all first queues every
+image without renditions, e.g. after deploying or when Redis lost the queue.
+"""
+
+import time
+from django.apps import apps
+from django.core.management.base import BaseCommand
+import redis
+from backend import image_renditions
+
+
+# Models with images that have renditions
+RENDITION_MODELS = ['products.category', 'products.product', 'users.account']
+
+# Seconds to wait before reading the queue again after a Redis error, doubling up to the maximum
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 30
+
+
+class Command(BaseCommand):
+    help = 'Write the renditions of newly uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Stop once the queue is empty',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='First queue every image without renditions',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            queued = 0
+            for label in RENDITION_MODELS:
+                model = apps.get_model(label)
+                for field, hash_field in model.rendition_fields.items():
+                    pending = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                    for obj in pending.filter(**{hash_field: ''}).only('pk').iterator():
+                        image_renditions.queue_renditions(obj, field)
+                        queued += 1
+            self.stdout.write(f"Queued {queued} images")
+
+        processed = 0
+        retry_delay = RETRY_DELAY
+        while True:
+            try:
+                job = image_renditions.next_job()
+            except redis.RedisError as e:
+                self.stderr.write(f"Redis IMAGES error: {e}, retrying in {retry_delay}s")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                continue
+            retry_delay = RETRY_DELAY
+            if job is None:
+                if options['once']:
+                    break
+                continue
+
+            started = time.perf_counter()
+            try:
+                written = image_renditions.process(*job)
+            except Exception as e:
+                self.stderr.write(f"  {job[0]} {job[1]} {job[2]} failed: {e}")
+                continue
+            if written:
+                processed += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"  {job[0]} {job[1]} in {time.perf_counter() - started:.2f}s")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} images"))
@@ -0,0 +1,30 @@
+"""
+Management command to rebuild the top sellers leaderboard from the orders
+Usage: python manage.py rebuild_sales_leaderboard
+
+The order signals add paid orders to the hourly sales buckets (see
+products.sales) as they happen. This recomputes every bucket of the longest
+window from the database, e.g. after Redis lost its data or orders were
+changed without signals. Sales recorded while it runs may be lost, so run it
+when traffic is low.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from backend import cache_invalidation
+from products import sales
+from products.cache import TOP_SELLERS
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly sales buckets behind the top sellers from the orders'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        orders = sales.rebuild()
+        cache_invalidation.invalidate_namespaces(TOP_SELLERS)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Counted {orders} orders of the last {sales.RETENTION // 86400} days in {elapsed:.2f}s")
+        )
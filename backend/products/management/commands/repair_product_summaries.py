@@ -0,0 +1,62 @@
+"""
+Management command to repair the variant summary stored on products
+Usage: python manage.py repair_product_summaries [--batch-size 500] [--dry-run]
+
+The variant signals keep min_price, max_price, total_stock, in_stock,
+available_colors and available_storages in step with the variants. Writes
+that skip signals (queryset.update(), bulk_create(), raw SQL) leave them
+behind; this recomputes every product's summary and stores the ones that
+drifted.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from products.models import Product, VARIANT_SUMMARY_FIELDS, summarize_variants
+
+
+class Command(BaseCommand):
+    help = 'Recompute the variant summary of products and fix the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Products checked per query (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the products that drifted',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        started = time.perf_counter()
+
+        checked = repaired = 0
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(product_ids), batch_size):
+            batch = product_ids[start:start + batch_size]
+            summaries = summarize_variants(batch)
+            stored = Product.objects.filter(id__in=batch).values('id', *VARIANT_SUMMARY_FIELDS)
+
+            drifted = []
+            for current in stored:
+                summary = summaries[current['id']]
+                if any(current[field] != summary[field] for field in VARIANT_SUMMARY_FIELDS):
+                    drifted.append(Product(id=current['id'], **summary))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"  Product {current['id']} drifted")
+            checked += len(batch)
+            repaired += len(drifted)
+
+            if drifted and not dry_run:
+                Product.objects.bulk_update(drifted, VARIANT_SUMMARY_FIELDS, batch_size=batch_size)
+
+        elapsed = time.perf_counter() - started
+        action = 'would be repaired' if dry_run else 'repaired'
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} products in {elapsed:.2f}s, {repaired} {action}")
+        )
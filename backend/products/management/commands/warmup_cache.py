@@ -1,13 +1,23 @@
 """
 Management command to warm up (pre-populate) product cache
-Usage: python manage.py warmup_cache
+Usage: python manage.py warmup_cache [--all-products] [--batch-size 500] [--workers 4]
+
+Products are fetched in batches and serialized across a process pool; each
+batch is written to Redis with one pipelined set_many(). Entries hold
+rendered response bodies, as written by the views.
 """
 
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from django.core.management.base import BaseCommand
-from django.db.models import Q, Sum, Min, Max
-from django.utils import timezone
-from datetime import timedelta
+from django.db import connections
+from django.db.models import Min, Max
 from products.models import Product, Category, ProductColor, ProductVariant
+from products.category_tree import category_tree
+from products.facets import facet_index
+from products.sales import WINDOWS as SALES_WINDOWS, top_selling_products
 from products.serializers import (
     ProductSerializer,
     ProductRecommendationSerializer,
@@ -15,7 +25,52 @@ from products.serializers import (
     ProductColorSerializer,
     ProductVariantSerializer
 )
-from backend.redis_client import redis_client
+from backend.redis_client import redis_client, DEFAULT_STALE_TIMEOUT
+from backend.cached_response import render_body
+from products.cache import (
+    CATEGORIES,
+    CATEGORY,
+    PRODUCT_COLORS,
+    PRODUCT_LIST,
+    PRODUCT_FILTERS,
+    TOP_SELLERS,
+    NEW_ARRIVALS,
+    PRODUCT,
+    generate_cache_key,
+    product_cache_key,
+    track_products,
+)
+
+
+PRODUCT_TIMEOUT = 900
+
+
+def serialize_product_batch(product_ids):
+    """
+    Serialize products and their variant lists
+
+    Runs in pool workers, so it fetches its own rows and returns plain data.
+
+    Returns:
+        List of (product_id, product_body, variants_body) tuples of rendered bodies
+    """
+    products = (
+        Product.objects
+        .filter(id__in=product_ids)
+        .select_related('category', 'category__parent')
+        .prefetch_related('variants__color')
+    )
+    results = []
+    for product in products:
+        # Same order as ProductViewSet.variants, using the prefetched rows
+        variants = sorted(product.variants.all(), key=lambda variant: variant.created_at, reverse=True)
+        variants.sort(key=lambda variant: (variant.color.name, variant.storage is not None, variant.storage or ''))
+        results.append((
+            product.id,
+            render_body(ProductSerializer(product).data),
+            render_body(ProductVariantSerializer(variants, many=True).data),
+        ))
+    return results
 
 
 class Command(BaseCommand):
@@ -27,164 +82,214 @@ class Command(BaseCommand):
             action='store_true',
             help='Show detailed progress',
         )
+        parser.add_argument(
+            '--all-products',
+            action='store_true',
+            help='Cache every product instead of the 20 most popular',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Products fetched, serialized and written per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used to serialize products (default: CPU count, 1 disables the pool)',
+        )
 
     def handle(self, *args, **options):
         verbose = options['verbose']
+        batch_size = max(options['batch_size'], 1)
+        started = time.monotonic()
         self.stdout.write('Starting cache warmup...')
-        
+
         # 1. Cache all categories
         if verbose:
             self.stdout.write('Caching categories...')
-        categories = Category.objects.all()
+        categories = list(Category.objects.all())
         serializer = CategorySerializer(categories, many=True)
-        redis_client.set('categories:all', serializer.data, timeout=1800)
+        redis_client.set(redis_client.versioned_key(CATEGORIES, 'all'), render_body(serializer.data), timeout=1800)
         if verbose:
-            self.stdout.write(f"  ✓ Cached {categories.count()} categories")
-        
+            self.stdout.write(f"  ✓ Cached {len(categories)} categories")
+
         # 2. Cache individual categories
-        for category in categories:
-            redis_client.set(f'category:{category.id}', CategorySerializer(category).data, timeout=1800)
+        redis_client.set_many({
+            redis_client.versioned_key(CATEGORY, category['id']): render_body(category)
+            for category in serializer.data
+        }, timeout=1800)
         if verbose:
-            self.stdout.write(f"  ✓ Cached {categories.count()} individual categories")
-        
+            self.stdout.write(f"  ✓ Cached {len(categories)} individual categories")
+
+        # The category tree used for subtree filters and breadcrumbs
+        category_tree()
+
         # 3. Cache all product colors
         if verbose:
             self.stdout.write('Caching product colors...')
         colors = ProductColor.objects.all()
         serializer = ProductColorSerializer(colors, many=True)
-        redis_client.set('product_colors:all', serializer.data, timeout=3600)
+        redis_client.set(redis_client.versioned_key(PRODUCT_COLORS, 'all'), render_body(serializer.data), timeout=3600)
         if verbose:
-            self.stdout.write(f"  ✓ Cached {colors.count()} colors")
-        
+            self.stdout.write(f"  ✓ Cached {len(serializer.data)} colors")
+
         # 4. Cache top sellers
         if verbose:
             self.stdout.write('Caching top sellers...')
-        last_7_days = timezone.now() - timedelta(days=7)
-        top_products = (
-            Product.objects
-            .filter(variants__orderitem__order__date__gte=last_7_days)
-            .prefetch_related('variants__color')
-            .annotate(total_sold=Sum('variants__sold'))
-            .order_by('-total_sold')
-            .distinct()[:10]
-        )
-        if not top_products.exists():
-            top_products = (
-                Product.objects
-                .filter(variants__sold__gt=0)
-                .prefetch_related('variants__color')
-                .annotate(total_sold=Sum('variants__sold'))
-                .order_by('-total_sold')[:10]
-            )
-        if not top_products.exists():
-            top_products = Product.objects.prefetch_related('variants__color').order_by('-created_at')[:10]
-        
-        serializer = ProductRecommendationSerializer(top_products, many=True)
-        redis_client.set('products:top_sellers', serializer.data, timeout=1800)
-        if verbose:
-            self.stdout.write(f"  ✓ Cached {top_products.count()} top sellers")
-        
+        for window in SALES_WINDOWS:
+            serializer = ProductRecommendationSerializer(top_selling_products(window, limit=10), many=True)
+            cache_key = redis_client.versioned_key(TOP_SELLERS, window)
+            track_products(TOP_SELLERS, cache_key, serializer.data, 60 + DEFAULT_STALE_TIMEOUT)
+            redis_client.set_entry(cache_key, render_body(serializer.data), timeout=60)
+            if verbose:
+                self.stdout.write(f"  ✓ Cached {len(serializer.data)} top sellers ({window})")
+
         # 5. Cache new arrivals
         if verbose:
             self.stdout.write('Caching new arrivals...')
         new_products = (
             Product.objects
-            .filter(variants__is_in_stock=True)
-            .prefetch_related('variants__color')
-            .distinct()
+            .filter(in_stock=True)
+            .select_related('category')
             .order_by('-created_at')[:10]
         )
         serializer = ProductRecommendationSerializer(new_products, many=True)
-        redis_client.set('products:new_arrivals', serializer.data, timeout=900)
-        if verbose:
-            self.stdout.write(f"  ✓ Cached {new_products.count()} new arrivals")
-        
-        # 6. Cache popular products (highest rated)
+        cache_key = generate_cache_key(NEW_ARRIVALS)
+        track_products(NEW_ARRIVALS, cache_key, serializer.data, 900 + DEFAULT_STALE_TIMEOUT)
+        redis_client.set_entry(cache_key, render_body(serializer.data), timeout=900)
         if verbose:
-            self.stdout.write('Caching popular products...')
-        popular_products = (
-            Product.objects
-            .filter(variants__is_in_stock=True, rating__gt=0)
-            .prefetch_related('variants__color')
-            .distinct()
-            .order_by('-rating', '-reviews')[:20]
+            self.stdout.write(f"  ✓ Cached {len(serializer.data)} new arrivals")
+
+        # 6. Cache individual products and their variants
+        if options['all_products']:
+            if verbose:
+                self.stdout.write('Caching all products...')
+            product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        else:
+            if verbose:
+                self.stdout.write('Caching popular products...')
+            product_ids = list(
+                Product.objects
+                .filter(in_stock=True, rating__gt=0)
+                .order_by('-rating', '-reviews')
+                .values_list('id', flat=True)[:20]
+            )
+        products_started = time.monotonic()
+        cached_products = self._warm_products(product_ids, batch_size, options['workers'], verbose)
+        products_elapsed = time.monotonic() - products_started
+
+        rate = cached_products / products_elapsed if products_elapsed else 0
+        self.stdout.write(
+            f"  ✓ Cached {cached_products} products and their variants "
+            f"in {products_elapsed:.1f}s ({rate:.0f} products/s)"
         )
-        for product in popular_products:
-            # Cache individual product
-            serializer = ProductSerializer(product)
-            redis_client.set(f'product:{product.id}', serializer.data, timeout=900)
-            
-            # Cache product variants
-            variants = product.variants.select_related('color').order_by('color__name', 'storage', '-created_at')
-            variant_serializer = ProductVariantSerializer(variants, many=True)
-            redis_client.set(f'product:{product.id}:variants', variant_serializer.data, timeout=900)
-        
-        if verbose:
-            self.stdout.write(f"  ✓ Cached {popular_products.count()} popular products and their variants")
-        
+
         # 7. Cache filter options for main categories
         if verbose:
             self.stdout.write('Caching filter options...')
-        main_categories = Category.objects.filter(parent__isnull=True)
+        main_categories = [category for category in categories if category.parent_id is None]
+        filter_entries = {}
         for category in main_categories:
-            queryset = Product.objects.filter(
-                Q(category=category) | Q(category__parent=category)
-            ).filter(variants__isnull=False).distinct()
-            
-            price_range = ProductVariant.objects.filter(
-                product__in=queryset
-            ).aggregate(
-                min_price=Min('price'),
-                max_price=Max('price')
-            )
-            
-            colors = ProductColor.objects.filter(
-                variants__product__in=queryset
-            ).distinct().values('id', 'name', 'hex_code')
-            
-            storages = ProductVariant.objects.filter(
-                product__in=queryset
-            ).values_list('storage', flat=True).distinct()
-            storage_options = [storage for storage in storages if storage]
-            
-            filter_data = {
-                'price_range': price_range,
-                'colors': list(colors),
-                'storage_options': storage_options,
-            }
-            
-            # Generate cache key
-            import hashlib
-            params = f"category__slug={category.slug}"
-            params_hash = hashlib.md5(params.encode()).hexdigest()[:8]
-            cache_key = f'products:filters:{params_hash}'
-            
-            redis_client.set(cache_key, filter_data, timeout=1800)
-        
+            # Same data as ProductViewSet._build_filters: from the facet index, with counts
+            filter_data = facet_index.filter_options(category.slug)
+            if filter_data is None:
+                filter_data = self._filter_options_from_db(category)
+
+            cache_key = generate_cache_key(PRODUCT_FILTERS, category_slug=category.slug)
+            filter_entries[cache_key] = redis_client.make_entry(render_body(filter_data), timeout=1800)
+
+        redis_client.set_many(filter_entries, timeout=1800 + DEFAULT_STALE_TIMEOUT)
         if verbose:
-            self.stdout.write(f"  ✓ Cached filters for {main_categories.count()} categories")
-        
+            self.stdout.write(f"  ✓ Cached filters for {len(main_categories)} categories")
+
         # 8. Cache product list for main categories
         if verbose:
             self.stdout.write('Caching product lists for categories...')
+        list_entries = {}
         for category in main_categories[:5]:  # Limit to top 5 categories
             queryset = Product.objects.filter(
-                Q(category=category) | Q(category__parent=category)
-            ).prefetch_related('variants__color').order_by('-created_at')[:20]
-            
+                category__path__startswith=category.path
+            ).select_related('category').prefetch_related('variants__color').order_by('-created_at')[:20]
+
             serializer = ProductSerializer(queryset, many=True)
-            
-            # Generate cache key
-            import hashlib
-            params = f"category__slug={category.slug}"
-            params_hash = hashlib.md5(params.encode()).hexdigest()[:8]
-            cache_key = f'products:list:{params_hash}'
-            
-            redis_client.set(cache_key, serializer.data, timeout=600)
-        
+            cache_key = generate_cache_key(PRODUCT_LIST, category__slug=category.slug)
+            track_products(PRODUCT_LIST, cache_key, serializer.data, 600 + DEFAULT_STALE_TIMEOUT)
+            list_entries[cache_key] = redis_client.make_entry(render_body(serializer.data), timeout=600)
+
+        redis_client.set_many(list_entries, timeout=600 + DEFAULT_STALE_TIMEOUT)
         if verbose:
-            self.stdout.write(f"  ✓ Cached product lists for top categories")
-        
+            self.stdout.write("  ✓ Cached product lists for top categories")
+
+        elapsed = time.monotonic() - started
         self.stdout.write(
-            self.style.SUCCESS('✓ Cache warmup completed successfully!')
+            self.style.SUCCESS(
+                f'✓ Cache warmup completed successfully in {elapsed:.1f}s '
+                f'({cached_products} products)'
+            )
         )
+
+    @staticmethod
+    def _filter_options_from_db(category):
+        """Filter options of a category when the facet index can't answer, as the view falls back to"""
+        queryset = Product.objects.filter(
+            category__path__startswith=category.path
+        ).filter(variants__isnull=False).distinct()
+
+        price_range = ProductVariant.objects.filter(
+            product__in=queryset
+        ).aggregate(
+            min_price=Min('price'),
+            max_price=Max('price')
+        )
+
+        colors = ProductColor.objects.filter(
+            variants__product__in=queryset
+        ).distinct().values('id', 'name', 'hex_code')
+
+        storages = ProductVariant.objects.filter(
+            product__in=queryset
+        ).values_list('storage', flat=True).distinct()
+        storage_options = [storage for storage in storages if storage]
+
+        return {
+            'price_range': price_range,
+            'colors': list(colors),
+            'storage_options': storage_options,
+        }
+
+    def _warm_products(self, product_ids, batch_size, workers, verbose):
+        """Serialize products in batches (in parallel if workers > 1) and cache each batch"""
+        batches = [product_ids[i:i + batch_size] for i in range(0, len(product_ids), batch_size)]
+        if not batches:
+            return 0
+
+        if workers > 1 and len(batches) > 1:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=min(workers, len(batches)),
+                mp_context=multiprocessing.get_context('fork'),
+            )
+            results = executor.map(serialize_product_batch, batches)
+        else:
+            executor = None
+            results = map(serialize_product_batch, batches)
+
+        cached = 0
+        product_version = redis_client.get_namespace_version(PRODUCT)
+        try:
+            for batch in results:
+                entries = {}
+                for product_id, product_body, variants_body in batch:
+                    entries[product_cache_key(product_id, version=product_version)] = product_body
+                    entries[product_cache_key(product_id, 'variants', product_version)] = variants_body
+                redis_client.set_many(entries, timeout=PRODUCT_TIMEOUT)
+                cached += len(batch)
+                if verbose:
+                    self.stdout.write(f"    {cached}/{len(product_ids)} products")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return cached
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+STORAGE_ORDER = ['128GB', '256GB', '512GB', '1TB', '2TB']
+
+SUMMARY_FIELDS = ['min_price', 'max_price', 'total_stock', 'in_stock', 'available_colors', 'available_storages']
+
+
+def fill_variant_summaries(apps, schema_editor):
+    """Compute the new summary columns of existing products from their variants"""
+    Product = apps.get_model('products', 'Product')
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+
+    summaries = {}
+    variants = (
+        ProductVariant.objects
+        .order_by('color__name', 'color_id')
+        .values_list('product_id', 'price', 'stock', 'is_in_stock', 'storage', 'color_id', 'color__name', 'color__hex_code')
+    )
+    for product_id, price, stock, is_in_stock, storage, color_id, color_name, hex_code in variants.iterator():
+        summary = summaries.setdefault(product_id, {
+            'min_price': price,
+            'max_price': price,
+            'total_stock': 0,
+            'in_stock': False,
+            'available_colors': [],
+            'available_storages': [],
+        })
+        summary['min_price'] = min(summary['min_price'], price)
+        summary['max_price'] = max(summary['max_price'], price)
+        summary['total_stock'] += stock
+        summary['in_stock'] = summary['in_stock'] or is_in_stock
+        color = {'id': color_id, 'name': color_name, 'hex_code': hex_code}
+        if color not in summary['available_colors']:
+            summary['available_colors'].append(color)
+        if storage and storage not in summary['available_storages']:
+            summary['available_storages'].append(storage)
+
+    products = []
+    for product_id, summary in summaries.items():
+        summary['available_storages'].sort(
+            key=lambda value: (STORAGE_ORDER.index(value) if value in STORAGE_ORDER else len(STORAGE_ORDER), value)
+        )
+        products.append(Product(id=product_id, **summary))
+    Product.objects.bulk_update(products, SUMMARY_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='in_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='available_colors',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='available_storages',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(fill_variant_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    """Compute the materialized paths of existing categories, then roll product counts up the tree"""
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+
+    children = {}
+    for category_id, parent_id in Category.objects.values_list('id', 'parent_id'):
+        children.setdefault(parent_id, []).append(category_id)
+
+    paths = {}
+    pending = [(category_id, '/') for category_id in children.get(None, [])]
+    while pending:
+        category_id, parent_path = pending.pop()
+        paths[category_id] = f'{parent_path}{category_id}/'
+        pending.extend((child_id, paths[category_id]) for child_id in children.get(category_id, []))
+
+    for category_id, path in paths.items():
+        Category.objects.filter(id=category_id).update(path=path)
+    for category_id, path in paths.items():
+        count = Product.objects.filter(category__path__startswith=path).count()
+        Category.objects.filter(id=category_id).update(product_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_variant_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
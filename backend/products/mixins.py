@@ -1,4 +1,5 @@
-from rest_framework import serializers
+from rest_framework import permissions, serializers
+from backend.image_renditions import FORMATS, SIZES, rendition_url
 
 class ImageHandlingMixin:
     def handle_image_file(self, instance, validated_data, field_name="image", file_field_name="imageFile"):
@@ -12,13 +13,31 @@ class ImageHandlingMixin:
             else:
                 setattr(instance, field_name, image_file)
 
-    def get_image_url(self, obj, field_name="image"):
+    def get_image_url(self, obj, field_name="image", rendition=None, format="jpeg"):
+        """
+        URL of an image, or of one of its renditions (see backend.image_renditions)
+
+        Renditions fall back to the original until the worker has made them.
+        """
         request = self.context.get("request")
-        image = getattr(obj, field_name)
-        if image and hasattr(image, "url"):
-            return request.build_absolute_uri(image.url) if request else image.url
+        if rendition is None:
+            image = getattr(obj, field_name)
+            url = image.url if image and hasattr(image, "url") else None
+        else:
+            url = rendition_url(obj, field_name, rendition, format)
+        if url:
+            return request.build_absolute_uri(url) if request else url
         return None
 
+    def get_image_renditions(self, obj, field_name="image"):
+        """URLs of every rendition of an image by size and format, None until they are made"""
+        if not getattr(obj, field_name) or not getattr(obj, obj.rendition_fields[field_name]):
+            return None
+        return {
+            rendition: {format: self.get_image_url(obj, field_name, rendition, format) for format in FORMATS}
+            for rendition in SIZES
+        }
+
     def extract_image_file(self, validated_data, file_field_name="imageFile"):
         """Extract image file from validated_data to prevent model field errors"""
         return validated_data.pop(file_field_name, serializers.empty)
@@ -37,3 +56,67 @@ class ImageHandlingMixin:
                     getattr(instance, field_name).delete(save=False)
                 setattr(instance, field_name, None)
             instance.save()
+
+
+class FieldShapingMixin:
+    """
+    Let read requests choose what a serializer outputs
+
+    ?fields=name,variants.price keeps only the listed fields (and id, which
+    cached listings are tracked by), dotted for the fields of nested
+    serializers. ?expand=category,variants.color names
+    the expandable_fields rendered in full; the others are reduced to their
+    primary keys. Without the parameters the output is unchanged.
+
+    Fields are dropped before serializing, so the SerializerMethodFields of
+    unrequested fields never run. Only GET / HEAD / OPTIONS requests are
+    shaped, writes always see every field.
+    """
+
+    # Nested fields ?expand= can reduce to primary keys, with whether they hold many objects
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return fields
+
+        requested = _split_param(request.query_params.get('fields'))
+        expanded = _split_param(request.query_params.get('expand'))
+        if requested is None and expanded is None:
+            return fields
+
+        prefix = self._field_path()
+        if requested is not None:
+            names = {path[len(prefix):].split('.')[0] for path in requested if path.startswith(prefix)}
+            # Nested serializers without dotted fields keep all of theirs
+            if names or not prefix:
+                names.add('id')
+                for name in list(fields):
+                    if name not in names:
+                        del fields[name]
+
+        if expanded is not None:
+            for name, many in self.expandable_fields.items():
+                path = f'{prefix}{name}'
+                if name in fields and not any(each == path or each.startswith(f'{path}.') for each in expanded):
+                    fields[name] = serializers.PrimaryKeyRelatedField(source=name, many=many, read_only=True)
+        return fields
+
+    def _field_path(self) -> str:
+        """Dotted path of this serializer in the root one, '' for the root, e.g. 'variants.'"""
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return ''.join(f'{name}.' for name in reversed(names))
+
+
+def _split_param(value):
+    """Comma separated names of a query parameter, None when it is absent"""
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
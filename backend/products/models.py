@@ -1,8 +1,8 @@
 from django.db import models
 from django.core.exceptions import ValidationError
-from PIL import Image
-import os
-from django.db.models import Avg, Count
+from backend.image_renditions import RenditionsMixin
+from django.db.models import Avg, Count, Value
+from django.db.models.functions import Concat, Substr
 
 
 STORAGE_CHOICES = [
@@ -25,40 +25,77 @@ def upload_image_path(instance, filename):
         return f'products/{instance.category.slug}/{filename}'
     return f'uploads/unknown/{filename}'
 
-class Category(models.Model):
+class Category(RenditionsMixin, models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to=upload_image_path, blank=True, null=True)
+    # Digest of the image the renditions were made from, see backend.image_renditions
+    image_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
     is_active = models.BooleanField(default=True)
     sort_order = models.PositiveIntegerField(default=0)
     parent = models.ForeignKey(
         'self', null=True, blank=True, related_name='subcategories', on_delete=models.CASCADE
     )
     product_count = models.PositiveIntegerField(default=0)
+    # Materialized path of ids from the root, e.g. '/1/5/'; the subtree of a
+    # category is every category whose path starts with its own
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateField(auto_now=True)
 
     class Meta:
         ordering = ['sort_order', 'name']
 
+    rendition_fields = {'image': 'image_hash'}
+
     def __str__(self):
         return self.name
     
+    @property
+    def ancestor_ids(self):
+        """Ids of the categories above this one, root first"""
+        return [int(part) for part in self.path.strip('/').split('/')[:-1] if part]
+    
+    def descendants(self, include_self=True):
+        """Categories in the subtree of this one, at any depth"""
+        queryset = Category.objects.filter(path__startswith=self.path)
+        return queryset if include_self else queryset.exclude(pk=self.pk)
+    
     def save(self, *args, **kwargs):
+        parent_path = '/'
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or '/'
+            if self.pk and f'/{self.pk}/' in parent_path:
+                raise ValidationError("A category can't be moved under itself or one of its subcategories.")
+        
+        old_path = None
+        if self.pk:
+            old_path = Category.objects.filter(pk=self.pk).values_list('path', flat=True).first()
+            self.path = f'{parent_path}{self.pk}/'
+        
         super().save(*args, **kwargs)
+        
+        if old_path is None:
+            # The id is only known now
+            self.path = f'{parent_path}{self.pk}/'
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+        elif old_path and old_path != self.path:
+            # Moved, carry the subtree along; the signals recount the old ancestors
+            self._old_ancestor_ids = [int(part) for part in old_path.strip('/').split('/')[:-1] if part]
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr('path', len(old_path) + 1))
+            )
 
-        if self.image and os.path.exists(self.image.path):
-            img = Image.open(self.image.path)
-            img = img.convert("RGB")
-            img.thumbnail((200, 200))
-            img.save(self.image.path, format="JPEG", quality=90)
+        self.queue_changed_images(kwargs.get('update_fields'))
     
 
-class Product(models.Model):
+class Product(RenditionsMixin, models.Model):
     name = models.CharField(max_length=255)
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     image = models.ImageField(upload_to=upload_image_path, blank=True, null=True)
+    # Digest of the image the renditions were made from, see backend.image_renditions
+    image_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
     
     rating = models.FloatField(default=0.0)
     reviews = models.PositiveIntegerField(default=0)
@@ -68,12 +105,24 @@ class Product(models.Model):
     full_description = models.TextField(blank=True)
     features = models.JSONField(default=list)
     
+    # Summary of the variants, kept up to date by update_variant_summaries()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    total_stock = models.PositiveIntegerField(default=0, editable=False)
+    in_stock = models.BooleanField(default=False, editable=False)
+    available_colors = models.JSONField(default=list, editable=False)
+    available_storages = models.JSONField(default=list, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination sort key, see backend.pagination
+        indexes = [models.Index(fields=['created_at', 'id'], name='product_created_id_idx')]
+
+    rendition_fields = {'image': 'image_hash'}
 
     def __str__(self):
         return self.name
@@ -98,7 +147,7 @@ class Product(models.Model):
             self.rating = round(review_data['avg_rating'], 1) if review_data['avg_rating'] else 0.0
             self.reviews = review_data['review_count'] or 0
             
-            # Save without calling the full save method to avoid image processing
+            # Save without calling the full save method to avoid the save signals
             Product.objects.filter(id=self.id).update(
                 rating=self.rating,
                 reviews=self.reviews
@@ -108,14 +157,16 @@ class Product(models.Model):
             # If reviews app is not available, keep current values
             pass
     
+    def update_variant_summary(self):
+        """Recompute the price, stock, color and storage summary from the variants"""
+        summary = summarize_variants([self.id])[self.id]
+        for field, value in summary.items():
+            setattr(self, field, value)
+        Product.objects.filter(id=self.id).update(**summary)
+    
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-
-        if self.image and os.path.exists(self.image.path):
-            img = Image.open(self.image.path)
-            img = img.convert("RGB")
-            img.thumbnail((300, 300))
-            img.save(self.image.path, format="JPEG", quality=90)
+        self.queue_changed_images(kwargs.get('update_fields'))
             
 class ProductColor(models.Model):
     name = models.CharField(max_length=50)   
@@ -189,5 +240,83 @@ class ProductVariant(models.Model):
         Check if the requested quantity is available in stock.
         """
         return self.stock >= quantity
+
+
+def update_product_counts(category_ids):
+    """
+    Recount the products of categories and of every category above them
+    
+    product_count includes the products of subcategories at any depth.
+    Rows are updated without calling save() or its signals.
+    """
+    category_ids = {category_id for category_id in category_ids if category_id}
+    if not category_ids:
+        return
+    paths = Category.objects.filter(id__in=category_ids).values_list('path', flat=True)
+    affected = {int(part) for path in paths for part in path.strip('/').split('/') if part}
+    for category_id, path in Category.objects.filter(id__in=affected).values_list('id', 'path'):
+        count = Product.objects.filter(category__path__startswith=path).count()
+        Category.objects.filter(id=category_id).update(product_count=count)
+
+
+VARIANT_SUMMARY_FIELDS = ['min_price', 'max_price', 'total_stock', 'in_stock', 'available_colors', 'available_storages']
+
+_STORAGE_ORDER = {value: position for position, (value, label) in enumerate(STORAGE_CHOICES)}
+
+
+def summarize_variants(product_ids):
+    """
+    Compute the variant summary fields of products with one query
+    
+    Returns:
+        Dictionary mapping each product id to its VARIANT_SUMMARY_FIELDS values
+    """
+    summaries = {
+        product_id: {
+            'min_price': None,
+            'max_price': None,
+            'total_stock': 0,
+            'in_stock': False,
+            'available_colors': [],
+            'available_storages': [],
+        }
+        for product_id in product_ids
+    }
+    variants = (
+        ProductVariant.objects
+        .filter(product_id__in=summaries)
+        .order_by('color__name', 'color_id')
+        .values_list('product_id', 'price', 'stock', 'is_in_stock', 'storage', 'color_id', 'color__name', 'color__hex_code')
+    )
+    for product_id, price, stock, is_in_stock, storage, color_id, color_name, hex_code in variants:
+        summary = summaries[product_id]
+        if summary['min_price'] is None or price < summary['min_price']:
+            summary['min_price'] = price
+        if summary['max_price'] is None or price > summary['max_price']:
+            summary['max_price'] = price
+        summary['total_stock'] += stock
+        summary['in_stock'] = summary['in_stock'] or is_in_stock
+        color = {'id': color_id, 'name': color_name, 'hex_code': hex_code}
+        if color not in summary['available_colors']:
+            summary['available_colors'].append(color)
+        if storage and storage not in summary['available_storages']:
+            summary['available_storages'].append(storage)
+    
+    for summary in summaries.values():
+        summary['available_storages'].sort(key=lambda value: (_STORAGE_ORDER.get(value, len(_STORAGE_ORDER)), value))
+    return summaries
+
+
+def update_variant_summaries(product_ids):
+    """Store the variant summary of products, without calling save() or its signals"""
+    product_ids = {product_id for product_id in product_ids if product_id}
+    if not product_ids:
+        return
+    summaries = summarize_variants(product_ids)
+    Product.objects.bulk_update(
+        [Product(id=product_id, **summary) for product_id, summary in summaries.items()],
+        VARIANT_SUMMARY_FIELDS,
+        batch_size=500,
+    )
     
     
\ No newline at end of file
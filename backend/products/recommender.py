@@ -0,0 +1,241 @@
+"""
+"Frequently bought together" recommendations from order history
+
+The build_recommendations command counts, for every pair of products, the
+orders containing both (a sparse co-occurrence matrix, one row per product)
+and keeps each product's most similar ones:
+
+    similarity(a, b) = orders(a and b) / sqrt(orders(a) * orders(b))
+
+(the cosine of their order columns). Everything lives in Redis under
+'{KEY_PREFIX}:recs:':
+
+- counts:{id}: hash of co-ordered product id -> number of orders, a matrix row
+- orders: hash of product id -> number of orders containing it
+- processed: sorted set of the order ids counted, scored by order date
+- top:{id}: comma separated ids of the NEIGHBOURS most similar products
+
+An incremental run only counts the orders of the last LOOKBACK seconds that
+aren't in processed yet (so orders paid late are still picked up) and
+recomputes the rows they touch. Similarities of untouched rows drift a little
+until the next full run, which should be scheduled daily or so.
+
+ProductViewSet.recommendations reads top:{id} with one GET and falls back to
+the category of products without neighbours yet.
+"""
+
+from collections import Counter, defaultdict
+from itertools import combinations
+import heapq
+import logging
+import math
+import time
+from typing import Dict, Iterable, List, Tuple
+from django.conf import settings
+from backend.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+# Orders whose items were bought
+COUNTED_STATUSES = ['processing', 'shipped', 'completed']
+
+_recommendation_settings = getattr(settings, 'PRODUCT_RECOMMENDATIONS', {})
+NEIGHBOURS = _recommendation_settings.get('NEIGHBOURS', 20)
+MIN_CO_ORDERS = _recommendation_settings.get('MIN_CO_ORDERS', 1)
+MAX_ORDER_PRODUCTS = _recommendation_settings.get('MAX_ORDER_PRODUCTS', 50)
+LOOKBACK = _recommendation_settings.get('LOOKBACK', 7 * 24 * 3600)
+
+# Rows written per pipeline
+WRITE_BATCH = 500
+
+
+def _key(name: str) -> str:
+    return f"{settings.CACHES['default']['KEY_PREFIX']}:recs:{name}"
+
+
+def similar_products(counts: Dict[int, int], order_counts: Dict[int, int], product_order_count: int,
+                     limit: int = NEIGHBOURS) -> List[int]:
+    """
+    Most similar products of one matrix row
+
+    Args:
+        counts: Co-ordered product id -> orders containing both
+        order_counts: Product id -> orders containing it
+        product_order_count: Orders containing the row's product
+    """
+    scored = (
+        (count / math.sqrt(product_order_count * order_counts[other]), other)
+        for other, count in counts.items()
+        if count >= MIN_CO_ORDERS and order_counts.get(other)
+    )
+    return [other for score, other in heapq.nlargest(limit, scored)]
+
+
+def order_baskets(orders) -> Dict[str, set]:
+    """Distinct products of each order in a queryset of orders"""
+    from orders.models import OrderItem
+
+    baskets = defaultdict(set)
+    items = (
+        OrderItem.objects
+        .filter(order__in=orders)
+        .values_list('order_id', 'product_variant__product_id')
+        .iterator(chunk_size=5000)
+    )
+    for order_id, product_id in items:
+        baskets[order_id].add(product_id)
+    return baskets
+
+
+def count_baskets(baskets: Iterable[set]):
+    """Co-occurrence rows and order counts of baskets"""
+    rows = defaultdict(Counter)
+    order_counts = Counter()
+    for products in baskets:
+        if len(products) > MAX_ORDER_PRODUCTS:
+            # Bulk orders say little about what goes together
+            continue
+        order_counts.update(products)
+        for first, second in combinations(products, 2):
+            rows[first][second] += 1
+            rows[second][first] += 1
+    return rows, order_counts
+
+
+class Recommender:
+    """Builds the neighbour lists and reads them"""
+
+    def neighbours(self, product_id: int) -> List[int]:
+        """Ids of the products most often bought with a product, [] if unknown or Redis fails"""
+        try:
+            with redis_client.breaker.guard():
+                value = redis_client.client.get(_key(f'top:{product_id}'))
+        except Exception as e:
+            logger.warning(f"Redis RECOMMENDATIONS error: {e}")
+            return []
+        if not value:
+            return []
+        return [int(other) for other in value.split(',') if other]
+
+    def rebuild(self) -> Tuple[int, List[int]]:
+        """
+        Recount every counted order and replace the stored matrix
+
+        Returns:
+            Number of orders counted and ids of the products whose neighbours were rewritten
+        """
+        from orders.models import Order
+
+        started = time.time()
+        orders = Order.objects.filter(status__in=COUNTED_STATUSES)
+        baskets = order_baskets(orders)
+        rows, order_counts = count_baskets(baskets.values())
+
+        client = redis_client.client
+        stale = set(int(product_id) for product_id in client.hkeys(_key('orders')))
+        self._clear(client, stale - set(order_counts))
+
+        pipe = client.pipeline(transaction=False)
+        pipe.delete(_key('orders'), _key('processed'))
+        if order_counts:
+            pipe.hset(_key('orders'), mapping=dict(order_counts))
+        recent = started - LOOKBACK
+        processed = {
+            str(order_id): date.timestamp()
+            for order_id, date in orders.filter(date__gte=_datetime(recent)).values_list('id', 'date')
+        }
+        if processed:
+            pipe.zadd(_key('processed'), processed)
+        pipe.execute()
+
+        self._write_rows(client, rows, order_counts, replace=True)
+        return len(baskets), sorted(stale | set(order_counts))
+
+    def refresh(self) -> Tuple[int, List[int]]:
+        """
+        Count the recent orders not counted yet and update the rows they touch
+
+        Returns:
+            Number of orders counted and ids of the products whose neighbours were rewritten
+        """
+        from orders.models import Order
+
+        now = time.time()
+        client = redis_client.client
+        # Members come back as strings, compare order ids the same way
+        counted = set(client.zrangebyscore(_key('processed'), now - LOOKBACK, '+inf'))
+
+        orders = Order.objects.filter(status__in=COUNTED_STATUSES, date__gte=_datetime(now - LOOKBACK))
+        new = {
+            str(order_id): date.timestamp()
+            for order_id, date in orders.values_list('id', 'date')
+            if str(order_id) not in counted
+        }
+        if not new:
+            return 0, []
+
+        baskets = order_baskets(Order.objects.filter(id__in=list(new)))
+        rows, order_counts = count_baskets(baskets.values())
+
+        pipe = client.pipeline(transaction=False)
+        for product_id, count in order_counts.items():
+            pipe.hincrby(_key('orders'), product_id, count)
+        for product_id, row in rows.items():
+            for other, count in row.items():
+                pipe.hincrby(_key(f'counts:{product_id}'), other, count)
+        pipe.zadd(_key('processed'), new)
+        pipe.zremrangebyscore(_key('processed'), '-inf', now - LOOKBACK)
+        pipe.execute()
+
+        # Recompute the touched rows from their stored counts
+        touched = list(order_counts)
+        stored_rows = {}
+        for start in range(0, len(touched), WRITE_BATCH):
+            batch = touched[start:start + WRITE_BATCH]
+            pipe = client.pipeline(transaction=False)
+            for product_id in batch:
+                pipe.hgetall(_key(f'counts:{product_id}'))
+            for product_id, row in zip(batch, pipe.execute()):
+                stored_rows[product_id] = {int(other): int(count) for other, count in row.items()}
+        others = sorted({other for row in stored_rows.values() for other in row} | set(touched))
+        stored_counts = {
+            product_id: int(count)
+            for product_id, count in zip(others, client.hmget(_key('orders'), others))
+            if count is not None
+        }
+        self._write_rows(client, stored_rows, stored_counts, replace=False)
+        return len(new), touched
+
+    def _write_rows(self, client, rows, order_counts, replace: bool):
+        """Store matrix rows (unless only top lists change) and their top neighbours"""
+        product_ids = list(rows)
+        for start in range(0, len(product_ids), WRITE_BATCH):
+            pipe = client.pipeline(transaction=False)
+            for product_id in product_ids[start:start + WRITE_BATCH]:
+                row = rows[product_id]
+                if replace:
+                    pipe.delete(_key(f'counts:{product_id}'))
+                    if row:
+                        pipe.hset(_key(f'counts:{product_id}'), mapping=dict(row))
+                top = similar_products(row, order_counts, order_counts.get(product_id, 0) or 1)
+                if top:
+                    pipe.set(_key(f'top:{product_id}'), ','.join(str(other) for other in top))
+                else:
+                    pipe.delete(_key(f'top:{product_id}'))
+            pipe.execute()
+
+    def _clear(self, client, product_ids):
+        """Drop the rows of products no longer in any counted order"""
+        product_ids = list(product_ids)
+        for start in range(0, len(product_ids), WRITE_BATCH):
+            batch = product_ids[start:start + WRITE_BATCH]
+            client.delete(*[_key(f'{kind}:{product_id}') for product_id in batch for kind in ('counts', 'top')])
+
+
+def _datetime(timestamp: float):
+    from datetime import datetime, timezone
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+recommender = Recommender()
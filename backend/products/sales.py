@@ -0,0 +1,167 @@
+"""
+Units sold per product over rolling windows, for the top sellers
+
+Every paid order adds its units to the sorted set of the hour it was placed
+in ('{KEY_PREFIX}:sales:h:{hour}', product id -> units); a cancellation or
+refund takes them back out. Buckets expire on their own once they fall out
+of the longest window. The top sellers of a window are the union of its
+hourly buckets (ZUNIONSTORE), kept for UNION_TIMEOUT seconds, so windows are
+rolling to the hour.
+
+The order signals keep the buckets current; rebuild_sales_leaderboard
+recomputes them from the orders.
+"""
+
+from collections import Counter, defaultdict
+import logging
+import time
+from typing import Dict, List, Tuple
+from django.conf import settings
+from backend.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 3600
+
+# Window name -> length in hours
+WINDOWS = {
+    '1h': 1,
+    '24h': 24,
+    '7d': 7 * 24,
+    '30d': 30 * 24,
+}
+DEFAULT_WINDOW = '7d'
+
+# Buckets are kept for the longest window after they end
+RETENTION = max(WINDOWS.values()) * BUCKET_SECONDS
+
+# How long the union of a window's buckets is reused
+UNION_TIMEOUT = 60
+
+# Statuses whose paid units are taken back out
+UNSOLD_STATUSES = ('cancelled', 'refunded')
+
+
+def _key(name: str) -> str:
+    return f"{settings.CACHES['default']['KEY_PREFIX']}:sales:{name}"
+
+
+def _bucket(timestamp: float) -> int:
+    return int(timestamp // BUCKET_SECONDS)
+
+
+def counts_as_sale(status: str, is_paid: bool) -> bool:
+    """Whether an order in this state adds its units to the leaderboard"""
+    return is_paid and status not in UNSOLD_STATUSES
+
+
+def _add_buckets(pipe, buckets: Dict[int, Counter]):
+    for hour, units in buckets.items():
+        for product_id, quantity in units.items():
+            pipe.zincrby(_key(f'h:{hour}'), quantity, product_id)
+        pipe.expireat(_key(f'h:{hour}'), (hour + 1) * BUCKET_SECONDS + RETENTION)
+
+
+def record_order(order, sign: int = 1):
+    """
+    Add (sign=1) or take back (sign=-1) the units of an order
+
+    Units go to the bucket of the order date, as rebuild() does, and are
+    dropped if that bucket has already expired.
+    """
+    from orders.models import OrderItem
+
+    hour = _bucket(order.date.timestamp())
+    if (hour + 1) * BUCKET_SECONDS + RETENTION <= time.time():
+        return
+    units = Counter()
+    items = OrderItem.objects.filter(order=order).values_list('product_variant__product_id', 'quantity')
+    for product_id, quantity in items:
+        units[product_id] += sign * quantity
+    if not units:
+        return
+    try:
+        with redis_client.breaker.guard():
+            pipe = redis_client.client.pipeline(transaction=False)
+            _add_buckets(pipe, {hour: units})
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Redis SALES error: {e}")
+
+
+def top_sellers(window: str = DEFAULT_WINDOW, limit: int = 10) -> List[Tuple[int, int]]:
+    """
+    Best selling products of a window
+
+    Returns:
+        (product id, units sold) pairs, best first; [] if Redis fails
+    """
+    now = time.time()
+    current = _bucket(now)
+    union_key = _key(f'top:{window}:{current}')
+    try:
+        with redis_client.breaker.guard():
+            client = redis_client.client
+            if not client.exists(union_key):
+                first = _bucket(now - WINDOWS[window] * BUCKET_SECONDS)
+                pipe = client.pipeline(transaction=False)
+                pipe.zunionstore(union_key, [_key(f'h:{hour}') for hour in range(first, current + 1)])
+                pipe.expire(union_key, UNION_TIMEOUT)
+                pipe.execute()
+            ranked = client.zrevrangebyscore(union_key, '+inf', '(0', start=0, num=limit, withscores=True)
+    except Exception as e:
+        logger.warning(f"Redis SALES error: {e}")
+        return []
+    return [(int(product_id), int(units)) for product_id, units in ranked]
+
+
+def top_selling_products(window: str = DEFAULT_WINDOW, limit: int = 10) -> list:
+    """Best selling products of a window, best first, or the newest ones while nothing sold"""
+    from .models import Product
+
+    product_ids = [product_id for product_id, units in top_sellers(window, limit)]
+    if not product_ids:
+        return list(Product.objects.select_related('category').order_by('-created_at')[:limit])
+    products = Product.objects.filter(id__in=product_ids).select_related('category').in_bulk()
+    return [products[product_id] for product_id in product_ids if product_id in products]
+
+
+def rebuild() -> int:
+    """
+    Recompute the buckets of the last RETENTION seconds from the orders
+
+    Returns:
+        Number of orders counted
+    """
+    from orders.models import OrderItem
+
+    now = time.time()
+    first, current = _bucket(now - RETENTION), _bucket(now)
+    since = first * BUCKET_SECONDS
+
+    buckets = defaultdict(Counter)
+    orders = set()
+    items = (
+        OrderItem.objects
+        .filter(order__is_paid=True, order__date__gte=_datetime(since))
+        .exclude(order__status__in=UNSOLD_STATUSES)
+        .values_list('order_id', 'order__date', 'product_variant__product_id', 'quantity')
+        .iterator(chunk_size=5000)
+    )
+    for order_id, date, product_id, quantity in items:
+        buckets[_bucket(date.timestamp())][product_id] += quantity
+        orders.add(order_id)
+
+    client = redis_client.client
+    pipe = client.pipeline(transaction=False)
+    pipe.delete(*[_key(f'h:{hour}') for hour in range(first, current + 1)])
+    _add_buckets(pipe, buckets)
+    pipe.delete(*[_key(f'top:{window}:{current}') for window in WINDOWS])
+    pipe.execute()
+    return len(orders)
+
+
+def _datetime(timestamp: float):
+    from datetime import datetime, timezone
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
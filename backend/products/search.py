@@ -0,0 +1,272 @@
+"""
+Product search index
+
+Products are indexed in a SQLite FTS5 table stored next to the project (a
+sidecar file, no search service to run). Every gunicorn/uvicorn worker opens
+it read-mostly; the product signals write changed products to it once their
+transaction commits, and rebuild_search_index (re)builds it from the database.
+
+Queries match every word of the search as a prefix ("iph 15" finds "iPhone 15
+Pro") in name, description, full_description and features, ranked by BM25
+with the name weighted highest. Until the index has been built, search()
+returns None and ProductViewSet falls back to the name-only queryset search.
+"""
+
+from contextlib import contextmanager
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+from django.conf import settings
+from django.db.models import IntegerField, Value
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# Indexed columns with their BM25 weights, in table order
+COLUMNS = ['name', 'description', 'full_description', 'features']
+WEIGHTS = [10.0, 3.0, 1.0, 2.0]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_INSERT = f"INSERT INTO product_search (rowid, {', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?)"
+
+_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+        {', '.join(COLUMNS)},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )""",
+    'CREATE TABLE IF NOT EXISTS search_meta (key TEXT PRIMARY KEY, value TEXT)',
+]
+
+
+def features_text(features) -> str:
+    """Flatten the features JSON (a list of strings, or a dict) into indexable text"""
+    if not features:
+        return ''
+    if isinstance(features, dict):
+        features = [f'{key} {value}' for key, value in features.items()]
+    elif not isinstance(features, (list, tuple)):
+        features = [features]
+    return ' '.join(str(feature) for feature in features)
+
+
+def _row(document: dict) -> tuple:
+    """Index row of a product dict with an id and the indexed fields"""
+    return (
+        document['id'],
+        document.get('name') or '',
+        document.get('description') or '',
+        document.get('full_description') or '',
+        features_text(document.get('features')),
+    )
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Build an FTS5 MATCH expression requiring every word of query as a prefix
+
+    Returns:
+        The expression, or None if query has no words
+    """
+    tokens = _TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    # Quoted, so words like AND/NOT and FTS5 syntax are matched literally
+    return ' '.join(f'"{token}"*' for token in tokens[:16])
+
+
+def legacy_search(queryset, search: str):
+    """Name-only search used before the index: names starting with search first, then containing it"""
+    # Products that start with the search term (highest priority)
+    starts_with_qs = queryset.filter(name__istartswith=search)
+
+    # Products that contain but don't start with the search term (lower priority)
+    contains_qs = queryset.filter(
+        name__icontains=search
+    ).exclude(name__istartswith=search)
+
+    # Combine querysets with proper ordering
+    starts_with_annotated = starts_with_qs.annotate(
+        search_rank=Value(1, output_field=IntegerField())
+    )
+    contains_annotated = contains_qs.annotate(
+        search_rank=Value(2, output_field=IntegerField())
+    )
+
+    return starts_with_annotated.union(contains_annotated).order_by('search_rank', 'name')
+
+
+class ProductSearchIndex:
+    """BM25 ranked full text index of products in a SQLite FTS5 file"""
+
+    def __init__(self, path: str, max_results: int = 1000):
+        """
+        Initialize the index
+
+        Args:
+            path: SQLite file holding the index, created on first use
+            max_results: Most product ids returned by search()
+        """
+        self.path = str(path)
+        self.max_results = max_results
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread (and process), opened on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Readers don't block the writer, and the other way around
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def is_built(self) -> bool:
+        """Check whether rebuild() has filled the index"""
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM search_meta WHERE key = 'built_at'"
+            ).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.warning(f"Search index error: {e}")
+            return False
+
+    def search(self, query: str, limit: Optional[int] = None) -> Optional[List[int]]:
+        """
+        Find products matching query
+
+        Args:
+            query: Search text as typed by the user
+            limit: Most ids to return (default: max_results)
+
+        Returns:
+            Product ids, best match first, or None if the index can't answer
+            (not built yet, unreadable, or a query without words)
+        """
+        expression = match_expression(query)
+        if expression is None or not self.is_built():
+            return None
+        try:
+            rows = self._connection().execute(
+                f"SELECT rowid FROM product_search WHERE product_search MATCH ? "
+                f"ORDER BY bm25(product_search, {', '.join(map(str, WEIGHTS))}) LIMIT ?",
+                (expression, limit or self.max_results),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Search index error: {e}")
+            return None
+        return [row[0] for row in rows]
+
+    def index_documents(self, documents: Iterable[dict]) -> int:
+        """
+        Add or replace documents (dicts with an id and the indexed fields)
+
+        Returns:
+            Number of documents written
+        """
+        rows = [_row(document) for document in documents]
+        if not rows:
+            return 0
+        connection = self._connection()
+        with _transaction(connection):
+            connection.executemany('DELETE FROM product_search WHERE rowid = ?', [(row[0],) for row in rows])
+            connection.executemany(_INSERT, rows)
+        return len(rows)
+
+    def remove(self, product_ids: Iterable[int]):
+        """Drop products from the index"""
+        connection = self._connection()
+        with _transaction(connection):
+            connection.executemany(
+                'DELETE FROM product_search WHERE rowid = ?', [(product_id,) for product_id in product_ids]
+            )
+
+    def update(self, product_ids: Iterable[int]):
+        """Re-index products from the database, dropping the ones that no longer exist"""
+        product_ids = set(product_ids)
+        try:
+            documents = list(Product.objects.filter(id__in=product_ids).values('id', *COLUMNS))
+            self.index_documents(documents)
+            self.remove(product_ids - {document['id'] for document in documents})
+        except sqlite3.Error as e:
+            logger.warning(f"Search index error: {e}")
+
+    def rebuild(self, documents: Optional[Iterable[dict]] = None, batch_size: int = 2000) -> int:
+        """
+        Re-index every product in one transaction, searches keep using the old
+        index until it commits
+
+        Args:
+            documents: Dicts with an id and the indexed fields (default: every
+                product in the database)
+            batch_size: Documents inserted (and products read) at a time
+
+        Returns:
+            Number of products indexed
+        """
+        if documents is None:
+            documents = Product.objects.order_by('id').values('id', *COLUMNS).iterator(chunk_size=batch_size)
+        connection = self._connection()
+        count = 0
+        with _transaction(connection):
+            connection.execute('DELETE FROM product_search')
+            for batch in _batches(documents, batch_size):
+                connection.executemany(_INSERT, [_row(document) for document in batch])
+                count += len(batch)
+            connection.execute(
+                "INSERT OR REPLACE INTO search_meta (key, value) VALUES ('built_at', ?)", (str(time.time()),)
+            )
+        connection.execute("INSERT INTO product_search (product_search) VALUES ('optimize')")
+        return count
+
+    def stats(self) -> dict:
+        """Get index size for monitoring"""
+        connection = self._connection()
+        built_at = connection.execute("SELECT value FROM search_meta WHERE key = 'built_at'").fetchone()
+        return {
+            'path': self.path,
+            'documents': connection.execute('SELECT count(*) FROM product_search').fetchone()[0],
+            'built_at': float(built_at[0]) if built_at else None,
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection):
+    """Write transaction on an autocommit connection, taking the write lock up front"""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_search_settings = getattr(settings, 'PRODUCT_SEARCH', {})
+search_index = ProductSearchIndex(
+    _search_settings.get('INDEX_PATH', os.path.join(settings.BASE_DIR, 'search_index.sqlite3')),
+    max_results=_search_settings.get('MAX_RESULTS', 1000),
+)
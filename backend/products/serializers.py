@@ -1,25 +1,26 @@
 from rest_framework import serializers
 from .models import Category, Product, ProductColor, ProductVariant
-from .mixins import ImageHandlingMixin
+from .mixins import FieldShapingMixin, ImageHandlingMixin
 
 class CategorySerializer(serializers.ModelSerializer, ImageHandlingMixin):
     product_count = serializers.IntegerField(read_only=True)
     parent_id = serializers.IntegerField(write_only=True, allow_null=True, required=False)
     image = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
     imageFile = serializers.ImageField(write_only=True, required=False, allow_null=True)
 
     class Meta:
         model = Category
-        fields = '__all__'
+        exclude = ['image_hash']
 
     def get_image(self, obj):
-        return self.get_image_url(obj)
+        return self.get_image_url(obj, rendition='thumbnail')
 
     def to_representation(self, instance):
         # Get the standard representation
         representation = super().to_representation(instance)
         # Add parent_id to the representation
-        representation['parent_id'] = instance.parent.id if instance.parent else None
+        representation['parent_id'] = instance.parent_id
         return representation
 
     def create(self, validated_data):
@@ -55,6 +56,8 @@ class CategorySerializer(serializers.ModelSerializer, ImageHandlingMixin):
                 validated_data['parent'] = parent
             except Category.DoesNotExist:
                 raise serializers.ValidationError({'parent_id': 'Invalid parent category ID.'})
+            if instance.path and parent.path.startswith(instance.path):
+                raise serializers.ValidationError({'parent_id': "A category can't be moved under itself or one of its subcategories."})
         
         # Update instance without imageFile
         instance = super().update(instance, validated_data)
@@ -71,7 +74,7 @@ class ProductColorSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ProductVariantSerializer(serializers.ModelSerializer):
+class ProductVariantSerializer(FieldShapingMixin, serializers.ModelSerializer, ImageHandlingMixin):
     color = ProductColorSerializer(read_only=True)
     color_id = serializers.PrimaryKeyRelatedField(
         queryset=ProductColor.objects.all(), 
@@ -88,6 +91,8 @@ class ProductVariantSerializer(serializers.ModelSerializer):
     total_stock = serializers.SerializerMethodField()
     product = serializers.SerializerMethodField()
     
+    expandable_fields = {'color': False, 'product': False}
+    
     class Meta:
         model = ProductVariant
         fields = [
@@ -108,21 +113,11 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return obj.stock
     
     def get_product(self, obj):
-        from .mixins import ImageHandlingMixin
-        
         # Create a simple product representation with image URL
-        request = self.context.get('request')
-        image_url = None
-        if obj.product.image:
-            if request:
-                image_url = request.build_absolute_uri(obj.product.image.url)
-            else:
-                image_url = obj.product.image.url
-        
         return {
             'id': obj.product.id,
             'name': obj.product.name,
-            'image': image_url,
+            'image': self.get_image_url(obj.product, rendition='thumbnail'),
             'description': obj.product.description,
         }
 
@@ -139,10 +134,11 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return data
 
 
-class ProductSerializer(serializers.ModelSerializer, ImageHandlingMixin):
+class ProductSerializer(FieldShapingMixin, serializers.ModelSerializer, ImageHandlingMixin):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category', write_only=True)
     image = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
     imageFile = serializers.ImageField(write_only=True, required=False, allow_null=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
     min_price = serializers.SerializerMethodField()
@@ -151,38 +147,34 @@ class ProductSerializer(serializers.ModelSerializer, ImageHandlingMixin):
     available_colors = serializers.SerializerMethodField()
     available_storages = serializers.SerializerMethodField()
 
+    expandable_fields = {'category': False, 'variants': True}
+
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['image_hash']
 
     def get_image(self, obj):
-        return self.get_image_url(obj)
+        return self.get_image_url(obj, rendition='card')
     
     def get_min_price(self, obj):
-        """Get minimum price from all variants"""
-        if obj.variants.exists():
-            return obj.variants.order_by('price').first().price
-        return None
+        """Get minimum price from all variants (stored on the product)"""
+        return obj.min_price
     
     def get_max_price(self, obj):
-        """Get maximum price from all variants"""
-        if obj.variants.exists():
-            return obj.variants.order_by('-price').first().price
-        return None
+        """Get maximum price from all variants (stored on the product)"""
+        return obj.max_price
     
     def get_total_stock(self, obj):
-        """Get total stock from all variants"""
-        return sum(variant.stock for variant in obj.variants.all())
+        """Get total stock from all variants (stored on the product)"""
+        return obj.total_stock
     
     def get_available_colors(self, obj):
-        """Get all available colors for this product"""
-        colors = obj.variants.select_related('color').values_list('color__id', 'color__name', 'color__hex_code').distinct()
-        return [{'id': color[0], 'name': color[1], 'hex_code': color[2]} for color in colors]
+        """Get all available colors for this product (stored on the product)"""
+        return obj.available_colors
     
     def get_available_storages(self, obj):
-        """Get all available storage options for this product"""
-        storages = obj.variants.values_list('storage', flat=True).distinct()
-        return [storage for storage in storages if storage]
+        """Get all available storage options for this product (stored on the product)"""
+        return obj.available_storages
 
     def create(self, validated_data):
         # Extract image file first to avoid model field errors
@@ -212,32 +204,32 @@ class ProductSerializer(serializers.ModelSerializer, ImageHandlingMixin):
 class ProductRecommendationSerializer(serializers.ModelSerializer, ImageHandlingMixin):
     category = CategorySerializer(read_only=True)
     image = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
     min_price = serializers.SerializerMethodField()
     max_price = serializers.SerializerMethodField()
     total_stock = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'min_price', 'max_price', 'image', 'category', 'total_stock', 'rating', 'reviews']
+        fields = [
+            'id', 'name', 'min_price', 'max_price', 'image', 'image_renditions', 'category', 'total_stock',
+            'rating', 'reviews'
+        ]
 
     def get_image(self, obj):
-        return self.get_image_url(obj) if obj.image else None
+        return self.get_image_url(obj, rendition='card') if obj.image else None
     
     def get_min_price(self, obj):
-        """Get minimum price from all variants"""
-        if obj.variants.exists():
-            return obj.variants.order_by('price').first().price
-        return None
+        """Get minimum price from all variants (stored on the product)"""
+        return obj.min_price
     
     def get_max_price(self, obj):
-        """Get maximum price from all variants"""
-        if obj.variants.exists():
-            return obj.variants.order_by('-price').first().price
-        return None
+        """Get maximum price from all variants (stored on the product)"""
+        return obj.max_price
     
     def get_total_stock(self, obj):
-        """Get total stock from all variants"""
-        return sum(variant.stock for variant in obj.variants.all())
+        """Get total stock from all variants (stored on the product)"""
+        return obj.total_stock
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
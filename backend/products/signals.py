@@ -1,44 +1,38 @@
 from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Product, Category, ProductVariant
-from backend.redis_client import redis_client
+from .models import Product, Category, ProductColor, ProductVariant, update_product_counts, update_variant_summaries
+from .cache import invalidate_product_cache, invalidate_category_cache, SCOPE_ALL, SCOPE_CONTENT, SCOPE_STOCK
+from .search import COLUMNS as SEARCH_FIELDS, search_index
+from .autocomplete import autocomplete
+from .facets import facet_index
+from .synced_index import PRODUCT, CATEGORY, COLOR
 
 
-def invalidate_product_cache(product_id=None):
-    """Invalidate all product-related caches"""
-    patterns = [
-        'products:list:*',
-        'products:filters:*',
-        'products:top_sellers',
-        'products:new_arrivals',
-        'products:personalized:*',
-    ]
-    
-    if product_id:
-        patterns.extend([
-            f'product:{product_id}',
-            f'product:{product_id}:variants',
-            f'product:{product_id}:recommendations',
-        ])
-    
-    for pattern in patterns:
-        redis_client.clear_pattern(pattern)
-
-
-def invalidate_category_cache():
-    """Invalidate category-related caches"""
-    redis_client.clear_pattern('categories:*')
-    redis_client.clear_pattern('category:*')
-    redis_client.clear_pattern('products:list:*')
-    redis_client.clear_pattern('products:filters:*')
+# Fields whose changes can move a product in or out of cached listings, or reorder them
+PRODUCT_LISTING_FIELDS = ['name', 'category_id', 'rating']
+VARIANT_LISTING_FIELDS = ['product_id', 'price', 'color_id', 'storage', 'is_in_stock']
 
 
 # Track old category before product update
 @receiver(pre_save, sender=Product)
 def store_old_category(sender, instance, **kwargs):
+    instance._cache_scope = SCOPE_ALL
+    instance._search_changed = True
+    instance._name_changed = True
     if instance.pk:
         try:
-            instance._old_category = Product.objects.get(pk=instance.pk).category
+            old = Product.objects.select_related('category').get(pk=instance.pk)
+            instance._old_category = old.category
+            if all(getattr(old, field) == getattr(instance, field) for field in PRODUCT_LISTING_FIELDS):
+                instance._cache_scope = SCOPE_CONTENT
+            instance._search_changed = any(
+                getattr(old, field) != getattr(instance, field) for field in SEARCH_FIELDS
+            )
+            # Text changes can move it in or out of cached search results
+            if instance._search_changed:
+                instance._cache_scope = SCOPE_ALL
+            instance._name_changed = old.name != instance.name
         except Product.DoesNotExist:
             instance._old_category = None
     else:
@@ -47,86 +41,123 @@ def store_old_category(sender, instance, **kwargs):
 # When creating or updating a product
 @receiver(post_save, sender=Product)
 def update_product_count_on_save(sender, instance, created, **kwargs):
-    if created:
-        # New product created
-        if instance.category:
-            instance.category.product_count = instance.category.products.count()
-            instance.category.save()
-    else:
-        # Product updated, check if category changed
-        old = instance._old_category
-        new = instance.category
-        if old != new:
-            if old:
-                old.product_count = old.products.count()
-                old.save()
-            if new:
-                new.product_count = new.products.count()
-                new.save()
+    # Recount the category and the ones above it when the product is new or moved
+    old = getattr(instance, '_old_category', None)
+    if created or old != instance.category:
+        update_product_counts([instance.category_id, old.id if old else None])
+        invalidate_category_cache()
     
-    # Invalidate product cache
-    invalidate_product_cache(instance.id)
+    # Invalidate product cache, only the listings containing it if it can't move
+    scope = SCOPE_ALL if created else getattr(instance, '_cache_scope', SCOPE_ALL)
+    invalidate_product_cache(instance.id, scope)
+    
+    # Re-index its text once the change is committed
+    if created or getattr(instance, '_search_changed', True):
+        product_id = instance.id
+        transaction.on_commit(lambda: search_index.update([product_id]))
+    
+    # Suggest the new name in the search box
+    if created or getattr(instance, '_name_changed', True):
+        autocomplete.record_change(PRODUCT, instance.id)
+    
+    # Move it to its category in the filter facets
+    if created or getattr(instance, '_old_category', None) != instance.category:
+        facet_index.record_change(PRODUCT, instance.id)
 
 # When deleting a product
 @receiver(post_delete, sender=Product)
 def update_product_count_on_delete(sender, instance, **kwargs):
-    if instance.category:
-        instance.category.product_count = instance.category.products.count()
-        instance.category.save()
+    update_product_counts([instance.category_id])
+    invalidate_category_cache()
     
     # Invalidate product cache
     invalidate_product_cache(instance.id)
+    
+    # Drop it from the search index once the delete is committed
+    product_id = instance.id
+    transaction.on_commit(lambda: search_index.update([product_id]))
+    autocomplete.record_change(PRODUCT, product_id)
+    facet_index.record_change(PRODUCT, product_id)
 
 # When creating or updating a category
 @receiver(post_save, sender=Category)
 def invalidate_cache_on_category_save(sender, instance, created, **kwargs):
     """Invalidate cache when category is created or updated"""
+    # A moved category takes its products from the old ancestors to the new ones
+    old_ancestor_ids = getattr(instance, '_old_ancestor_ids', None)
+    if old_ancestor_ids:
+        update_product_counts([instance.id, *old_ancestor_ids])
+        del instance._old_ancestor_ids
     invalidate_category_cache()
+    autocomplete.record_change(CATEGORY, instance.id)
+    facet_index.record_change(CATEGORY, instance.id)
 
 # When deleting a category
 @receiver(post_delete, sender=Category)
 def invalidate_cache_on_category_delete(sender, instance, **kwargs):
     """Invalidate cache when category is deleted"""
     invalidate_category_cache()
+    autocomplete.record_change(CATEGORY, instance.id)
+    facet_index.record_change(CATEGORY, instance.id)
+
+# When creating, updating or deleting a color
+@receiver(post_save, sender=ProductColor)
+@receiver(post_delete, sender=ProductColor)
+def update_color_facets(sender, instance, **kwargs):
+    """Show the current color names in the filter options and product summaries"""
+    facet_index.record_change(COLOR, instance.id)
+    if kwargs.get('created') is False:
+        update_variant_summaries(
+            ProductVariant.objects.filter(color_id=instance.id).values_list('product_id', flat=True).distinct()
+        )
+
+# Track what a variant update changes before saving it
+@receiver(pre_save, sender=ProductVariant)
+def store_variant_cache_scope(sender, instance, **kwargs):
+    """Stock or sold changes that keep is_in_stock don't affect which products are listed"""
+    old = None
+    if instance.pk:
+        old = ProductVariant.objects.filter(pk=instance.pk).values(*VARIANT_LISTING_FIELDS).first()
+    if old is not None and all(old[field] == getattr(instance, field) for field in VARIANT_LISTING_FIELDS):
+        instance._cache_scope = SCOPE_STOCK
+    else:
+        instance._cache_scope = SCOPE_ALL
+    instance._old_product_id = old['product_id'] if old is not None else None
 
 # When creating or updating a product variant
 @receiver(post_save, sender=ProductVariant)
 def update_variant_stock_status(sender, instance, created, **kwargs):
     """Update stock status when variant is created or updated"""
-    # Prevent recursion by checking if we're already updating the stock status
-    if hasattr(instance, '_updating_stock_status'):
-        return
+    # Ensure stock status is consistent with stock quantity. A queryset update
+    # doesn't re-run the save signals, which would overwrite _old_product_id
+    new_stock_status = instance.stock > 0
+    if instance.is_in_stock != new_stock_status:
+        instance.is_in_stock = new_stock_status
+        ProductVariant.objects.filter(pk=instance.pk).update(is_in_stock=new_stock_status)
+        # pre_save compared the uncorrected value: the stock state did change
+        instance._cache_scope = SCOPE_ALL
     
-    # Mark that we're updating stock status to prevent recursion
-    instance._updating_stock_status = True
-    
-    try:
-        # Ensure stock status is consistent with stock quantity
-        new_stock_status = instance.stock > 0
-        if instance.is_in_stock != new_stock_status:
-            instance.is_in_stock = new_stock_status
-            # Use update_fields to avoid triggering the signal again
-            instance.save(update_fields=['is_in_stock'])
-    finally:
-        # Remove the flag
-        delattr(instance, '_updating_stock_status')
+    # Keep the price, stock, color and storage summary on the product in step
+    update_variant_summaries([instance.product_id, getattr(instance, '_old_product_id', None)])
     
     # Invalidate product cache after variant changes
-    invalidate_product_cache(instance.product.id)
+    scope = SCOPE_ALL if created else getattr(instance, '_cache_scope', SCOPE_ALL)
+    invalidate_product_cache(instance.product_id, scope)
+    
+    # Price, color, storage or stock state changed, update the filter facets
+    if scope == SCOPE_ALL:
+        facet_index.record_change(PRODUCT, instance.product_id)
+        old_product_id = getattr(instance, '_old_product_id', None)
+        if old_product_id and old_product_id != instance.product_id:
+            facet_index.record_change(PRODUCT, old_product_id)
 
 # When deleting a product variant
 @receiver(post_delete, sender=ProductVariant)
 def cleanup_after_variant_delete(sender, instance, **kwargs):
     """Cleanup after variant deletion"""
-    # This could be extended to handle any cleanup needed when a variant is deleted
-    # For example, updating product availability if no variants remain
     product = instance.product
     
-    # Check if product still has any variants in stock
-    has_stock = product.variants.filter(is_in_stock=True).exists()
-    
-    # You could add logic here to update product status based on variant availability
-    # For example, marking a product as out of stock if no variants are available
-    
-    # Invalidate product cache
+    # Recompute the product's availability and invalidate its cache
+    update_variant_summaries([product.id])
     invalidate_product_cache(product.id)
+    facet_index.record_change(PRODUCT, product.id)
@@ -0,0 +1,184 @@
+"""
+In-memory catalog indexes shared by the autocomplete and facet filters
+
+Each worker process builds its own copy from the database on first use. To
+keep the copies in sync, signals record changed ids in a Redis sorted set
+(scored by change time) once their transaction commits, and bump the index's
+cache namespace. Every worker sees the new version through the local cache
+invalidation channel and re-reads only the changed rows.
+
+Changes that are not recorded (e.g. sales changing weights) are picked up by
+a full rebuild every rebuild_interval seconds. It runs in a background thread
+while the previous copy keeps answering.
+"""
+
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+from django.conf import settings
+from django.db import connections, transaction
+from backend import cache_invalidation
+from backend.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+# Kinds of changed entries
+PRODUCT = 'product'
+CATEGORY = 'category'
+COLOR = 'color'
+
+# Change timestamps come from the clocks of other hosts
+CLOCK_SKEW = 5  # seconds
+
+
+class SyncedIndex:
+    """Per-process index; subclasses implement build() and apply()"""
+
+    kinds = (PRODUCT, CATEGORY)
+
+    def __init__(self, namespace: str, rebuild_interval: int = 900, change_retention: int = 3600):
+        """
+        Initialize the index
+
+        Args:
+            namespace: Cache namespace bumped on changes (e.g., 'products:autocomplete')
+            rebuild_interval: Seconds between full rebuilds
+            change_retention: Seconds recorded changes are kept in Redis; a
+                worker that hasn't synced for longer rebuilds instead
+        """
+        self.namespace = namespace
+        self.rebuild_interval = rebuild_interval
+        self.change_retention = change_retention
+        self._state = None
+        self._version = None
+        self._synced_at = 0.0
+        self._built_at = 0.0
+        self._pid = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def build(self) -> Any:
+        """Read everything from the database into a new state"""
+        raise NotImplementedError
+
+    def apply(self, state: Any, changed: Dict[str, set]):
+        """Re-read changed entries (ids per kind) into state, with the lock held"""
+        raise NotImplementedError
+
+    @contextmanager
+    def reading(self):
+        """Sync, then hold the lock while the caller reads the state"""
+        self._sync()
+        with self._lock:
+            yield self._state
+
+    def _changes_key(self) -> str:
+        """Raw Redis key of the sorted set of changed entries, scored by change time"""
+        return f"{settings.CACHES['default']['KEY_PREFIX']}:{self.namespace}:changes"
+
+    def record_change(self, kind: str, entry_id: int):
+        """Tell every worker to re-read an entry, once the current transaction commits"""
+        self.record_changes(kind, [entry_id])
+
+    def record_changes(self, kind: str, entry_ids):
+        """Tell every worker to re-read several entries of a kind, with one write"""
+        entry_ids = list(entry_ids)
+        if not entry_ids:
+            return
+
+        def record():
+            now = time.time()
+            key = self._changes_key()
+            try:
+                with redis_client.breaker.guard():
+                    pipe = redis_client.client.pipeline(transaction=False)
+                    pipe.zadd(key, {f'{kind}:{entry_id}': now for entry_id in entry_ids})
+                    pipe.zremrangebyscore(key, '-inf', now - self.change_retention)
+                    pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis INDEX CHANGES error: {e}")
+            cache_invalidation.invalidate_namespaces(self.namespace)
+
+        transaction.on_commit(record)
+
+    def _sync(self):
+        """Build the state on first use, then apply changes made by other workers"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._rebuilding = False
+                    self._install(*self._build())
+            return
+
+        version = redis_client.get_namespace_version(self.namespace)
+        if version and version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._apply_changes(version)
+
+        if time.time() - self._built_at > self.rebuild_interval:
+            with self._lock:
+                self._start_rebuild()
+
+    def _build(self):
+        version = redis_client.get_namespace_version(self.namespace)
+        started = time.time()
+        return self.build(), version, started
+
+    def _install(self, state, version, started):
+        """Swap in a built state, with the lock held"""
+        self._state = state
+        self._version = version
+        self._synced_at = self._built_at = started
+        self._pid = os.getpid()
+
+    def _start_rebuild(self):
+        """Rebuild in a background thread unless one is running, with the lock held"""
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+        # Not retried before the next interval if it fails
+        self._built_at = time.time()
+        threading.Thread(target=self._rebuild, name=f'{self.namespace}-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        """Rebuild in the background, then swap the new state in"""
+        try:
+            built = self._build()
+            with self._lock:
+                if self._rebuilding:
+                    self._install(*built)
+        except Exception as e:
+            logger.warning(f"Index {self.namespace} rebuild error: {e}")
+        finally:
+            self._rebuilding = False
+            connections.close_all()
+
+    def _apply_changes(self, version: int):
+        """Re-read the entries changed since the last sync, with the lock held"""
+        started = time.time()
+        since = self._synced_at - CLOCK_SKEW
+        try:
+            with redis_client.breaker.guard():
+                members = redis_client.client.zrangebyscore(self._changes_key(), since, '+inf')
+        except Exception as e:
+            logger.warning(f"Redis INDEX CHANGES error: {e}")
+            members = None
+
+        self._version = version
+        if members is None or since < started - self.change_retention:
+            # Changes unreadable or possibly trimmed already, start over
+            self._start_rebuild()
+            return
+
+        changed = {kind: set() for kind in self.kinds}
+        for member in members:
+            kind, _, entry_id = member.partition(':')
+            if kind in changed:
+                changed[kind].add(int(entry_id))
+        self.apply(self._state, changed)
+        self._synced_at = started
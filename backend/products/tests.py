@@ -1,3 +1,90 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APITestCase
+from backend.redis_client import redis_client
+from orders.models import Order, OrderItem
+from .models import Category, Product, ProductColor, ProductVariant
+from .recommender import recommender
+from .search import search_index
 
-# Create your tests here.
+
+def _test_key(name):
+    return f"test:recs:{name}"
+
+
+class RecommenderRefreshTest(TestCase):
+    def setUp(self):
+        patcher = mock.patch('products.recommender._key', _test_key)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._clear_keys)
+
+        user = User.objects.create_user(username='buyer', password='testpass123')
+        category = Category.objects.create(name='Phones', slug='phones')
+        color = ProductColor.objects.create(name='Black', hex_code='#000000')
+        self.variants = []
+        for name in ('Phone', 'Case', 'Charger'):
+            product = Product.objects.create(name=name, category=category)
+            self.variants.append(
+                ProductVariant.objects.create(product=product, color=color, price=Decimal('10.00'), stock=100)
+            )
+        for number, variants in enumerate([self.variants, self.variants[:2]]):
+            order = Order.objects.create(
+                id=f'ORD-TEST{number}', user=user, total=Decimal('30.00'), status='completed', is_paid=True
+            )
+            for variant in variants:
+                OrderItem.objects.create(order=order, product_variant=variant, quantity=1, price=variant.price)
+
+    def _clear_keys(self):
+        keys = list(redis_client.client.scan_iter(_test_key('*')))
+        if keys:
+            redis_client.client.delete(*keys)
+
+    def _counts(self):
+        client = redis_client.client
+        product_ids = [variant.product_id for variant in self.variants]
+        return (
+            client.hgetall(_test_key('orders')),
+            {product_id: client.hgetall(_test_key(f'counts:{product_id}')) for product_id in product_ids},
+        )
+
+    def test_refresh_twice_leaves_counts_unchanged(self):
+        orders, product_ids = recommender.refresh()
+        self.assertEqual(orders, 2)
+        counts = self._counts()
+
+        self.assertEqual(recommender.refresh(), (0, []))
+        self.assertEqual(self._counts(), counts)
+
+    def test_refresh_after_rebuild_counts_nothing(self):
+        recommender.rebuild()
+        counts = self._counts()
+
+        self.assertEqual(recommender.refresh(), (0, []))
+        self.assertEqual(self._counts(), counts)
+
+
+class ProductSearchPaginationTest(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Phones', slug='phones')
+        # Names starting with the search term rank first, then the ones containing it
+        for number in range(3):
+            Product.objects.create(name=f'Phone {number}', category=category)
+            Product.objects.create(name=f'Smart phone {number}', category=category)
+
+    @mock.patch.object(search_index, 'search', return_value=None)
+    def test_search_pages_follow_next_link(self, search):
+        names = []
+        url = '/api/products/?search=phone&limit=4'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            names += [product['name'] for product in page['results']]
+            url = page['next']
+
+        self.assertEqual(names, [
+            'Phone 0', 'Phone 1', 'Phone 2', 'Smart phone 0', 'Smart phone 1', 'Smart phone 2',
+        ])
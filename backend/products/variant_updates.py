@@ -0,0 +1,173 @@
+"""
+Bulk price and stock updates of variants, for ERP sync
+
+apply_variant_updates() takes rows of {'id', 'price'?, 'stock'?} and writes
+them CHUNK_SIZE rows at a time with two set-based UPDATEs per chunk:
+
+    UPDATE ... SET price = CASE id WHEN ... END, stock = CASE id WHEN ... END WHERE id IN (...)
+    UPDATE ... SET is_in_stock = (stock > 0) WHERE id IN (...)
+
+Rows that change nothing are not written. Saves and signals are skipped, so
+the variant summaries of the affected products are recomputed and their
+caches invalidated once at the end, only the listings containing them when
+just the stock moved (like the variant signals do).
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import List
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Case, DecimalField, F, IntegerField, Value, When
+from django.utils import timezone
+from backend import cache_invalidation
+from .cache import SCOPE_ALL, SCOPE_STOCK, invalidate_product_cache
+from .facets import facet_index
+from .models import ProductVariant, update_variant_summaries
+from .synced_index import PRODUCT
+
+
+_bulk_settings = getattr(settings, 'VARIANT_BULK_UPDATE', {})
+MAX_ROWS = _bulk_settings.get('MAX_ROWS', 5000)
+CHUNK_SIZE = _bulk_settings.get('CHUNK_SIZE', 500)
+
+# Row statuses
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+MAX_PRICE = Decimal('99999999.99')
+
+
+def _parse(row) -> dict:
+    """Validated {'id', 'price'?, 'stock'?} of a row, ValueError if it isn't"""
+    if not isinstance(row, dict):
+        raise ValueError('Each row must be an object')
+    try:
+        variant_id = int(row.get('id'))
+    except (TypeError, ValueError):
+        raise ValueError('id must be an integer')
+    if isinstance(row.get('id'), bool) or variant_id <= 0:
+        raise ValueError('id must be an integer')
+
+    update = {'id': variant_id}
+    if row.get('price') is not None:
+        try:
+            price = Decimal(str(row['price']))
+        except InvalidOperation:
+            raise ValueError('price must be a number')
+        if not price.is_finite() or price < 0 or price > MAX_PRICE:
+            raise ValueError(f'price must be between 0 and {MAX_PRICE}')
+        update['price'] = price.quantize(Decimal('0.01'))
+    if row.get('stock') is not None:
+        stock = row['stock']
+        if isinstance(stock, bool) or not isinstance(stock, (int, str)):
+            raise ValueError('stock must be an integer')
+        try:
+            stock = int(stock)
+        except ValueError:
+            raise ValueError('stock must be an integer')
+        if stock < 0:
+            raise ValueError('stock must not be negative')
+        update['stock'] = stock
+    if len(update) == 1:
+        raise ValueError('price or stock is required')
+    return update
+
+
+def apply_variant_updates(rows: List[dict]) -> dict:
+    """
+    Apply price / stock rows and report what happened to each
+
+    Returns:
+        Counts per status and 'results', one {'id', 'status', 'error'?} per
+        row in request order. When an id is given more than once, its last
+        row wins and the earlier ones are reported unchanged.
+    """
+    results = []
+    updates = {}
+    for position, row in enumerate(rows):
+        try:
+            update = _parse(row)
+        except ValueError as e:
+            results.append({'id': row.get('id') if isinstance(row, dict) else None, 'status': INVALID, 'error': str(e)})
+            continue
+        results.append({'id': update['id'], 'status': UNCHANGED})
+        updates[update['id']] = (position, update)
+
+    # Product id -> invalidation scope
+    affected = {}
+    variant_ids = list(updates)
+    try:
+        for start in range(0, len(variant_ids), CHUNK_SIZE):
+            chunk = {variant_id: updates[variant_id] for variant_id in variant_ids[start:start + CHUNK_SIZE]}
+            with transaction.atomic():
+                current = {
+                    variant_id: (product_id, price, stock)
+                    for variant_id, product_id, price, stock in (
+                        ProductVariant.objects
+                        .select_for_update()
+                        .filter(id__in=list(chunk))
+                        .values_list('id', 'product_id', 'price', 'stock')
+                    )
+                }
+                prices, stocks = {}, {}
+                for variant_id, (position, update) in chunk.items():
+                    if variant_id not in current:
+                        results[position] = {'id': variant_id, 'status': NOT_FOUND, 'error': 'Variant not found'}
+                        continue
+                    product_id, price, stock = current[variant_id]
+                    if 'price' in update and update['price'] != price:
+                        prices[variant_id] = update['price']
+                        affected[product_id] = SCOPE_ALL
+                    if 'stock' in update and update['stock'] != stock:
+                        stocks[variant_id] = update['stock']
+                        if (update['stock'] > 0) != (stock > 0):
+                            affected[product_id] = SCOPE_ALL
+                        else:
+                            affected.setdefault(product_id, SCOPE_STOCK)
+                    if variant_id in prices or variant_id in stocks:
+                        results[position]['status'] = UPDATED
+
+                changed = list(prices.keys() | stocks.keys())
+                if changed:
+                    ProductVariant.objects.filter(id__in=changed).update(
+                        price=_case(prices, 'price', DecimalField(max_digits=10, decimal_places=2)),
+                        stock=_case(stocks, 'stock', IntegerField()),
+                        updated_at=timezone.now(),
+                    )
+                    ProductVariant.objects.filter(id__in=changed).update(
+                        is_in_stock=Case(When(stock__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField())
+                    )
+    finally:
+        # Also when a chunk fails, so the chunks already committed don't keep stale summaries and caches
+        _refresh_products(affected)
+
+    counts = {status: 0 for status in (UPDATED, UNCHANGED, NOT_FOUND, INVALID)}
+    for result in results:
+        counts[result['status']] += 1
+    return {**counts, 'results': results}
+
+
+def _refresh_products(affected: dict):
+    """Recompute the variant summaries of updated products and drop what they make stale"""
+    if not affected:
+        return
+    product_ids = list(affected)
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        update_variant_summaries(product_ids[start:start + CHUNK_SIZE])
+    with cache_invalidation.deferred():
+        for product_id, scope in affected.items():
+            invalidate_product_cache(product_id, scope)
+    facet_index.record_changes(PRODUCT, [product_id for product_id, scope in affected.items() if scope == SCOPE_ALL])
+
+
+def _case(values: dict, field: str, output_field):
+    """New values of a column by variant id, the current one for the others"""
+    if not values:
+        return F(field)
+    return Case(
+        *[When(id=variant_id, then=Value(value)) for variant_id, value in values.items()],
+        default=F(field),
+        output_field=output_field,
+    )
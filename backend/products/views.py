@@ -2,13 +2,11 @@ from rest_framework import viewsets, filters, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Case, When, IntegerField, Value, CharField, Count, Min, Max, Sum
-from django.utils import timezone
-from datetime import timedelta
+from django.db.models import Case, When, IntegerField, Value, CharField, Count, Min, Max
 from django.core.cache import cache
 from backend.redis_client import redis_client
-import hashlib
-import json
+from backend.cached_response import render_body, render_list, cached_response
+from backend.pagination import KeysetPagination
 from .models import Category, Product, ProductColor, ProductVariant
 from .serializers import (
     CategorySerializer, 
@@ -18,43 +16,35 @@ from .serializers import (
     ProductVariantSerializer
 )
 from .permissions import IsAdminOrReadOnly
-
-
-def generate_cache_key(prefix: str, **kwargs) -> str:
-    """Generate a consistent cache key from prefix and parameters"""
-    params = "&".join([f"{k}={v}" for k, v in sorted(kwargs.items()) if v is not None])
-    if params:
-        params_hash = hashlib.md5(params.encode()).hexdigest()[:8]
-        return f"{prefix}:{params_hash}"
-    return prefix
-
-
-def invalidate_product_cache(product_id=None):
-    """Invalidate all product-related caches"""
-    patterns = [
-        'products:list:*',
-        'products:filters:*',
-        'products:top_sellers',
-        'products:new_arrivals',
-        'products:personalized:*',
-    ]
-    
-    if product_id:
-        patterns.extend([
-            f'product:{product_id}',
-            f'product:{product_id}:variants',
-            f'product:{product_id}:recommendations',
-        ])
-    
-    for pattern in patterns:
-        redis_client.clear_pattern(pattern)
-
-
-def invalidate_category_cache():
-    """Invalidate category-related caches"""
-    redis_client.clear_pattern('categories:*')
-    redis_client.clear_pattern('products:list:*')
-    redis_client.clear_pattern('products:filters:*')
+from .search import legacy_search, search_index
+from .autocomplete import AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, autocomplete
+from .facets import facet_index
+from .category_tree import category_tree
+from .recommender import recommender
+from .sales import DEFAULT_WINDOW, WINDOWS as SALES_WINDOWS, top_selling_products
+from .variant_updates import MAX_ROWS as VARIANT_UPDATES_MAX_ROWS, apply_variant_updates
+from .cache import (
+    CATEGORIES,
+    CATEGORY,
+    PRODUCT_COLORS,
+    PRODUCT_LIST,
+    PRODUCT_FILTERS,
+    TOP_SELLERS,
+    NEW_ARRIVALS,
+    PERSONALIZED,
+    PRODUCT,
+    params_key,
+    read_through,
+    track_products,
+    BATCH_MAX_IDS,
+    product_cache_key,
+    set_product_entry,
+    set_product_entries,
+    shape_key,
+    invalidate_product_cache,
+    invalidate_category_cache,
+    invalidate_color_cache,
+)
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -64,34 +54,49 @@ class CategoryViewSet(viewsets.ModelViewSet):
     
     def list(self, request, *args, **kwargs):
         """Get all categories with caching"""
-        cache_key = 'categories:all'
+        cache_key = redis_client.versioned_key(CATEGORIES, 'all')
         cached_data = redis_client.get(cache_key)
         
         if cached_data:
-            return Response(cached_data)
+            return cached_response(request, cached_data)
         
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         
-        # Cache for 30 minutes
-        redis_client.set(cache_key, serializer.data, timeout=1800)
-        return Response(serializer.data)
+        # Cache the rendered body for 30 minutes
+        body = render_body(serializer.data)
+        redis_client.set(cache_key, body, timeout=1800)
+        return cached_response(request, body)
     
     def retrieve(self, request, *args, **kwargs):
         """Get single category with caching"""
         pk = kwargs.get('pk')
-        cache_key = f'category:{pk}'
+        cache_key = redis_client.versioned_key(CATEGORY, pk)
         cached_data = redis_client.get(cache_key)
         
         if cached_data:
-            return Response(cached_data)
+            return cached_response(request, cached_data)
         
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         
-        # Cache for 30 minutes
-        redis_client.set(cache_key, serializer.data, timeout=1800)
-        return Response(serializer.data)
+        # Cache the rendered body for 30 minutes
+        body = render_body(serializer.data)
+        redis_client.set(cache_key, body, timeout=1800)
+        return cached_response(request, body)
+    
+    @action(detail=True, methods=['get'])
+    def breadcrumbs(self, request, pk=None):
+        """Categories from the root down to this one, from the cached category tree"""
+        try:
+            category_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        breadcrumbs = category_tree().breadcrumbs(category_id)
+        if not breadcrumbs:
+            return Response({'error': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(breadcrumbs)
     
     def perform_create(self, serializer):
         """Clear cache after creating category"""
@@ -116,35 +121,41 @@ class ProductColorViewSet(viewsets.ModelViewSet):
     
     def list(self, request, *args, **kwargs):
         """Get all colors with caching"""
-        cache_key = 'product_colors:all'
+        cache_key = redis_client.versioned_key(PRODUCT_COLORS, 'all')
         cached_data = redis_client.get(cache_key)
         
         if cached_data:
-            return Response(cached_data)
+            return cached_response(request, cached_data)
         
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         
-        # Cache for 1 hour
-        redis_client.set(cache_key, serializer.data, timeout=3600)
-        return Response(serializer.data)
+        # Cache the rendered body for 1 hour
+        body = render_body(serializer.data)
+        redis_client.set(cache_key, body, timeout=3600)
+        return cached_response(request, body)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Get single color, with an ETag for conditional requests"""
+        serializer = self.get_serializer(self.get_object())
+        return cached_response(request, render_body(serializer.data))
     
     def perform_create(self, serializer):
         """Clear cache after creating color"""
         serializer.save()
-        redis_client.delete('product_colors:all')
+        invalidate_color_cache()
         invalidate_product_cache()
     
     def perform_update(self, serializer):
         """Clear cache after updating color"""
         serializer.save()
-        redis_client.delete('product_colors:all')
+        invalidate_color_cache()
         invalidate_product_cache()
     
     def perform_destroy(self, instance):
         """Clear cache after deleting color"""
         instance.delete()
-        redis_client.delete('product_colors:all')
+        invalidate_color_cache()
         invalidate_product_cache()
 
 
@@ -171,37 +182,61 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
         product_id = request.query_params.get('product_id')
         
         if product_id:
-            cache_key = f'product:{product_id}:variants:list'
+            shape = shape_key(request)
+            cache_key = product_cache_key(product_id, 'variants:list', shape=shape)
             cached_data = redis_client.get(cache_key)
             
             if cached_data:
-                return Response(cached_data)
+                return cached_response(request, cached_data)
         
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         
         if product_id:
-            # Cache for 15 minutes
-            redis_client.set(cache_key, serializer.data, timeout=900)
+            # Cache the rendered body for 15 minutes
+            body = render_body(serializer.data)
+            set_product_entry(cache_key, product_id, body, timeout=900, shape=shape)
+            return cached_response(request, body)
         
-        return Response(serializer.data)
+        # Not cached, but still sent with an ETag for conditional requests
+        return cached_response(request, render_body(serializer.data))
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Get single variant, with an ETag for conditional requests"""
+        serializer = self.get_serializer(self.get_object())
+        return cached_response(request, render_body(serializer.data))
     
     def perform_create(self, serializer):
         """Clear cache after creating variant"""
         variant = serializer.save()
         invalidate_product_cache(variant.product.id)
     
-    def perform_update(self, serializer):
-        """Clear cache after updating variant"""
-        variant = serializer.save()
-        invalidate_product_cache(variant.product.id)
-    
     def perform_destroy(self, instance):
         """Clear cache after deleting variant"""
         product_id = instance.product.id
         instance.delete()
         invalidate_product_cache(product_id)
 
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """
+        Update the price and / or stock of many variants, e.g. from the ERP
+        
+        Takes a list of {id, price?, stock?} (or {'variants': [...]}) and
+        returns counts per status with one result per row, see
+        products.variant_updates.
+        """
+        rows = request.data.get('variants') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Expected a non-empty list of variants'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > VARIANT_UPDATES_MAX_ROWS:
+            return Response(
+                {'error': f'At most {VARIANT_UPDATES_MAX_ROWS} variants per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(apply_variant_updates(rows))
+
     @action(detail=True, methods=['post'])
     def reduce_stock(self, request, pk=None):
         """Reduce stock for a specific variant"""
@@ -217,11 +252,9 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
                     'error': f'Insufficient stock. Available: {variant.stock}, Requested: {quantity}'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
+            # Cache is invalidated by the variant post_save signal
             variant.reduce_stock(quantity)
             
-            # Invalidate cache after stock change
-            invalidate_product_cache(variant.product.id)
-            
             serializer = self.get_serializer(variant)
             return Response(serializer.data)
             
@@ -240,11 +273,9 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
             if quantity <= 0:
                 return Response({'error': 'Quantity must be positive'}, status=status.HTTP_400_BAD_REQUEST)
             
+            # Cache is invalidated by the variant post_save signal
             variant.increase_stock(quantity)
             
-            # Invalidate cache after stock change
-            invalidate_product_cache(variant.product.id)
-            
             serializer = self.get_serializer(variant)
             return Response(serializer.data)
             
@@ -255,9 +286,10 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
 
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.prefetch_related('variants__color').all()
+    queryset = Product.objects.select_related('category').prefetch_related('variants__color').all()
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['category', 'category__name']
     ordering_fields = ['name', 'created_at']
@@ -276,15 +308,45 @@ class ProductViewSet(viewsets.ModelViewSet):
         # Apply parent class filtering first
         queryset = super().filter_queryset(queryset)
         
-        # Handle hierarchical category filtering
-        if category_slug:
-            try:
-                target_category = Category.objects.get(slug=category_slug)
-                subcategories = Category.objects.filter(parent=target_category)
-                categories_to_include = [target_category] + list(subcategories)
-                queryset = queryset.filter(category__in=categories_to_include)
-            except Category.DoesNotExist:
+        # Filter by primary key with the facet index when it can
+        if any([category_slug, min_price, max_price, color_id, storage, in_stock]):
+            narrowed = facet_index.filter_queryset(
+                queryset,
+                category_slug=category_slug,
+                min_price=min_price,
+                max_price=max_price,
+                color_id=color_id,
+                storage=storage,
+                in_stock=in_stock,
+            )
+            if narrowed is None:
+                narrowed = self._filter_by_variants(
+                    queryset, category_slug, min_price, max_price, color_id, storage, in_stock
+                )
+            queryset = narrowed
+        
+        # Search functionality, ranked by the search index
+        if search:
+            ranked_ids = search_index.search(search)
+            if ranked_ids is None:
+                # Index not built yet, search names in the database
+                queryset = legacy_search(queryset, search)
+            elif not ranked_ids:
                 queryset = queryset.none()
+            else:
+                search_rank = Case(
+                    *[When(id=product_id, then=Value(rank)) for rank, product_id in enumerate(ranked_ids)],
+                    output_field=IntegerField(),
+                )
+                queryset = queryset.filter(id__in=ranked_ids).order_by(search_rank)
+        
+        return queryset
+    
+    def _filter_by_variants(self, queryset, category_slug, min_price, max_price, color_id, storage, in_stock):
+        """Apply the list filters with joins to variants, when the facet index can't"""
+        # Handle hierarchical category filtering, subcategories at any depth
+        if category_slug:
+            queryset = self._filter_by_category(queryset, category_slug)
         
         # Filter by price range (based on variant prices)
         if min_price:
@@ -316,39 +378,34 @@ class ProductViewSet(viewsets.ModelViewSet):
         if in_stock and in_stock.lower() == 'true':
             queryset = queryset.filter(variants__is_in_stock=True).distinct()
         
-        # Search functionality
-        if search:
-            # Products that start with the search term (highest priority)
-            starts_with_qs = queryset.filter(name__istartswith=search)
-            
-            # Products that contain but don't start with the search term (lower priority)
-            contains_qs = queryset.filter(
-                name__icontains=search
-            ).exclude(name__istartswith=search)
-            
-            # Combine querysets with proper ordering
-            starts_with_annotated = starts_with_qs.annotate(
-                search_rank=Value(1, output_field=IntegerField())
-            )
-            contains_annotated = contains_qs.annotate(
-                search_rank=Value(2, output_field=IntegerField())
-            )
-            
-            queryset = starts_with_annotated.union(contains_annotated).order_by('search_rank', 'name')
-        
         return queryset
     
+    @staticmethod
+    def _filter_by_category(queryset, category_slug):
+        """Products of a category and its subcategories, from the cached category tree"""
+        tree = category_tree()
+        category_id = tree.find(category_slug)
+        if category_id is None:
+            return queryset.none()
+        return queryset.filter(category_id__in=tree.descendant_ids(category_id))
+    
     def list(self, request, *args, **kwargs):
         """Get products with caching"""
-        # Generate cache key based on query parameters
+        # Cache key is based on query parameters
         params = request.query_params.dict()
-        cache_key = generate_cache_key('products:list', **params)
-        
-        # Try to get from cache
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
         
+        # Cache for 10 minutes, only one worker rebuilds an expired page
+        body = read_through(
+            PRODUCT_LIST,
+            lambda: self._build_list_data(request),
+            timeout=600,
+            key=params_key(**params),
+            track=True,
+        )
+        return cached_response(request, body)
+    
+    def _build_list_data(self, request):
+        """Build the (optionally paginated) product list payload"""
         # Get the filtered queryset (including search logic)
         queryset = self.filter_queryset(self.get_queryset())
         
@@ -366,44 +423,81 @@ class ProductViewSet(viewsets.ModelViewSet):
             page = self.paginate_queryset(queryset)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
-                response = self.get_paginated_response(serializer.data)
-                # Cache paginated response for 10 minutes
-                redis_client.set(cache_key, response.data, timeout=600)
-                return response
+                return self.get_paginated_response(serializer.data).data
         
         serializer = self.get_serializer(queryset, many=True)
-        
-        # Cache for 10 minutes
-        redis_client.set(cache_key, serializer.data, timeout=600)
-        return Response(serializer.data)
+        return serializer.data
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Grid pages asking for a few fields don't need the variants
+        fields = self.request.query_params.get('fields')
+        if fields is not None and 'variants' not in {name.strip().split('.')[0] for name in fields.split(',')}:
+            queryset = queryset.prefetch_related(None)
+        return queryset
     
     def retrieve(self, request, *args, **kwargs):
-        """Get single product with caching"""
+        """Get single product with caching, per field set"""
         pk = kwargs.get('pk')
-        cache_key = f'product:{pk}'
+        shape = shape_key(request)
+        cache_key = product_cache_key(pk, shape=shape)
         
         # Try to get from cache
         cached_data = redis_client.get(cache_key)
         if cached_data:
-            return Response(cached_data)
+            return cached_response(request, cached_data)
         
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         
-        # Cache for 15 minutes
-        redis_client.set(cache_key, serializer.data, timeout=900)
-        return Response(serializer.data)
+        # Cache the rendered body for 15 minutes
+        body = render_body(serializer.data)
+        set_product_entry(cache_key, pk, body, timeout=900, shape=shape)
+        return cached_response(request, body)
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Get several products at once, e.g. ?ids=3,1,2 for a cart page
+        
+        Cached products are read with one MGET, the others with one query and
+        cached in one pipelined write. Results follow the order of ids, with
+        {'id': ..., 'error': 'Product not found'} for unknown ones.
+        """
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response({'error': 'ids must be comma separated integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > BATCH_MAX_IDS:
+            return Response(
+                {'error': f'At most {BATCH_MAX_IDS} ids per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        shape = shape_key(request)
+        version = redis_client.get_namespace_version(PRODUCT)
+        keys = {product_id: product_cache_key(product_id, version=version, shape=shape) for product_id in ids}
+        cached = redis_client.get_many(list(keys.values()))
+        bodies = {product_id: cached[key] for product_id, key in keys.items() if cached.get(key)}
+        
+        missing = [product_id for product_id in keys if product_id not in bodies]
+        if missing:
+            products = self.get_queryset().filter(id__in=missing)
+            serializer = self.get_serializer(products, many=True)
+            loaded = {item['id']: render_body(item) for item in serializer.data}
+            # Cached for 15 minutes like single products
+            set_product_entries(loaded, timeout=900, shape=shape, version=version)
+            bodies.update(loaded)
+        
+        return cached_response(request, render_list(
+            bodies.get(product_id) or {'id': product_id, 'error': 'Product not found'} for product_id in ids
+        ))
     
     def perform_create(self, serializer):
         """Clear cache after creating product"""
         serializer.save()
         invalidate_product_cache()
     
-    def perform_update(self, serializer):
-        """Clear cache after updating product"""
-        product = serializer.save()
-        invalidate_product_cache(product.id)
-    
     def perform_destroy(self, instance):
         """Clear cache after deleting product"""
         product_id = instance.id
@@ -412,13 +506,14 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def variants(self, request, pk=None):
-        """Get all variants for a specific product with caching"""
-        cache_key = f'product:{pk}:variants'
+        """Get all variants for a specific product with caching, per field set"""
+        shape = shape_key(request)
+        cache_key = product_cache_key(pk, 'variants', shape=shape)
         
         # Try to get from cache
         cached_data = redis_client.get(cache_key)
         if cached_data:
-            return Response(cached_data)
+            return cached_response(request, cached_data)
         
         try:
             product = self.get_object()
@@ -429,127 +524,119 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
             serializer = ProductVariantSerializer(variants, many=True, context={'request': request})
             
-            # Cache for 15 minutes
-            redis_client.set(cache_key, serializer.data, timeout=900)
-            return Response(serializer.data)
+            # Cache the rendered body for 15 minutes
+            body = render_body(serializer.data)
+            set_product_entry(cache_key, pk, body, timeout=900, shape=shape)
+            return cached_response(request, body)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['get'])
     def recommendations(self, request, pk=None):
-        """Product detail recommendations based on category with caching"""
-        cache_key = f'product:{pk}:recommendations'
+        """Products frequently bought together with this one, topped up from its category, with caching"""
+        cache_key = product_cache_key(pk, 'recommendations')
         
         # Try to get from cache
         cached_data = redis_client.get(cache_key)
         if cached_data:
-            return Response(cached_data)
+            return cached_response(request, cached_data)
         
         try:
-            product = Product.objects.get(pk=pk)
+            product = Product.objects.only('id', 'category_id').get(pk=pk)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        target_category = product.category.parent if product.category.parent else product.category
+        # Neighbours from order history (see products.recommender), in rank order
+        neighbour_ids = recommender.neighbours(product.id)
+        recommended = []
+        if neighbour_ids:
+            neighbours = Product.objects.filter(id__in=neighbour_ids, in_stock=True).select_related('category').in_bulk()
+            recommended = [neighbours[each] for each in neighbour_ids if each in neighbours][:8]
 
-        # Get products from the same category, excluding the current product
-        queryset = Product.objects.filter(
-            Q(category=target_category) | Q(category__parent=target_category)
-        ).exclude(id=product.id).prefetch_related('variants__color')
-        
-        # Only include products that have variants in stock
-        queryset = queryset.filter(variants__is_in_stock=True).distinct()
-        
-        # Order by rating and created_at for better recommendations
-        queryset = queryset.order_by('-rating', '-created_at')
-        
-        # Limit to 8 recommendations
-        queryset = queryset[:8]
-        serializer = ProductRecommendationSerializer(queryset, many=True, context={'request': request})
-        
-        # Cache for 20 minutes
-        redis_client.set(cache_key, serializer.data, timeout=1200)
-        return Response(serializer.data)
+        if len(recommended) < 8:
+            # The parent category of the product's one, or its own if at the top
+            tree = category_tree()
+            target_category_id = tree.parent_id(product.category_id) or product.category_id
 
-    @action(detail=False, methods=['get'])
-    def top_sellers(self, request):
-        """Top selling products based on variant sales with caching"""
-        cache_key = 'products:top_sellers'
-        
-        # Try to get from cache
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-        
-        last_7_days = timezone.now() - timedelta(days=7)
+            # Get products from the same category tree, excluding the current product
+            queryset = Product.objects.filter(
+                category_id__in=tree.descendant_ids(target_category_id) or [target_category_id]
+            ).exclude(id__in=[product.id, *(each.id for each in recommended)]).select_related('category')
 
-        # Try to get products with highest sales in the last 7 days
-        top_products = (
-            Product.objects
-            .filter(variants__orderitem__order__date__gte=last_7_days)
-            .prefetch_related('variants__color')
-            .annotate(total_sold=Sum('variants__sold'))
-            .order_by('-total_sold')
-            .distinct()[:10]
-        )
+            # Only include products that have variants in stock
+            queryset = queryset.filter(in_stock=True)
+
+            # Order by rating and created_at for better recommendations
+            queryset = queryset.order_by('-rating', '-created_at')
+
+            # Limit to 8 recommendations
+            recommended += list(queryset[:8 - len(recommended)])
+        serializer = ProductRecommendationSerializer(recommended, many=True, context={'request': request})
+        
+        # Cache the rendered body for 20 minutes, dropped when one of the recommended products changes
+        track_products(PRODUCT, cache_key, serializer.data, timeout=1200)
+        body = render_body(serializer.data)
+        redis_client.set(cache_key, body, timeout=1200)
+        return cached_response(request, body)
 
-        # If no products found in last 7 days, get all-time top sellers
-        if not top_products.exists():
-            top_products = (
-                Product.objects
-                .filter(variants__sold__gt=0)
-                .prefetch_related('variants__color')
-                .annotate(total_sold=Sum('variants__sold'))
-                .order_by('-total_sold')[:10]
+    @action(detail=False, methods=['get'])
+    def top_sellers(self, request):
+        """Top selling products of a rolling window (?window=1h, 24h, 7d or 30d) with caching"""
+        window = request.query_params.get('window', DEFAULT_WINDOW)
+        if window not in SALES_WINDOWS:
+            return Response(
+                {'error': f"window must be one of {', '.join(SALES_WINDOWS)}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # If still no products (no sales at all), return recent products
-        if not top_products.exists():
-            top_products = Product.objects.prefetch_related('variants__color').order_by('-created_at')[:10]
 
+        # Cache for a minute, the leaderboard follows sales as they happen (see products.sales)
+        body = read_through(
+            TOP_SELLERS, lambda: self._build_top_sellers(request, window), timeout=60, key=window, track=True
+        )
+        return cached_response(request, body)
+    
+    def _build_top_sellers(self, request, window):
+        """Serialize the current top sellers of a window"""
+        top_products = top_selling_products(window, limit=10)
         serializer = ProductRecommendationSerializer(top_products, many=True, context={'request': request})
-        
-        # Cache for 30 minutes (top sellers don't change frequently)
-        redis_client.set(cache_key, serializer.data, timeout=1800)
-        return Response(serializer.data)
+        return serializer.data
     
     @action(detail=False, methods=['get'])
     def new_arrivals(self, request):
         """Latest products with available variants with caching"""
-        cache_key = 'products:new_arrivals'
-        
-        # Try to get from cache
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-        
+        # Cache for 15 minutes (new arrivals can change more frequently)
+        body = read_through(NEW_ARRIVALS, lambda: self._build_new_arrivals(request), timeout=900, track=True)
+        return cached_response(request, body)
+    
+    def _build_new_arrivals(self, request):
+        """Serialize the latest in-stock products"""
         products = (
             Product.objects
-            .filter(variants__is_in_stock=True)
-            .prefetch_related('variants__color')
-            .distinct()
+            .filter(in_stock=True)
+            .select_related('category')
             .order_by('-created_at')[:10]
         )
         serializer = ProductRecommendationSerializer(products, many=True, context={'request': request})
-        
-        # Cache for 15 minutes (new arrivals can change more frequently)
-        redis_client.set(cache_key, serializer.data, timeout=900)
-        return Response(serializer.data)
+        return serializer.data
 
     @action(detail=False, methods=['get'])
     def personalized(self, request):
         """Personalized product recommendations based on categories with caching"""
         category_ids = request.query_params.getlist("categories")  # ?categories=1&categories=3
         
-        # Generate cache key based on categories
-        cache_key = generate_cache_key('products:personalized', categories=','.join(sorted(category_ids)))
-        
-        # Try to get from cache
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-        
-        queryset = Product.objects.prefetch_related('variants__color').all()
+        # Cache for 20 minutes, keyed by categories
+        body = read_through(
+            PERSONALIZED,
+            lambda: self._build_personalized(request, category_ids),
+            timeout=1200,
+            key=params_key(categories=','.join(sorted(category_ids))),
+            track=True,
+        )
+        return cached_response(request, body)
+    
+    def _build_personalized(self, request, category_ids):
+        """Serialize top rated in-stock products of the given categories"""
+        queryset = Product.objects.select_related('category').all()
 
         if category_ids:
             try:
@@ -561,38 +648,37 @@ class ProductViewSet(viewsets.ModelViewSet):
                 queryset = queryset.none()
 
         # Only include products that have variants in stock
-        queryset = queryset.filter(variants__is_in_stock=True).distinct().order_by('-rating', '-created_at')[:10]
+        queryset = queryset.filter(in_stock=True).order_by('-rating', '-created_at')[:10]
         serializer = ProductRecommendationSerializer(queryset, many=True, context={'request': request})
-        
-        # Cache for 20 minutes
-        redis_client.set(cache_key, serializer.data, timeout=1200)
-        return Response(serializer.data)
+        return serializer.data
 
     @action(detail=False, methods=['get'])
     def filters(self, request):
         """Get available filter options with caching"""
         category_slug = request.query_params.get('category__slug', '').strip()
         
-        # Generate cache key
-        cache_key = generate_cache_key('products:filters', category_slug=category_slug)
-        
-        # Try to get from cache
-        cached_data = redis_client.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        # Cache for 30 minutes (filters don't change very frequently)
+        body = read_through(
+            PRODUCT_FILTERS,
+            lambda: self._build_filters(category_slug),
+            timeout=1800,
+            key=params_key(category_slug=category_slug),
+        )
+        return cached_response(request, body)
+    
+    def _build_filters(self, category_slug):
+        """Collect price range, colors and storage options for a category"""
+        # From the facet index, with product counts per option
+        options = facet_index.filter_options(category_slug)
+        if options is not None:
+            return options
         
         # Base queryset
         queryset = Product.objects.all()
         
         # Apply category filter if provided
         if category_slug:
-            try:
-                target_category = Category.objects.get(slug=category_slug)
-                subcategories = Category.objects.filter(parent=target_category)
-                categories_to_include = [target_category] + list(subcategories)
-                queryset = queryset.filter(category__in=categories_to_include)
-            except Category.DoesNotExist:
-                queryset = queryset.none()
+            queryset = self._filter_by_category(queryset, category_slug)
         
         # Only include products that have variants
         queryset = queryset.filter(variants__isnull=False).distinct()
@@ -616,13 +702,23 @@ class ProductViewSet(viewsets.ModelViewSet):
         ).values_list('storage', flat=True).distinct()
         storage_options = [storage for storage in storages if storage]
         
-        response_data = {
+        return {
             'price_range': price_range,
             'colors': list(colors),
             'storage_options': storage_options,
         }
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Product and category name suggestions for the search box, served from memory"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
         
-        # Cache for 30 minutes (filters don't change very frequently)
-        redis_client.set(cache_key, response_data, timeout=1800)
-        return Response(response_data)
-
+        if not query:
+            return Response({'query': query, 'products': [], 'categories': []})
+        
+        suggestions = autocomplete.suggest(query[:100], limit)
+        return Response({'query': query, **suggestions})
@@ -20,6 +20,11 @@ class Review(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ('product', 'user')  # One review per user per product
+        # Keyset pagination sort keys, see backend.pagination
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_id_idx'),
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name} - {self.rating} stars"
@@ -6,11 +6,13 @@ from django.db.models import Avg
 from .models import Review
 from .serializers import ReviewSerializer, ReviewCreateSerializer, ReviewUpdateSerializer
 from products.models import Product
+from backend.pagination import KeysetPagination
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = Review.objects.all()
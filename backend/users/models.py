@@ -1,8 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
-import os
 from django.templatetags.static import static
+from backend.image_renditions import RenditionsMixin, rendition_url
 
 COUNTRY_CHOICES = [
     ("VN", "Vietnam"),
@@ -17,25 +16,25 @@ COUNTRY_CHOICES = [
 def user_directory_path(instance, filename):
     return f'user_{instance.user.id}/{filename}'
 
-class Account(models.Model):
+class Account(RenditionsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='account')
     last_name = models.CharField(max_length=150, blank=True)
     first_name = models.CharField(max_length=150, blank=True)
     avatar = models.ImageField(upload_to=user_directory_path, blank=True, null=True)
+    # Digest of the avatar the renditions were made from, see backend.image_renditions
+    avatar_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
     phone = models.CharField(max_length=15, blank=True)
 
+    rendition_fields = {'avatar': 'avatar_hash'}
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        if self.avatar and os.path.exists(self.avatar.path):
-            img = Image.open(self.avatar.path)
-            if img.height > 300 or img.width > 300:
-                img.thumbnail((300, 300))
-                img.save(self.avatar.path)
+        self.queue_changed_images(kwargs.get('update_fields'))
     
     @property
     def get_avatar(self):
         if self.avatar:
-            return self.avatar.url
+            return rendition_url(self, 'avatar', 'thumbnail')
         return static('images/default.jpg')
 
 class Address(models.Model):
@@ -110,4 +109,4 @@ class Address(models.Model):
                 country=core_fields['country'],
                 is_default=address_data.get('is_default', False)
             )
-            return new_address, True  # (address, created)
\ No newline at end of file
+            return new_address, True  # (address, created)
\ No newline at end of file
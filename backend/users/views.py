@@ -15,6 +15,7 @@ from django.db.models import Q
 from users.models import Account, Address
 from django.utils import timezone
 from datetime import timedelta
+from backend.pagination import cached_count
 
 
 from users.serializers import (
@@ -257,7 +258,7 @@ class AdminCustomerListView(APIView):
         start = (page - 1) * page_size
         end = start + page_size
         
-        total_users = users.count()
+        total_users = cached_count(users)
         users_page = users[start:end]
         
         serializer = AdminCustomerSerializer(users_page, many=True)